@@ -25,35 +25,67 @@
 from __future__ import annotations
 from pydantic import BaseModel
 from fastapi import Body
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from dateutil import parser as dtp
 from typing import List, Dict, Any, Optional, Tuple
-import hmac, hashlib, json, re, os, asyncio, random
+import hmac, hashlib, json, re, os, asyncio, random, functools, io, base64, threading
+from collections import OrderedDict
 import httpx
 import uuid
+from types import SimpleNamespace
+from pathlib import Path
 from dotenv import load_dotenv
 from sqlalchemy import (
     create_engine,
     Column,
     Integer,
+    BigInteger,
     String,
     DateTime,
+    Date,
     Text,
+    LargeBinary,
     func,
+    inspect,
+    update,
+    select,
+    bindparam,
+    table,
+    column,
+    text,
+    tuple_,
+    type_coerce,
+    case,
+    literal,
+    and_,
+    or_,
+    Index,
     JSON as SAJSON,
 )
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import SQLAlchemyError
-from contextlib import contextmanager
+from sqlalchemy.schema import AddConstraint
+from contextlib import contextmanager, asynccontextmanager, aclosing
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
-from sqlalchemy import UniqueConstraint, ForeignKey
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import UniqueConstraint, ForeignKey, event as sa_event
 import pandas as pd
 import numpy as np
-from be4_module import register_be4
+from be4_module import register_be4, be4
+from origin_index import ORIGIN_INDEX
+from track_stream import TrackStreamDecoder
+import event_archive
+import timeline_codec
+import quantile_sketch
+from http_cache import BOOT_AT, make_etag, not_modified
+from change_broadcaster import ChangeBroadcaster, format_sse
 
 # 환경 변수 로드
 load_dotenv()
@@ -77,6 +109,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
     allow_credentials=True,  # HTTPS 사용 시 쿠키/인증 정보 전송 허용
+    expose_headers=["X-Next-Cursor", "X-Head-Cursor"],  # 목록/변경 로그 커서
 )
 
 # HTTPS 강제 미들웨어 (프로덕션 환경)
@@ -105,9 +138,58 @@ HTTP_CLIENT: Optional[httpx.AsyncClient] = None
 
 # DB 설정 (환경변수로 오버라이드 가능)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./shipments.db")
-# sqlite: check_same_thread=False for multithread with FastAPI
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+# WAL/읽기전용 엔진은 파일 기반 sqlite에만 적용 (:memory: 제외)
+IS_SQLITE_FILE = IS_SQLITE and ":memory:" not in DATABASE_URL and ":///" in DATABASE_URL
+
+# [ANCHOR: SQLITE_PROFILE] WAL 저장 프로필 (환경변수로 조정)
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL") # WAL + NORMAL: 커밋마다 fsync 안 함(체크포인트 때만)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")) # 커넥션당 페이지 캐시
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", "60")) # 초
+SQLITE_WAL_TRUNCATE_BYTES = int(os.getenv("SQLITE_WAL_TRUNCATE_BYTES", str(64 * 1024 * 1024)))
+
+def _sqlite_connect_args() -> Dict[str, Any]:
+    # sqlite: check_same_thread=False for multithread with FastAPI
+    # timeout: 드라이버 레벨 잠금 대기(초)
+    return {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+
+def _apply_sqlite_pragmas(dbapi_conn, connection_record, readonly: bool = False):
+    cur = dbapi_conn.cursor()
+    try:
+        if not readonly:
+            cur.execute("PRAGMA journal_mode=WAL") # DB 파일에 영구 기록됨
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cur.close()
+
+def _readonly_sqlite_url(url: str) -> str:
+    # sqlite:///./shipments.db → sqlite:///file:./shipments.db?mode=ro&uri=true
+    prefix, _, rest = url.partition(":///")
+    path, _, query = rest.partition("?")
+    if path.startswith("file:"):
+        path = path[len("file:"):]
+    params = [q for q in query.split("&") if q and not q.startswith(("mode=", "uri="))]
+    return f"{prefix}:///file:{path}?" + "&".join(params + ["mode=ro", "uri=true"])
+
+engine = create_engine(DATABASE_URL, connect_args=_sqlite_connect_args() if IS_SQLITE else {})
+if IS_SQLITE_FILE:
+    sa_event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+# GET 엔드포인트용 읽기 엔진: sqlite 파일이면 읽기전용(mode=ro) 커넥션, 그 외 DB는 쓰기 엔진 공유
+if IS_SQLITE_FILE:
+    read_engine = create_engine(_readonly_sqlite_url(DATABASE_URL), connect_args=_sqlite_connect_args())
+    sa_event.listen(read_engine, "connect", functools.partial(_apply_sqlite_pragmas, readonly=True))
+else:
+    read_engine = engine
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
 class Shipment(Base):
@@ -117,12 +199,41 @@ class Shipment(Base):
     carrier = Column(String(80), nullable=True) # 선택적: carrier code/name
     last_status = Column(String(80), nullable=True) # CLEARED / IN_PROGRESS / DELAY / UNKNOWN
     last_event = Column(Text, nullable=True) # 마지막 설명(짧게)
-    normalized = Column(Text, nullable=True) # JSON 문자열로 저장(필요시 SAJSON 사용)
+    normalized = Column(Text, nullable=True) # 레거시 JSON 문자열 (바이너리로 변환되면 NULL)
+    normalized_bin = Column(LargeBinary, nullable=True) # 타임라인 바이너리 (timeline_codec), JSON은 API 경계에서만
     normalized_count = Column(Integer, default=0)
     any_events = Column(Integer, default=0) # boolean-like 0/1
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # 통관 요약 (조회/필터용, 쓰기 시 갱신)
+    in_progress_at = Column(DateTime(timezone=True), index=True, nullable=True) # 진행 시작(누락 보정 포함)
+    cleared_at = Column(DateTime(timezone=True), index=True, nullable=True) # 최초 CLEARED (import 우선)
+    last_event_ts = Column(DateTime(timezone=True), index=True, nullable=True) # 반영된 마지막 이벤트 시각
+    has_delay = Column(Integer, index=True, default=0) # boolean-like 0/1
+    duration_sec = Column(Integer, index=True, nullable=True) # 진행→완료 소요(초)
+
+    # 통관 요약 상태 (CustomsSummaryState, 새 이벤트만 O(1)로 반영)
+    first_in_at = Column(DateTime(timezone=True), nullable=True) # 최초 IN_PROGRESS (import 우선)
+    first_in_import = Column(Integer, default=0) # first_in_at이 import 이벤트인지 0/1
+    cleared_import = Column(Integer, default=0) # cleared_at이 import 이벤트인지 0/1
+    pre_cleared_at = Column(DateTime(timezone=True), nullable=True) # CLEARED 직전 이벤트 시각(누락 보정용)
+    prev_event_ts = Column(DateTime(timezone=True), nullable=True) # last_event_ts 바로 이전의 (다른) 시각
+    delays_json = Column(Text, nullable=True) # import 지연 목록 [{"at","hint"}]
+    summary_event_count = Column(Integer, nullable=True) # 상태에 반영된 타임라인 길이 (새 타임라인이 뒤에만 붙었는지 판정)
+
+    # 이벤트 보관(아카이브): 통관완료 후 오래된 이벤트는 hot 테이블에서 파일로 이동
+    events_archived_at = Column(DateTime(timezone=True), nullable=True) # 마지막 보관 시각
+    events_archived_until = Column(DateTime(timezone=True), nullable=True) # 이 시각 이하 이벤트는 보관본에 있음
+    events_archive_parts = Column(Text, nullable=True) # 보관 part 파일 상대경로 JSON 목록
+
+    # 목록 keyset 페이지네이션 (updated_at DESC, id DESC) + 필터별 복합 인덱스
+    __table_args__ = (
+        Index("ix_shipments_updated_id", "updated_at", "id"),
+        Index("ix_shipments_status_updated_id", "last_status", "updated_at", "id"),
+        Index("ix_shipments_carrier_updated_id", "carrier", "updated_at", "id"),
+    )
+
 class ShipmentEvent(Base):
     __tablename__ = "shipment_events"
     id = Column(Integer, primary_key=True)
@@ -132,10 +243,16 @@ class ShipmentEvent(Base):
     stage = Column(String(32), nullable=False) # CLEARED / IN_PROGRESS / DELAY / UNKNOWN
     desc = Column(Text, nullable=True) # 원문/번역 설명
     source = Column(String(32), nullable=True) # 'webhook' | 'poll' | 'normalized'
+    fingerprint = Column(BigInteger, nullable=False) # (ts, stage, 정규화 desc) 64비트 지문 → 중복 판정 키
+    last_ts = Column(DateTime(timezone=True), nullable=True) # 접힌 반복 스캔의 마지막 시각 (ts는 첫 시각)
+    repeat = Column(Integer, nullable=True) # 접힌 반복 스캔 횟수 (반복 없으면 NULL)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # desc(TEXT) 전문 대신 고정폭 지문으로 유일성 (인덱스 크기 일정)
+    # 번호별 최신 이벤트 1건 (활동 피드): (tracking_number, ts DESC, id DESC) 앞에서 한 번 찾기 (정렬 없음)
     __table_args__ = (
-        UniqueConstraint("shipment_id", "ts", "stage", "desc", name="uq_shipment_event_dedup"),
+        UniqueConstraint("shipment_id", "fingerprint", name="uq_shipment_event_fp"),
+        Index("ix_shipment_events_number_ts", "tracking_number", ts.desc(), id.desc()),
     )
 
 # ======================= 통관/화물 상세 =======================
@@ -167,15 +284,78 @@ class ShipmentDetails(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+# ======================= 변경 로그 (outbox) =======================
+# 쓰기와 같은 트랜잭션에 append만 하는 로그. id가 델타 동기화 커서 (단조 증가, 재사용 없음)
+class ShipmentChange(Base):
+    __tablename__ = "shipment_changes"
+    id = Column(Integer, primary_key=True)
+    shipment_id = Column(Integer, nullable=False) # FK 없음: 운송장이 지워져도 로그는 유지
+    tracking_number = Column(String(128), nullable=False)
+    kind = Column(String(16), nullable=False) # 'shipment' | 'events' | 'details'
+    last_status = Column(String(80), nullable=True) # 변경 시점 상태 (shipment)
+    count = Column(Integer, nullable=True) # 새로 들어간 이벤트 수 (events)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    # sqlite: AUTOINCREMENT 로 삭제(정리)된 id도 다시 쓰지 않음 → 커서가 뒤로 가지 않음
+    __table_args__ = {"sqlite_autoincrement": True}
+
+# ======================= 대시보드 집계 (증분 유지) =======================
+# (dim, key) 한 줄 = 카운터. 운송장 쓰기와 같은 트랜잭션에서 변화분(delta)만 더한다
+#   total/"" · status/<last_status> · carrier/<carrier> · origin/<origin_country> · delay/""
+#   duration/"" (count=소요시간 보유 건수, duration_sum=합계) · duration_hist/<구간>
+class ShipmentAggregate(Base):
+    __tablename__ = "shipment_aggregates"
+    dim = Column(String(16), primary_key=True)
+    key = Column(String(128), primary_key=True) # 값 없음(미상)은 ""
+    count = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(BigInteger, nullable=False, default=0) # 초
+
+# ======================= 일별 통관 소요시간 롤업 =======================
+# (통관완료 일자(UTC), 출발국, carrier) 한 줄. 통관완료 시각/소요시간/carrier/출발국이 바뀐 운송장만 증분 반영
+class ClearanceRollup(Base):
+    __tablename__ = "clearance_daily_rollups"
+    day = Column(Date, primary_key=True)
+    origin_country = Column(String(80), primary_key=True) # 미상은 ""
+    carrier = Column(String(80), primary_key=True) # 미상은 ""
+    count = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(BigInteger, nullable=False, default=0) # 초
+    duration_min = Column(Integer, nullable=True)
+    duration_max = Column(Integer, nullable=True)
+    sketch = Column(Text, nullable=True) # 분위수 스케치 (quantile_sketch JSON)
+
 class EventOut(BaseModel):
     ts: str
     stage: str
     desc: str | None = None
     source: str | None = None
+    last_ts: str | None = None # 접힌 반복 스캔: 마지막 시각 (ts는 첫 시각)
+    repeat: int | None = None # 접힌 반복 스캔 횟수
 
 # 테이블 생성 
 Base.metadata.create_all(bind=engine)
 
+def _migrate_add_missing_columns():
+    """
+    create_all은 기존 테이블을 바꾸지 않으므로, 모델에 새로 생긴 컬럼/인덱스만 추가.
+    (컬럼 삭제/타입 변경은 하지 않음)
+    """
+    insp = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in have:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(col.name)} {col_type}")
+            for idx in table.indexes:
+                idx.create(conn, checkfirst=True)
+
+_migrate_add_missing_columns()
+
 @contextmanager
 def get_db():
     db = SessionLocal()
@@ -188,19 +368,256 @@ def get_db():
     finally:
         db.close()
 
+@contextmanager
+def get_read_db():
+    """조회 전용 세션 (읽기 엔진, 커밋 없음)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.rollback()
+        db.close()
+
+class WalCheckpointer:
+    """
+    WAL 파일이 계속 커지지 않도록 주기적으로 체크포인트.
+    - 평소: PASSIVE (읽기/쓰기를 막지 않음)
+    - WAL이 SQLITE_WAL_TRUNCATE_BYTES 이상: TRUNCATE (busy면 다음 주기에 재시도)
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    def checkpoint(self) -> Dict[str, Any]:
+        db_path = engine.url.database
+        wal = f"{db_path}-wal" if db_path else None
+        wal_bytes = os.path.getsize(wal) if wal and os.path.exists(wal) else 0
+        mode = "TRUNCATE" if wal_bytes >= SQLITE_WAL_TRUNCATE_BYTES else "PASSIVE"
+        with engine.connect() as conn:
+            busy, log_frames, ckpt_frames = conn.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})").one()
+        self.last_result = {
+            "mode": mode,
+            "busy": bool(busy),
+            "log_frames": log_frames,
+            "checkpointed_frames": ckpt_frames,
+            "wal_bytes_before": wal_bytes,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        return self.last_result
+
+    async def start(self):
+        if self._task or not IS_SQLITE_FILE or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # 쓰기 스레드와 같은 큐에서 실행 (대량 쓰기 도중 경합하지 않도록)
+                await loop.run_in_executor(DB_EXECUTOR, self.checkpoint)
+            except Exception as e:
+                print(f"[wal] checkpoint 실패: {e}")
+
+wal_checkpointer = WalCheckpointer(SQLITE_CHECKPOINT_INTERVAL)
+
+# [ANCHOR: DB_EXECUTOR] async 핸들러의 DB 쓰기 전용 스레드
+# - 커밋/fsync 동안 이벤트 루프가 멈추지 않도록 세션 작업을 통째로 이 스레드에서 실행
+# - sqlite는 쓰기가 어차피 직렬화되므로 1개 스레드로 큐잉 (busy 대기/재시도 없음)
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+def _begin_write(db):
+    """
+    savepoint(begin_nested)를 쓸 쓰기 트랜잭션 시작.
+    sqlite(pysqlite)는 첫 DML 전까지 BEGIN을 미루므로, 그 전에 연 SAVEPOINT는 바깥 트랜잭션 없이 시작되고
+    RELEASE가 곧 커밋이 된다 → BEGIN IMMEDIATE로 먼저 열어 둔다 (쓰기 잠금도 busy_timeout으로 처음에 대기)
+    """
+    if db.get_bind().dialect.name != "sqlite":
+        return
+    raw = db.connection().connection.driver_connection
+    if not raw.in_transaction:
+        raw.execute("BEGIN IMMEDIATE")
+
+async def run_in_db(fn, *args, **kwargs):
+    """fn(db, *args, **kwargs)를 DB 스레드에서 get_db() 트랜잭션으로 실행하고 결과 반환"""
+    def _call():
+        with get_db() as db:
+            return fn(db, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(DB_EXECUTOR, _call)
+
+RETENTION_TASK: Optional[asyncio.Task] = None
+CHANGE_LOG_TASK: Optional[asyncio.Task] = None
+BACKFILL_TASK: Optional[asyncio.Task] = None
+
+# [ANCHOR: READ_CACHE] 운송장 단위 상세/이벤트 응답 read-through 캐시 (프로세스 내 LRU)
+SHIPMENT_CACHE_SIZE = int(os.getenv("SHIPMENT_CACHE_SIZE", "2048")) # 0이면 캐시 끔
+
+class ShipmentReadCache:
+    """
+    (종류, 운송장번호) → 응답 값 LRU.
+    - 쓰기 함수는 _touch_shipments(db, ...)로 세션에 번호를 표시, 커밋 직후(after_commit) 정확히 그 번호만 무효화
+    - 커밋 전에 읽기 시작한 조회가 커밋 후에 넣으려 하면 거절 (스탬프 비교) → 오래된 값이 다시 들어가지 않음
+    """
+
+    def __init__(self, maxsize: int, recent_invalidations: int = 4096):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp = 0
+        self._stamp_at = BOOT_AT
+        self._invalidated: "OrderedDict[str, Tuple[int, datetime]]" = OrderedDict() # 번호 → (마지막 무효화 스탬프, 시각) (최근 것만)
+        self._recent = recent_invalidations
+        self._forgotten_stamp = 0 # _invalidated에서 밀려난 스탬프 중 최대
+        self._forgotten_at = BOOT_AT
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, what: str):
+        k = self.stats.setdefault(kind, {"hits": 0, "misses": 0, "invalidations": 0})
+        k[what] += 1
+
+    def get_or_load(self, kind: str, number: str, loader):
+        if self.maxsize <= 0:
+            return loader()
+        key = (kind, number)
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self._count(kind, "hits")
+                return self._data[key]
+            self._count(kind, "misses")
+            token = self._stamp
+        value = loader()
+        with self._lock:
+            last = self._invalidated.get(number)
+            stale = (last is not None and last[0] > token) or self._forgotten_stamp > token
+            if not stale:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, numbers):
+        with self._lock:
+            self._stamp += 1
+            self._stamp_at = datetime.now(timezone.utc)
+            for number in numbers:
+                for kind in self.stats:
+                    if self._data.pop((kind, number), None) is not None:
+                        self._count(kind, "invalidations")
+                self._invalidated[number] = (self._stamp, self._stamp_at)
+                self._invalidated.move_to_end(number)
+            while len(self._invalidated) > self._recent:
+                _, (st, at) = self._invalidated.popitem(last=False)
+                if st > self._forgotten_stamp:
+                    self._forgotten_stamp, self._forgotten_at = st, at
+
+    def version(self, number: Optional[str] = None) -> Tuple[int, datetime]:
+        """
+        조건부 GET용 (버전, 변경 시각). 캐시 크기와 무관하게 커밋마다 오른다.
+        number가 없으면 전체(목록), 있으면 그 운송장 — 최근 목록에서 밀려났으면 밀려난 스탬프 중 최대값
+        (그 운송장의 실제 마지막 변경 이후 값이므로 바뀐 적 없는 사본을 최신으로 잘못 보지 않음)
+        """
+        with self._lock:
+            if number is None:
+                return self._stamp, self._stamp_at
+            return self._invalidated.get(number) or (self._forgotten_stamp, self._forgotten_at)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {
+                kind: {**c, "hit_rate": round(c["hits"] / (c["hits"] + c["misses"]), 4) if c["hits"] + c["misses"] else None}
+                for kind, c in self.stats.items()
+            }
+            return {"size": len(self._data), "maxsize": self.maxsize, "kinds": kinds}
+
+shipment_read_cache = ShipmentReadCache(SHIPMENT_CACHE_SIZE)
+
+def _touch_shipments(db, *numbers):
+    """이 세션이 커밋되면 해당 운송장 캐시를 무효화"""
+    db.info.setdefault("touched_numbers", set()).update(str(n) for n in numbers if n)
+
+@sa_event.listens_for(SessionLocal, "after_commit")
+def _invalidate_touched(session):
+    touched = session.info.pop("touched_numbers", None)
+    if touched:
+        shipment_read_cache.invalidate(touched)
+
+@sa_event.listens_for(SessionLocal, "after_rollback")
+def _discard_touched(session):
+    session.info.pop("touched_numbers", None)
+
+async def _run_backfills():
+    """
+    1회성 백필들을 순서대로 (대상이 없으면 즉시 종료, GET 경로는 쓰지 않음).
+    배치 하나 = 쓰기 스레드 작업 하나 → 긴 백필 중에도 그룹 커밋/웹훅 쓰기가 배치 사이에 처리됨
+    집계 재계산은 요약 컬럼 백필 뒤에 와야 함
+    """
+    for label, step in (("요약 컬럼", _backfill_summary_columns),
+                        ("이벤트/상세", _backfill_events_and_details),
+                        ("normalized 바이너리 변환", _backfill_normalized_encoding)):
+        done, last_id = 0, 0
+        while last_id is not None:
+            n, last_id = await run_in_db(step, last_id)
+            done += n
+        if done:
+            print(f"[backfill] {label} {done}건")
+    await run_in_db(_rebuild_aggregates_if_empty)
+    await run_in_db(_rebuild_clearance_rollups_if_empty)
+
+def _log_task_failure(task: asyncio.Task):
+    # 아무도 await 하지 않는 백그라운드 작업의 예외가 묻히지 않도록
+    if not task.cancelled() and task.exception() is not None:
+        e = task.exception()
+        print(f"[{task.get_name()}] 실패: {type(e).__name__}: {e}")
+
 @app.on_event("startup")
 async def _startup():
-    global HTTP_CLIENT
+    global HTTP_CLIENT, RETENTION_TASK, CHANGE_LOG_TASK, BACKFILL_TASK
     # HTTP/2 활성화는 서버 호환성 문제시 False로 내리세요
     try:
         HTTP_CLIENT = httpx.AsyncClient(timeout=20.0, http2=True)
     except ImportError:
         print("httpx[http2] 미설치. HTTP/1.1로 폴백합니다.")
         HTTP_CLIENT = httpx.AsyncClient(timeout=20.0, http2=False)
+    BACKFILL_TASK = asyncio.create_task(_run_backfills(), name="backfill")
+    BACKFILL_TASK.add_done_callback(_log_task_failure)
+    await wal_checkpointer.start()
+    await change_broadcaster.start()
+    if EVENT_RETENTION_DAYS > 0:
+        RETENTION_TASK = asyncio.create_task(_event_retention_loop())
+    if CHANGE_LOG_RETENTION_DAYS > 0:
+        CHANGE_LOG_TASK = asyncio.create_task(_change_log_prune_loop())
 
 @app.on_event("shutdown")
 async def _shutdown():
-    global HTTP_CLIENT
+    global HTTP_CLIENT, RETENTION_TASK, CHANGE_LOG_TASK, BACKFILL_TASK
+    await wal_checkpointer.shutdown()
+    await change_broadcaster.shutdown()
+    for task in (RETENTION_TASK, CHANGE_LOG_TASK, BACKFILL_TASK):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass # 백필 실패는 done-callback이 이미 기록
+    RETENTION_TASK = CHANGE_LOG_TASK = BACKFILL_TASK = None
+    await group_writer.shutdown()
+    # 대기 중인 쓰기를 마치고 종료
+    DB_EXECUTOR.shutdown(wait=True)
     if HTTP_CLIENT:
         await HTTP_CLIENT.aclose()
         HTTP_CLIENT = None
@@ -529,61 +946,294 @@ def normalize_from_track(track: Dict[str, Any]) -> List[Dict[str, Any]]:
 
     return out
 
+# [ANCHOR: TIMELINE_COMPACT] 반복 스캔 접기 (저장용, 원본 payload/보관본은 그대로)
+TIMELINE_COMPACT = int(os.getenv("TIMELINE_COMPACT", "1")) # 0이면 접지 않음
 
-def summarize_customs(events: List[Dict[str, Any]]) -> Dict[str, Any]:
-    # 1) 'import' 우선, 없으면 일반 진행/완료도 허용
-    
-    _has = lambda e, kw: kw in (e.get("desc") or "").lower()
-    imp_in = next((e["ts"] for e in events if e["stage"] == "IN_PROGRESS" and _has(e, "import")), None)
-    any_in = next((e["ts"] for e in events if e["stage"] == "IN_PROGRESS"), None)
-    first_in = imp_in or any_in
-
-    imp_cl = next((e["ts"] for e in events if e["stage"] == "CLEARED" and _has(e, "import")), None)
-    any_cl = next((e["ts"] for e in events if e["stage"] == "CLEARED"), None)
-    cleared = imp_cl or any_cl
-
-    # 지연은 import 관련만 집계(원래 의도 유지)
-    # 단, 통관/배송이 완료된 경우(CLEARED) 이후의 지연은 제외
-    delays = []
-    for e in events:
-        if e["stage"] == "DELAY" and _has(e, "import"):
-            # CLEARED 이벤트가 있고, 그 이벤트가 이 지연보다 나중에 발생했다면 제외
-            should_include = True
-            if cleared:
-                # cleared는 datetime 객체
-                cleared_dt = cleared
-                delay_dt = e["ts"]
-                # 완료가 지연보다 나중에 발생했다면 지연 제외 (지연이 해결된 것으로 간주)
-                if cleared_dt > delay_dt:
-                    should_include = False
-            
-            if should_include:
-                delays.append(dict(at=e["ts"].isoformat() if hasattr(e["ts"], "isoformat") else str(e["ts"]), hint=(e["desc"] or "")[:140]))
+def compact_timeline(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    연속으로 반복되는 같은 (stage, location, desc) 이벤트를 한 건으로 접는다.
+    - 접힌 항목: ts = 첫 시각, last_ts = 마지막 시각, repeat = 횟수 (반복 없는 항목은 키 추가 없음)
+    - 이미 접힌 목록을 다시 넣어도 결과가 같다
+    """
+    out: List[Dict[str, Any]] = []
+    for ev in events:
+        prev = out[-1] if out else None
+        if prev is not None and (prev["stage"], prev.get("location"), prev.get("desc")) == (
+            ev["stage"], ev.get("location"), ev.get("desc")
+        ):
+            prev["repeat"] = prev.get("repeat", 1) + ev.get("repeat", 1)
+            prev["last_ts"] = ev.get("last_ts") or ev["ts"]
+            continue
+        out.append(dict(ev))
+    return out
 
-    # 누락 보정: 완료만 있고 진행이 없으면 직전 이벤트를 진행으로 간주
-    if cleared and not first_in and events:
+
+def _as_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    # SQLite DateTime 컬럼은 tz 없이 돌려주므로 UTC로 간주
+    if dt is None:
+        return None
+    if isinstance(dt, str):
+        return _to_dt_utc(dt)
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+class CustomsSummaryState:
+    """
+    summarize_customs의 증분 버전.
+    정렬된 타임라인을 한 건씩 feed() 하면 이벤트당 O(1)로 요약 상태가 갱신된다.
+      - first_in / cleared: 'import' 이벤트 우선, 없으면 최초 이벤트
+      - delays: import 관련 DELAY (요약 시 CLEARED 이전 지연은 제외, 같은 이벤트가 두 번 와도 두 건 — 원본과 동일)
+      - pre_cleared: 누락 보정(완료만 있고 진행이 없을 때) 용 직전 이벤트 시각
+      - count: 반영한 이벤트 수 (absorb()가 새 타임라인이 뒤에만 붙었는지 판정)
+    상태는 shipments 컬럼(first_in_at, cleared_at, ...)으로 영속화된다.
+    """
+
+    __slots__ = ("first_in", "first_in_import", "cleared", "cleared_import",
+                 "pre_cleared", "last_ts", "prev_ts", "delays", "count")
+
+    def __init__(self):
+        self.first_in: Optional[datetime] = None
+        self.first_in_import = False
+        self.cleared: Optional[datetime] = None
+        self.cleared_import = False
+        self.pre_cleared: Optional[datetime] = None
+        self.last_ts: Optional[datetime] = None
+        self.prev_ts: Optional[datetime] = None
+        self.delays: List[Dict[str, Any]] = []
+        self.count: Optional[int] = 0 # None = 모름 (다음 absorb에서 전체 재계산)
+
+    def feed(self, ev: Dict[str, Any]) -> None:
+        if self.count is not None:
+            self.count += 1
         try:
-            idx = next(i for i, e in enumerate(events) if e["ts"] == cleared)
-            if idx > 0:
-                first_in = events[idx - 1]["ts"]
-        except StopIteration:
-            pass
+            ts = _as_utc(ev.get("ts"))
+        except (ValueError, OverflowError):
+            return
+        if ts is None:
+            return
+        stage = ev.get("stage")
+        is_import = "import" in (ev.get("desc") or "").lower()
+
+        # 직전 '다른' 시각 추적 (정렬 기준 events[idx-1]["ts"]와 동일)
+        if self.last_ts is None or ts > self.last_ts:
+            self.prev_ts, self.last_ts = self.last_ts, ts
+        elif ts < self.last_ts and (self.prev_ts is None or ts > self.prev_ts):
+            self.prev_ts = ts
+
+        if stage == "IN_PROGRESS":
+            if self._prefer(ts, is_import, self.first_in, self.first_in_import):
+                self.first_in, self.first_in_import = ts, is_import
+        elif stage == "CLEARED":
+            if self._prefer(ts, is_import, self.cleared, self.cleared_import):
+                self.cleared, self.cleared_import = ts, is_import
+                self.pre_cleared = self.prev_ts if ts == self.last_ts else None
+        elif stage == "DELAY" and is_import:
+            self.delays.append({"at": ts, "hint": (ev.get("desc") or "")[:140]})
+
+    def feed_many(self, events: List[Dict[str, Any]]) -> int:
+        for ev in events:
+            self.feed(ev)
+        return len(events)
+
+    def absorb(self, events: List[Dict[str, Any]]) -> "CustomsSummaryState":
+        """
+        저장된 상태 + 새로 받은 전체 타임라인(정렬됨) → 갱신된 상태.
+        - last_ts 이하 구간의 이벤트 수가 저장 당시와 같으면(뒤에만 붙음) 꼬리의 새 이벤트만 feed → O(새 이벤트)
+        - 다르면(늦게 도착한 과거 이벤트, 같은 시각 추가, 상태 도입 전 레코드) 새 타임라인으로 처음부터 다시 계산해
+          새 상태 객체를 반환 (self는 그대로 → 호출부가 역행 여부를 비교할 수 있음)
+        """
+        tail = len(events)
+        if self.last_ts is not None:
+            while tail > 0 and self._after(events[tail - 1], self.last_ts):
+                tail -= 1
+        if self.count is None or tail != self.count:
+            fresh = CustomsSummaryState()
+            fresh.feed_many(events)
+            return fresh
+        self.feed_many(events[tail:])
+        return self
+
+    @staticmethod
+    def _after(ev: Dict[str, Any], ts: datetime) -> bool:
+        try:
+            t = _as_utc(ev.get("ts"))
+        except (ValueError, OverflowError):
+            return False
+        return t is not None and t > ts
+
+    @staticmethod
+    def _prefer(ts, is_import, cur, cur_import) -> bool:
+        # import 이벤트가 일반 이벤트보다 우선, 같은 부류면 더 이른 시각
+        if cur is None:
+            return True
+        if is_import != cur_import:
+            return is_import
+        return ts < cur
+
+    @property
+    def in_progress_at(self) -> Optional[datetime]:
+        return self.first_in or (self.pre_cleared if self.cleared else None)
+
+    @property
+    def status(self) -> str:
+        return "CLEARED" if self.cleared else ("IN_PROGRESS" if self.in_progress_at else "UNKNOWN")
+
+    def summary(self) -> Dict[str, Any]:
+        first_in, cleared = self.in_progress_at, self.cleared
+        # 통관/배송 완료 이후가 아닌(완료로 해소된) 지연은 제외
+        delays = [
+            dict(at=d["at"].isoformat(), hint=d["hint"])
+            for d in self.delays
+            if not (cleared and cleared > d["at"])
+        ]
+        duration_sec = int((cleared - first_in).total_seconds()) if (first_in and cleared) else None
+        return {
+            "status": self.status,
+            "in_progress_at": first_in.isoformat() if first_in else None,
+            "cleared_at": cleared.isoformat() if cleared else None,
+            "has_delay": bool(delays),
+            "delays": delays,
+            "duration_sec": duration_sec,
+        }
 
-    duration_sec = int((cleared - first_in).total_seconds()) if (first_in and cleared) else None
+    # ----- shipments 컬럼 <-> 상태 -----
+    @classmethod
+    def from_shipment(cls, obj: "Shipment") -> "CustomsSummaryState":
+        # 상태 컬럼 도입 이전 레코드는 _backfill_summary_columns()가 기동 시 채워 둔다
+        st = cls()
+        if obj.last_event_ts is None:
+            return st
+        st.first_in = _as_utc(obj.first_in_at)
+        st.first_in_import = bool(obj.first_in_import)
+        st.cleared = _as_utc(obj.cleared_at)
+        st.cleared_import = bool(obj.cleared_import)
+        st.pre_cleared = _as_utc(obj.pre_cleared_at)
+        st.last_ts = _as_utc(obj.last_event_ts)
+        st.prev_ts = _as_utc(obj.prev_event_ts)
+        st.count = obj.summary_event_count
+        try:
+            st.delays = [{"at": _to_dt_utc(d["at"]), "hint": d.get("hint") or ""} for d in json.loads(obj.delays_json or "[]")]
+        except Exception:
+            st.delays = []
+        return st
+
+    def apply_to(self, obj: "Shipment") -> None:
+        obj.first_in_at = self.first_in
+        obj.first_in_import = int(self.first_in_import)
+        obj.cleared_at = self.cleared
+        obj.cleared_import = int(self.cleared_import)
+        obj.pre_cleared_at = self.pre_cleared
+        obj.last_event_ts = self.last_ts
+        obj.prev_event_ts = self.prev_ts
+        obj.summary_event_count = self.count
+        obj.delays_json = json.dumps(
+            [{"at": d["at"].isoformat(), "hint": d["hint"]} for d in self.delays], ensure_ascii=False
+        ) if self.delays else None
+        # 조회용 파생 컬럼
+        summary = self.summary()
+        obj.in_progress_at = self.in_progress_at
+        obj.has_delay = int(summary["has_delay"])
+        obj.duration_sec = summary["duration_sec"]
 
-    return {
-        "status": "CLEARED" if cleared else ("IN_PROGRESS" if first_in else "UNKNOWN"),
-        "in_progress_at": first_in.isoformat() if first_in else None,
-        "cleared_at": cleared.isoformat() if cleared else None,
-        "has_delay": bool(delays),
-        "delays": delays,
-        "duration_sec": duration_sec,
-    }
+
+def summarize_customs(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # 1) 'import' 우선, 없으면 일반 진행/완료도 허용 (단일 패스, CustomsSummaryState 참고)
+    state = CustomsSummaryState()
+    state.feed_many(events)
+    return state.summary()
+
+
+# 1회성 백필은 배치 함수 fn(db, last_id) -> (처리 건수, 다음 last_id 또는 None=끝)
+# 기동 시 _run_backfills()가 배치마다 쓰기 스레드에 따로 제출 → 사이사이 그룹 커밋이 끼어들 수 있음
+BackfillResult = Tuple[int, Optional[int]]
+
+def _backfill_summary_columns(db, last_id: int, batch: int = 500) -> BackfillResult:
+    """
+    1회성 백필: 요약 컬럼 도입 이전 레코드(last_event_ts 비어 있고 타임라인 보유)를
+    저장된 normalized로 한 번 재구성해 컬럼을 채운다. 이후 조회/업서트는 컬럼만 사용.
+    """
+    rows = (
+        db.query(Shipment)
+          .filter(Shipment.id > last_id, Shipment.last_event_ts.is_(None), Shipment.normalized_count > 0)
+          .order_by(Shipment.id)
+          .limit(batch)
+          .all()
+    )
+    # 목록에 보이는 컬럼(cleared_at, has_delay, ...)이 바뀜 → 커밋 때 목록/운송장 ETag 스탬프가 오르도록
+    _touch_shipments(db, *[obj.tracking_number for obj in rows])
+    for obj in rows:
+        state = CustomsSummaryState()
+        state.feed_many(_parse_normalized_json(obj.normalized_bin or obj.normalized))
+        state.count = None # 저장본은 접힌 타임라인 → 다음 업서트에서 원본 타임라인으로 재계산
+        cols = SimpleNamespace()
+        state.apply_to(cols)
+        # updated_at(목록 정렬 기준)은 건드리지 않음
+        db.execute(
+            update(Shipment)
+              .where(Shipment.id == obj.id)
+              .values(**vars(cols), updated_at=Shipment.updated_at)
+        )
+    return len(rows), (rows[-1].id if len(rows) == batch else None)
+
+def _backfill_normalized_encoding(db, last_id: int, batch: int = 500) -> BackfillResult:
+    """
+    1회성 변환: 레거시 normalized(JSON 텍스트)를 normalized_bin(바이너리)으로 옮기고 텍스트는 비운다.
+    (sqlite 파일 크기는 비워진 페이지가 재사용되며 줄어들고, 바로 줄이려면 VACUUM)
+    변환에 실패한 행(깨진 JSON, 인코딩 불가)은 로그만 남기고 레거시 텍스트를 그대로 둔다.
+    """
+    S = Shipment.__table__
+    rows = db.execute(
+        select(S.c.id, S.c.normalized)
+          .where(S.c.id > last_id, S.c.normalized.is_not(None))
+          .order_by(S.c.id)
+          .limit(batch)
+    ).all()
+    params = []
+    for r in rows:
+        try:
+            events = json.loads(r.normalized)
+            if not isinstance(events, list):
+                raise ValueError(f"not a list: {type(events).__name__}")
+            params.append({"b_id": r.id, "normalized": None, "normalized_bin": _serialize_normalized(events)})
+        except Exception as e:
+            print(f"[backfill] normalized 변환 건너뜀 (shipment id={r.id}): {type(e).__name__}: {e}")
+    if params:
+        # updated_at(목록 정렬 기준)은 건드리지 않음
+        db.execute(update(S).where(S.c.id == bindparam("b_id")).values(updated_at=S.c.updated_at), params)
+    return len(params), (rows[-1].id if len(rows) == batch else None)
+
+def _backfill_events_and_details(db, last_id: int, batch: int = 200) -> BackfillResult:
+    """
+    1회성 백필: 신규 운송장에 이벤트/상세를 쓰지 않던 시절의 레코드에 저장된 normalized로
+    shipment_events(이벤트 0건 + 보관 안 됨 + 타임라인 보유) / shipment_details(행 없음)를 채운다.
+    조회(GET) 경로는 더 이상 쓰지 않으므로 과거 레코드는 여기서만 채워진다.
+    """
+    E, D = ShipmentEvent.__table__, ShipmentDetails.__table__
+    no_events = ~select(E.c.id).where(E.c.shipment_id == Shipment.id).exists()
+    no_details = ~select(D.c.id).where(D.c.shipment_id == Shipment.id).exists()
+    rows = (
+        db.query(Shipment, no_events.label("no_events"), no_details.label("no_details"))
+          .filter(Shipment.id > last_id)
+          .filter(or_(no_details,
+                      and_(no_events, Shipment.normalized_count > 0, Shipment.events_archive_parts.is_(None))))
+          .order_by(Shipment.id)
+          .limit(batch)
+          .all()
+    )
+    for obj, missing_events, missing_details in rows:
+        normalized_events = _parse_normalized_json(obj.normalized_bin or obj.normalized)
+        if missing_events and obj.events_archive_parts is None:
+            _upsert_events_for_shipment(db, obj, normalized_events, source="normalized")
+        if missing_details:
+            upsert_shipment_details(db, obj, _auto_details_patch(obj.last_status, normalized_events))
+    return len(rows), (rows[-1][0].id if len(rows) == batch else None)
 
 # =============== HTTP 호출 유틸 ===============
 # [ANCHOR: POLLING]
 
-async def _post_json(path: str, json_body: Any, max_retries: int = 5):
+@asynccontextmanager
+async def _post_stream(path: str, json_body: Any, max_retries: int = 5):
+    """POST 후 본문을 읽지 않은 스트리밍 응답을 넘긴다(재시도/지터/429-5xx 대처 포함)."""
     if not API_KEY:
         raise RuntimeError("SEVENTEENTRACK_API_KEY not set")
 
@@ -602,7 +1252,7 @@ async def _post_json(path: str, json_body: Any, max_retries: int = 5):
     try:
         for attempt in range(max_retries):
             try:
-                r = await client.post(url, headers=headers, json=json_body)
+                r = await client.send(client.build_request("POST", url, headers=headers, json=json_body), stream=True)
             except httpx.TransportError:
                 sleep = min(base_backoff * (2 ** attempt), 60)
                 sleep *= (0.8 + 0.4 * random.random())  # 지터
@@ -610,6 +1260,7 @@ async def _post_json(path: str, json_body: Any, max_retries: int = 5):
                 continue
 
             if r.status_code in (408, 425, 429, 502, 503, 504):
+                await r.aclose()
                 ra = r.headers.get("Retry-After")
                 try:
                     sleep = float(ra) if ra else min(base_backoff * (2 ** attempt), 60)
@@ -619,9 +1270,13 @@ async def _post_json(path: str, json_body: Any, max_retries: int = 5):
                 await asyncio.sleep(sleep)
                 continue
 
-            # 200대 이외는 예외
-            r.raise_for_status()
-            return r.json()
+            try:
+                # 200대 이외는 예외
+                r.raise_for_status()
+                yield r
+            finally:
+                await r.aclose()
+            return
 
         raise RuntimeError(f"POST {url} failed after {max_retries} retries")
     finally:
@@ -629,6 +1284,12 @@ async def _post_json(path: str, json_body: Any, max_retries: int = 5):
             await client.aclose()
 
 
+async def _post_json(path: str, json_body: Any, max_retries: int = 5):
+    async with _post_stream(path, json_body, max_retries) as r:
+        await r.aread()
+        return r.json()
+
+
 def _chunked(seq: List[str], size: int = 40):
     for i in range(0, len(seq), size):
         yield seq[i:i + size]
@@ -657,6 +1318,28 @@ async def get_trackinfo(numbers: List[str]):
     return await _post_json("gettrackinfo", payload)
 
 
+async def iter_trackinfo(numbers: List[str]):
+    """
+    get_trackinfo의 스트리밍 버전: 응답 전체를 메모리에 올리지 않고
+    accepted/result/list 배열의 track item을 도착하는 대로 하나씩 넘긴다.
+    """
+    payload = [{"number": n} for n in numbers[:40]]
+    decoder = TrackStreamDecoder()
+    async with _post_stream("gettrackinfo", payload) as r:
+        async for chunk in r.aiter_bytes():
+            for item in decoder.feed(chunk):
+                yield item
+    for item in decoder.close():
+        yield item
+
+
+def _split_track_item(item: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """track item → (운송장 번호, track 객체). v1: track, v2: track_info"""
+    num = item.get("number") or item.get("no") or item.get("tracking") or ""
+    track = item.get("track") or item.get("track_info") or item
+    return str(num) if num else "", track
+
+
 # Pydantic DTO
 class ShipmentDetailsIn(BaseModel):
     product_info: Optional[str] = None
@@ -706,6 +1389,7 @@ def _kcs_status_text(status: Optional[str]) -> str:
 def upsert_shipment_details(db, shipment_obj: Shipment, patch: Dict[str, Any]):
     if not patch:
         return None
+    _touch_shipments(db, shipment_obj.tracking_number)
     row = (
         db.query(ShipmentDetails)
           .filter(ShipmentDetails.shipment_id == shipment_obj.id)
@@ -714,6 +1398,7 @@ def upsert_shipment_details(db, shipment_obj: Shipment, patch: Dict[str, Any]):
     if row is None:
         row = ShipmentDetails(shipment_id=shipment_obj.id, tracking_number=shipment_obj.tracking_number)
         db.add(row)
+    old_origin = row.origin_country
 
     # 일반 문자열 필드
     for k in [
@@ -737,6 +1422,15 @@ def upsert_shipment_details(db, shipment_obj: Shipment, patch: Dict[str, Any]):
             if dtv:
                 setattr(row, k, dtv)
 
+    # 대시보드 집계: 출발국이 바뀐 경우만 옮김
+    if (row.origin_country or "") != (old_origin or ""):
+        _bump_aggregates(db, {("origin", old_origin or ""): [-1, 0], ("origin", row.origin_country or ""): [1, 0]})
+        point = _rollup_point(shipment_obj.cleared_at, shipment_obj.carrier, shipment_obj.duration_sec)
+        if point:
+            day, carrier, dur = point
+            _apply_rollup_deltas(db, [((day, old_origin or "", carrier), dur, -1),
+                                      ((day, row.origin_country or "", carrier), dur, 1)])
+
     db.flush()
     return row
 
@@ -754,61 +1448,32 @@ def _extract_details_best_effort_from_track(
     ti = _ti_view(track or {})
 
     # [ANCHOR:ORIGIN_V1_BCODE] v1 track.b(정수 국가코드) → ISO2 → 한글
-    # 참고: v1 문서의 country code 표는 https://res.17track.net/asset/carrier/info/country.all.json (권고)
-    # 최소 커버(즉시효과): 중국(301) 등 빈출만 내장, 나머지는 미해당 시 패스
-    V1_COUNTRY_INT_TO_ISO2 = {
-        301: "CN",   # China
-        2105: "FR",  # 프랑스 (문서 예시에 등장)
-        # 필요시 확장: 운영 중 로그 보고 추가
-    }
-
-    # 1) ISO2 → 한글 맵퍼 (기존)
-    def _map_iso2_ko(code: Optional[str]) -> Optional[str]:
-        if not code or not isinstance(code, str):
-            return None
-        c = code.strip().upper()
-        ISO2_KO = {
-            "CN":"중국","KR":"대한민국","JP":"일본","US":"미국","HK":"홍콩","TW":"대만","SG":"싱가포르",
-            "MY":"말레이시아","TH":"태국","VN":"베트남","ID":"인도네시아","DE":"독일","NL":"네덜란드",
-            "GB":"영국","FR":"프랑스","ES":"스페인","IT":"이탈리아","PL":"폴란드","TR":"튀르키예","AE":"아랍에미리트"
-        }
-        return ISO2_KO.get(c) if re.fullmatch(r"[A-Z]{2}", c) else None
-
-    # 1.5) v1 전용: track.b가 있으면 최우선 사용
+    # 국가표/운송사표는 origin_index.ORIGIN_INDEX (track_data/*.json, 프로세스당 1회 로드)
     if "origin_country" not in out:
-        b_code = track.get("b")
-        if isinstance(b_code, int):
-            iso2 = V1_COUNTRY_INT_TO_ISO2.get(b_code)
-            if iso2:
-                mapped = _map_iso2_ko(iso2)
-                if mapped:
-                    out["origin_country"] = mapped
-                    out["origin_country_source"] = "v1.track.b"
+        mapped = ORIGIN_INDEX.ko_from_int(track.get("b"))
+        if mapped:
+            out["origin_country"] = mapped
+            out["origin_country_source"] = "v1.track.b"
 
     # 1.6) UPU 트래킹번호 접미(예: *****CN) 힌트 (보조)
-    if "origin_country" not in out and isinstance(tracking_number, str) and tracking_number.strip().upper().endswith("CN"):
-        out["origin_country"] = "중국"
-        out["origin_country_source"] = "tracking_number_suffix"
+    if "origin_country" not in out:
+        mapped = ORIGIN_INDEX.ko_from_tracking_number(tracking_number)
+        if mapped:
+            out["origin_country"] = mapped
+            out["origin_country_source"] = "tracking_number_suffix"
 
-    # 2) 적출국 (우선순위: provider.country > shipping_info.shipper > 타임존 휴리스틱)
+    # 2) 적출국 (우선순위: provider.country/key/name > shipping_info.shipper > 타임존 휴리스틱)
     tracking_obj = ti.get("tracking") or track.get("tracking") or {}
     providers = tracking_obj.get("providers") or []
-    if providers:
-        provider_info = (providers[0].get("provider") or {})
-        prov_country = (provider_info.get("country") or "").strip().upper()
-        mapped = _map_iso2_ko(prov_country)
-        if mapped and "origin_country" not in out:
+    if providers and "origin_country" not in out:
+        mapped, source = ORIGIN_INDEX.ko_from_provider(providers[0].get("provider"))
+        if mapped:
             out["origin_country"] = mapped
-            out["origin_country_source"] = "provider.country"
-        if "origin_country" not in out:
-            prov_name = (provider_info.get("name") or "").lower()
-            if any(cn in prov_name for cn in ["aliexpress","cainiao","yanwen","yunexpress","china"]):
-                out["origin_country"] = "중국"
-                out["origin_country_source"] = "provider.name"
+            out["origin_country_source"] = source
 
     if "origin_country" not in out:
         ship = (ti.get("shipping_info") or {}).get("shipper_address") or {}
-        mapped = _map_iso2_ko((ship.get("country") or "").strip().upper())
+        mapped = ORIGIN_INDEX.ko_from_iso2(ship.get("country"))
         if mapped:
             out["origin_country"] = mapped
             out["origin_country_source"] = "shipping_info.shipper_address.country"
@@ -1045,6 +1710,11 @@ def _extract_raw_provider_events_min(track: Dict[str, Any]) -> list[dict]:
 async def health():
     return {"ok": True}
 
+@app.get("/admin/cache-stats")
+def admin_cache_stats():
+    """상세/이벤트 read-through 캐시 적중률"""
+    return shipment_read_cache.snapshot()
+
 
 @app.post("/webhooks/17track")
 async def webhook_17track(req: Request):
@@ -1058,21 +1728,29 @@ async def webhook_17track(req: Request):
     number = data.get("number")
     track  = data.get("track") or data.get("track_info") or data
     normalized = normalize_from_track(track)
-    summary    = summarize_customs(normalized)
-
     any_events = _count_raw_events(track) > 0
+    # 응답용 요약 (한 번 훑기) — 저장 경로의 요약은 writer가 저장된 상태에 새 이벤트만 반영
+    summary = summarize_customs(normalized)
     if summary.get("status") == "UNKNOWN" and any_events:
         summary["status"] = "PRE_CUSTOMS"
 
     details = _extract_details_best_effort_from_track(track, tracking_number=number)
     raw_provider_events = _extract_raw_provider_events_min(track)
+    if number:
+        # 저장은 group writer에 맡기고 바로 응답 (커밋은 기다리지 않음)
+        group_writer.submit_shipment({
+            "tracking_number": number,
+            "summary": {"status": "PRE_CUSTOMS"} if any_events else None, # 요약이 UNKNOWN일 때만 쓰는 힌트
+            "normalized": normalized,
+            "any_events": any_events,
+        })
     return {
         "ok": True,
         "event": event,
         "tracking_number": number,
-        "summary": summary,
         "normalized_count": len(normalized),
         "any_events": any_events,
+        "summary": summary,
         "details": details,
         "raw_provider_events": raw_provider_events,
     }
@@ -1080,76 +1758,38 @@ async def webhook_17track(req: Request):
 @app.get("/debug/normalize")
 async def debug_normalize(number: str):
     """폴링으로 실데이터 가져와 같은 정규화/요약을 실행(웹훅 미구축 시 점검용)."""
-    payload = await get_trackinfo([number])
-    
-    # API 응답 파싱
-    tracks: List[Dict[str, Any]] = []
-    if isinstance(payload, list):
-        tracks = payload
-    elif isinstance(payload, dict):
-        data_obj = payload.get("data")
-        if isinstance(data_obj, dict):
-            buckets: List[Dict[str, Any]] = []
-            for key in ("accepted", "result", "list"):
-                v = data_obj.get(key)
-                if isinstance(v, list):
-                    buckets.extend(v)
-            tracks = buckets
-        elif isinstance(payload.get("result"), list) or isinstance(payload.get("list"), list):
-            tracks = payload.get("result") or payload.get("list") or []
-        elif payload.get("number"):
-            tracks = [payload]
-
-    track_item: Optional[Dict[str, Any]] = None
-    for item in tracks:
-        if not isinstance(item, dict):
-            continue
-        if str(item.get("number") or item.get("no") or "") == str(number):
-            track_item = item
-            break
-
+    # API 응답을 스트리밍 디코드하며 해당 번호의 track만 취함
     track = None
-    if track_item:
-        # v1: track, v2: track_info
-        track = track_item.get("track") or track_item.get("track_info") or track_item
+    async with aclosing(iter_trackinfo([number])) as items:
+        async for item in items:
+            num, track_obj = _split_track_item(item)
+            if num == str(number):
+                track = track_obj
+                break
 
-    # ===== 핵심: provider에서 적출국 먼저 추출 =====
+    # ===== 핵심: provider에서 적출국 먼저 추출 (ORIGIN_INDEX 공용) =====
     origin_country = None
     origin_source = None
-    
+    providers: List[Dict[str, Any]] = []
+
     if track:
         # v1 API 구조 (실제 사용중)
         tracking = track.get("tracking") or {}
         providers = tracking.get("providers") or []
-        
+
         # v2 API 구조 대비
         if not providers:
             ti = _ti_view(track)
             tracking = ti.get("tracking") or {}
             providers = tracking.get("providers") or []
-        
-        if providers and len(providers) > 0:
-            provider_info = providers[0].get("provider", {})
-            
-            # 1. provider.country 직접 확인
-            prov_country = provider_info.get("country")
-            if prov_country == "CN":
-                origin_country = "중국"
-                origin_source = "provider.country"
-                print(f"[API] Found origin from provider.country: CN → 중국")
-            elif prov_country == "KR":
-                origin_country = "대한민국"
-                origin_source = "provider.country"
-            
-            # 2. provider.name으로 추론
-            if not origin_country:
-                prov_name = (provider_info.get("name") or "").lower()
-                if any(cn in prov_name for cn in ["aliexpress", "cainiao", "yanwen", "yunexpress", "china"]):
-                    origin_country = "중국"
-                    origin_source = "provider.name"
-                    print(f"[API] Found origin from provider.name: {provider_info.get('name')} → 중국")
-            
-            # 3. 첫 이벤트의 타임존으로 추론
+
+        if providers:
+            # 1. provider.country / provider.key / provider.name
+            origin_country, origin_source = ORIGIN_INDEX.ko_from_provider(providers[0].get("provider"))
+            if origin_country:
+                print(f"[API] Found origin from {origin_source}: {origin_country}")
+
+            # 2. 첫 이벤트의 타임존으로 추론
             if not origin_country:
                 events = providers[0].get("events", [])
                 for e in events[:3]:  # 초기 3개 이벤트만
@@ -1229,37 +1869,90 @@ async def test_webhook(event: str = "TRACKING_UPDATED", number: str = "RB1234567
     payload = {"sign": sign, "event": event, "data": data}
     return payload
 
-def _serialize_normalized(ev_list):
-    try:
-        return json.dumps([
-            {
-                "ts": (e["ts"].isoformat() if hasattr(e["ts"], "isoformat") else str(e["ts"])),
-                "stage": e["stage"],
-                "desc": e.get("desc", ""),
-                "location": e.get("location", None),
-            } for e in ev_list
-        ], ensure_ascii=False)
-    except Exception:
-        return json.dumps([], ensure_ascii=False)
+def _serialize_normalized(ev_list) -> bytes:
+    """
+    정규화 타임라인 -> Shipment.normalized_bin 저장용 바이너리 (열 단위 + 사전 코딩 + zlib)
+    인코딩할 수 없으면(ts 해석 불가 등) 예외 그대로 — 빈 타임라인으로 바꿔 저장하면 기존 타임라인을 잃는다
+    """
+    return timeline_codec.encode_timeline(ev_list)
 
-def _upsert_events_for_shipment(
-    db,
-    shipment_obj: Shipment,
-    normalized_events: List[Dict[str, Any]],
-    source: str = "normalized",
-) -> int:
+def _event_fingerprint(ts, stage: Optional[str], desc: Optional[str]) -> int:
+    """(UTC ts, stage, 공백 정규화 desc)의 64비트 지문 (signed, BIGINT 범위)"""
+    key = "\x1f".join((_as_utc(ts).isoformat(), stage or "", " ".join((desc or "").split())))
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+def _migrate_event_fingerprint(batch: int = 5000):
     """
-    normalized_events 아이템 예시:
-    { "ts": "2025-09-16T13:30:00Z", "stage": "IN_PROGRESS", "desc": "..." }
+    shipment_events 중복 키 전환 (기존 DB에서 1회):
+      1) fingerprint가 빈 행 채우기
+      2) 옛 UNIQUE (shipment_id, ts, stage, desc) → UNIQUE (shipment_id, fingerprint)
+         sqlite는 제약을 지울 수 없으므로 테이블 재생성 (공백만 다른 중복은 하나만 남김)
+    옛 UNIQUE가 없으면 이미 전환된 DB(또는 새 DB) → 바로 끝 (기동마다 이벤트 테이블 전체를 훑지 않음)
     """
-    if not normalized_events:
-        return 0
+    E = ShipmentEvent.__table__
+    if not _has_legacy_event_unique():
+        return
+    with engine.begin() as conn:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                select(E.c.id, E.c.ts, E.c.stage, E.c.desc)
+                  .where(E.c.id > last_id, E.c.fingerprint.is_(None))
+                  .order_by(E.c.id)
+                  .limit(batch)
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                update(E).where(E.c.id == bindparam("b_id")).values(fingerprint=bindparam("b_fp")),
+                [{"b_id": r.id, "b_fp": _event_fingerprint(r.ts, r.stage, r.desc)} for r in rows],
+            )
+            last_id = rows[-1].id
+
+        quote = conn.dialect.identifier_preparer.quote
+        cols = ", ".join(quote(c.name) for c in E.columns)
+        if conn.dialect.name == "sqlite":
+            legacy = f"{E.name}_legacy"
+            conn.exec_driver_sql(f"ALTER TABLE {E.name} RENAME TO {legacy}")
+            for idx in inspect(conn).get_indexes(legacy):
+                conn.exec_driver_sql(f"DROP INDEX {quote(idx['name'])}")
+            E.create(conn)
+            conn.exec_driver_sql(f"INSERT OR IGNORE INTO {E.name} ({cols}) SELECT {cols} FROM {legacy} ORDER BY id")
+            conn.exec_driver_sql(f"DROP TABLE {legacy}")
+            # 테이블과 함께 지워진 검색 트리거는 _ensure_search_index가 다시 만든다
+            # 이벤트 색인(외부 콘텐츠, 행 id 기준)은 중복 제거로 사라진 행이 남지 않게 다시 채움
+            if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'event_fts'").first():
+                conn.exec_driver_sql("INSERT INTO event_fts (event_fts) VALUES ('rebuild')")
+        else:
+            conn.exec_driver_sql(f"ALTER TABLE {E.name} DROP CONSTRAINT uq_shipment_event_dedup")
+            conn.exec_driver_sql(
+                f"DELETE FROM {E.name} a USING {E.name} b "
+                f"WHERE a.shipment_id = b.shipment_id AND a.fingerprint = b.fingerprint AND a.id > b.id"
+            )
+            conn.exec_driver_sql(f"ALTER TABLE {E.name} ALTER COLUMN fingerprint SET NOT NULL")
+            conn.execute(AddConstraint(next(c for c in E.constraints if c.name == "uq_shipment_event_fp")))
 
-    # 1) 입력단 중복 제거 (동일 페이로드가 같은 요청 내에서 여러 번 들어오는 경우 방어)
-    seen: set[tuple[str, str, str]] = set()
+def _has_legacy_event_unique() -> bool:
+    insp = inspect(engine)
+    if not insp.has_table(ShipmentEvent.__tablename__):
+        return False
+    names = {u["name"] for u in insp.get_unique_constraints(ShipmentEvent.__tablename__)}
+    return "uq_shipment_event_dedup" in names
+
+_migrate_event_fingerprint()
+
+def _event_rows(
+    shipment_id: int,
+    tracking_number: str,
+    normalized_events: List[Dict[str, Any]],
+    source: str = "normalized",
+) -> List[Dict[str, Any]]:
+    """shipment_events INSERT용 행 목록 (입력단 중복 제거 포함)"""
+    # 입력단 중복 제거 (동일 페이로드가 같은 요청 내에서 여러 번 들어오는 경우 방어)
+    seen: set[int] = set()
     rows: List[Dict[str, Any]] = []
 
-    for e in normalized_events:
+    for e in normalized_events or []:
         raw_ts = e.get("ts")
         stage = (e.get("stage") or "").strip().upper()
         desc = (e.get("desc") or "").strip()
@@ -1276,121 +1969,527 @@ def _upsert_events_for_shipment(
         # 필요하면 미세중복 방지용으로 마이크로초 제거 (선택)
         # ts_dt = ts_dt.replace(microsecond=0)
 
-        key = (ts_dt.isoformat(), stage, desc)
-        if key in seen:
+        fp = _event_fingerprint(ts_dt, stage, desc)
+        if fp in seen:
             continue
-        seen.add(key)
+        seen.add(fp)
+
+        # 접힌 반복 스캔 (compact_timeline): 지문은 첫 시각 기준, 마지막 시각/횟수는 따로
+        repeat = int(e.get("repeat") or 1)
+        last_ts = e.get("last_ts") if repeat > 1 else None
+        try:
+            last_dt = (dtp.parse(last_ts) if isinstance(last_ts, str) else last_ts) if last_ts else None
+        except Exception:
+            last_dt = None
 
         rows.append({
-            "shipment_id": shipment_obj.id,
-            "tracking_number": shipment_obj.tracking_number,
+            "shipment_id": shipment_id,
+            "tracking_number": tracking_number,
             "ts": ts_dt,
             "stage": stage,
             "desc": desc, # 컬럼명은 desc (SQLAlchemy가 적절히 quoting)
             "source": source,
+            "fingerprint": fp,
+            "last_ts": last_dt,
+            "repeat": repeat if repeat > 1 else None,
         })
+    return rows
 
-    if not rows:
+# [ANCHOR: UPSERT_DIALECT] dialect별 네이티브 충돌 처리 (ON CONFLICT)
+# sqlite / postgresql 은 on_conflict_do_update / on_conflict_do_nothing / excluded API가 동일
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": pg_insert}
+_EVENT_COLUMNS = ("shipment_id", "tracking_number", "ts", "stage", "desc", "source", "fingerprint", "last_ts", "repeat")
+_EVENT_CONFLICT = ["shipment_id", "fingerprint"] # UNIQUE (shipment_id, fingerprint)
+
+def _on_event_conflict(ins):
+    """
+    같은 이벤트(지문)면 새로 넣지 않되, 접힌 반복 스캔이 늘었으면 마지막 시각/횟수만 갱신
+    (RETURNING에는 새 행 + 늘어난 행만 나옴)
+    """
+    E = ShipmentEvent.__table__
+    return ins.on_conflict_do_update(
+        index_elements=_EVENT_CONFLICT,
+        set_={"last_ts": ins.excluded.last_ts, "repeat": ins.excluded.repeat},
+        where=ins.excluded.repeat > func.coalesce(E.c.repeat, 1),
+    )
+PG_COPY_MIN_ROWS = int(os.getenv("PG_COPY_MIN_ROWS", "1000")) # 이 이상이면 COPY 로더 사용
+
+def _upsert_insert(db, tbl):
+    """세션이 바인드된 DB의 dialect에 맞는 INSERT (ON CONFLICT 지원)"""
+    name = db.get_bind().dialect.name
+    try:
+        return _UPSERT_INSERTS[name](tbl)
+    except KeyError:
+        raise RuntimeError(f"upsert를 지원하지 않는 DB dialect: {name}")
+
+# [ANCHOR: CHANGE_LOG] 변경 로그 append (쓰기 트랜잭션 안에서만 호출)
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "7")) # 0이면 정리 안 함
+_CHANGE_LOG_LOCK = 0x17C4A6E5 # pg advisory lock 키
+
+def _record_changes(db, changes: List[Dict[str, Any]]):
+    """
+    changes: [{"shipment_id", "tracking_number", "kind", "last_status"(선택), "count"(선택)}]
+    커서(id)는 커밋 순서와 같아야 한다: sqlite는 쓰기 트랜잭션이 하나뿐이고,
+    postgresql은 트랜잭션 단위 advisory lock으로 로그를 쓰는 트랜잭션을 직렬화한다.
+    """
+    if not changes:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _CHANGE_LOG_LOCK})
+    db.execute(
+        ShipmentChange.__table__.insert(),
+        [{"last_status": None, "count": None, **c} for c in changes],
+    )
+    db.info["changes_recorded"] = True
+
+def _prune_change_log(db, cutoff: datetime, batch: int = 5000) -> int:
+    """cutoff 이전 변경 로그를 오래된 id부터 batch건 삭제 (id/created_at 모두 증가하므로 앞에서부터 잘림)"""
+    C = ShipmentChange.__table__
+    upto = db.execute(
+        select(C.c.id).where(C.c.created_at < cutoff).order_by(C.c.id).offset(batch - 1).limit(1)
+    ).scalar()
+    if upto is None:
+        upto = db.execute(select(func.max(C.c.id)).where(C.c.created_at < cutoff)).scalar()
+    if upto is None:
         return 0
+    return db.execute(C.delete().where(C.c.id <= upto)).rowcount or 0
+
+# [ANCHOR: AGGREGATES] 대시보드 집계 카운터 증분 갱신
+# 소요시간 히스토그램 구간 (상한 시간, 라벨), 마지막은 상한 없음
+DURATION_BUCKETS = ((6, "<6h"), (12, "6-12h"), (24, "12-24h"), (48, "1-2d"), (72, "2-3d"), (120, "3-5d"), (168, "5-7d"))
+DURATION_BUCKET_LAST = "7d+"
+
+def _duration_bucket(sec: int) -> str:
+    for hours, label in DURATION_BUCKETS:
+        if sec < hours * 3600:
+            return label
+    return DURATION_BUCKET_LAST
+
+def _agg_state(row) -> Tuple[Optional[str], Optional[str], int, Optional[int]]:
+    """집계에 영향을 주는 shipments 값 (ORM 객체 / Row 공통)"""
+    return (row.last_status, row.carrier, int(row.has_delay or 0), row.duration_sec)
+
+def _agg_add(deltas: Dict[Tuple[str, str], List[int]], state, sign: int):
+    status, carrier, has_delay, duration = state
+    keys = [("total", "", 0), ("status", status or "UNKNOWN", 0), ("carrier", carrier or "", 0)]
+    if has_delay:
+        keys.append(("delay", "", 0))
+    if duration is not None:
+        keys.append(("duration", "", duration))
+        keys.append(("duration_hist", _duration_bucket(duration), duration))
+    for dim, key, dur in keys:
+        d = deltas.setdefault((dim, key), [0, 0])
+        d[0] += sign
+        d[1] += sign * dur
+
+def _agg_transition(deltas, before, after, new_origin: bool = False):
+    """before/after: _agg_state 결과 (신규면 before=None). 신규 운송장은 출발국 미상("")으로 1건 추가"""
+    if before is not None:
+        _agg_add(deltas, before, -1)
+    _agg_add(deltas, after, 1)
+    if new_origin:
+        deltas.setdefault(("origin", ""), [0, 0])[0] += 1
+
+def _bump_aggregates(db, deltas: Dict[Tuple[str, str], List[int]]):
+    rows = [
+        {"dim": dim, "key": key, "count": c, "duration_sum": d}
+        for (dim, key), (c, d) in deltas.items() if c or d
+    ]
+    if not rows:
+        return
+    A = ShipmentAggregate.__table__
+    ins = _upsert_insert(db, A)
+    db.execute(
+        ins.on_conflict_do_update(
+            index_elements=["dim", "key"],
+            set_={"count": A.c.count + ins.excluded.count, "duration_sum": A.c.duration_sum + ins.excluded.duration_sum},
+        ),
+        rows,
+    )
 
-    # 2) DB 레벨 중복 무시 (UNIQUE (shipment_id, ts, stage, desc))
-    stmt = sqlite_insert(ShipmentEvent).values(rows).on_conflict_do_nothing(
-        index_elements=["shipment_id", "ts", "stage", "desc"]
+def _rebuild_aggregates(db) -> int:
+    """집계 테이블을 shipments/shipment_details에서 다시 계산 (한 트랜잭션, 쓰기 스레드에서)"""
+    S, D, A = Shipment.__table__, ShipmentDetails.__table__, ShipmentAggregate.__table__
+    bucket = case(
+        *[(S.c.duration_sec < hours * 3600, label) for hours, label in DURATION_BUCKETS],
+        else_=DURATION_BUCKET_LAST,
     )
-    result = db.execute(stmt)
-    # 일부 드라이버에서 rowcount 가 None일 수 있으므로 보조 지표로만 사용
-    return result.rowcount or 0
+    has_duration = S.c.duration_sec.is_not(None)
+    def dim(name, key, dur=literal(0)):
+        return select(literal(name), key, func.count(), dur).select_from(S)
+
+    queries = [
+        dim("total", literal("")),
+        dim("status", func.coalesce(S.c.last_status, "UNKNOWN")).group_by(func.coalesce(S.c.last_status, "UNKNOWN")),
+        dim("carrier", func.coalesce(S.c.carrier, "")).group_by(func.coalesce(S.c.carrier, "")),
+        dim("origin", func.coalesce(D.c.origin_country, ""))
+          .select_from(S.outerjoin(D, D.c.shipment_id == S.c.id))
+          .group_by(func.coalesce(D.c.origin_country, "")),
+        dim("delay", literal("")).where(S.c.has_delay > 0),
+        dim("duration", literal(""), func.sum(S.c.duration_sec)).where(has_duration),
+        dim("duration_hist", bucket, func.sum(S.c.duration_sec)).where(has_duration).group_by(bucket),
+    ]
+    db.execute(A.delete())
+    rows = [
+        {"dim": d, "key": k, "count": int(c), "duration_sum": int(dur or 0)}
+        for q in queries for d, k, c, dur in db.execute(q)
+        if c
+    ]
+    if rows:
+        db.execute(A.insert(), rows)
+    return len(rows)
+
+def _rebuild_aggregates_if_empty(db) -> int:
+    # 집계 도입 직후(테이블 비어 있음) 1회 재계산
+    if db.execute(select(ShipmentAggregate.dim).limit(1)).first() is not None:
+        return 0
+    if db.execute(select(Shipment.id).limit(1)).first() is None:
+        return 0
+    return _rebuild_aggregates(db)
+
+# [ANCHOR: CLEARANCE_ROLLUP] 일별 통관 소요시간 롤업 증분 갱신
+RollupGroup = Tuple[date, str, str] # (day, origin_country, carrier)
+
+def _rollup_point(cleared_at, carrier: Optional[str], duration_sec: Optional[int]) -> Optional[Tuple[date, str, int]]:
+    """운송장이 롤업에 기여하는 (통관완료 일자, carrier, 소요초) — 통관완료 전이면 None"""
+    if cleared_at is None or duration_sec is None:
+        return None
+    return (_as_utc(cleared_at).date(), carrier or "", int(duration_sec))
+
+def _apply_rollup_moves(db, moves: List[Tuple[int, Optional[tuple], Optional[tuple]]]):
+    """moves: [(shipment_id, 이전 점, 이후 점)]. 출발국은 shipment_details 값 (운송장 쓰기로는 바뀌지 않음)"""
+    if not moves:
+        return
+    D = ShipmentDetails.__table__
+    origins = dict(db.execute(
+        select(D.c.shipment_id, D.c.origin_country).where(D.c.shipment_id.in_([m[0] for m in moves]))
+    ).all())
+    deltas: List[Tuple[RollupGroup, int, int]] = []
+    for sid, before, after in moves:
+        origin = origins.get(sid) or ""
+        if before:
+            deltas.append(((before[0], origin, before[1]), before[2], -1))
+        if after:
+            deltas.append(((after[0], origin, after[1]), after[2], 1))
+    _apply_rollup_deltas(db, deltas)
+
+def _rollup_minmax(db, group: RollupGroup) -> Tuple[Optional[int], Optional[int]]:
+    # 경계값(min/max)이 빠지면 그 그룹만 원본에서 다시 (통관완료 일자 인덱스 범위)
+    day, origin, carrier = group
+    S, D = Shipment.__table__, ShipmentDetails.__table__
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return db.execute(
+        select(func.min(S.c.duration_sec), func.max(S.c.duration_sec))
+          .select_from(S.outerjoin(D, D.c.shipment_id == S.c.id))
+          .where(S.c.cleared_at >= start, S.c.cleared_at < start + timedelta(days=1),
+                 S.c.duration_sec.is_not(None),
+                 func.coalesce(S.c.carrier, "") == carrier,
+                 func.coalesce(D.c.origin_country, "") == origin)
+    ).one()
+
+def _apply_rollup_deltas(db, deltas: List[Tuple[RollupGroup, int, int]]):
+    """deltas: [((day, origin, carrier), 소요초, +1/-1)] — 해당 그룹 행만 읽어 갱신"""
+    if not deltas:
+        return
+    db.flush() # 경계값 재계산이 ORM 변경분을 보도록
+    R = ClearanceRollup.__table__
+    key = tuple_(R.c.day, R.c.origin_country, R.c.carrier)
+    groups = list({g for g, _, _ in deltas})
+    current = {}
+    for part in _chunked(groups, 300): # 바인드 변수 수 제한
+        current.update({(r.day, r.origin_country, r.carrier): r for r in db.execute(select(R).where(key.in_(part)))})
+    state: Dict[RollupGroup, Dict[str, Any]] = {}
+    for g in groups:
+        r = current.get(g)
+        state[g] = {
+            "count": r.count if r else 0,
+            "duration_sum": r.duration_sum if r else 0,
+            "duration_min": r.duration_min if r else None,
+            "duration_max": r.duration_max if r else None,
+            "sketch": quantile_sketch.loads(r.sketch if r else None),
+            "stale": False,
+        }
+    for g, dur, sign in deltas:
+        st = state[g]
+        st["count"] += sign
+        st["duration_sum"] += sign * dur
+        quantile_sketch.add(st["sketch"], dur, sign)
+        if sign > 0:
+            st["duration_min"] = dur if st["duration_min"] is None else min(st["duration_min"], dur)
+            st["duration_max"] = dur if st["duration_max"] is None else max(st["duration_max"], dur)
+        elif dur in (st["duration_min"], st["duration_max"]):
+            st["stale"] = True
+
+    gone, rows = [], []
+    for g, st in state.items():
+        if st["count"] <= 0:
+            gone.append(g)
+            continue
+        if st["stale"]:
+            st["duration_min"], st["duration_max"] = _rollup_minmax(db, g)
+        rows.append({
+            "day": g[0], "origin_country": g[1], "carrier": g[2],
+            "count": st["count"], "duration_sum": st["duration_sum"],
+            "duration_min": st["duration_min"], "duration_max": st["duration_max"],
+            "sketch": quantile_sketch.dumps(st["sketch"]),
+        })
+    for part in _chunked(gone, 300):
+        db.execute(R.delete().where(key.in_(part)))
+    if rows:
+        ins = _upsert_insert(db, R)
+        db.execute(
+            ins.on_conflict_do_update(
+                index_elements=["day", "origin_country", "carrier"],
+                set_={k: ins.excluded[k] for k in rows[0] if k not in ("day", "origin_country", "carrier")},
+            ),
+            rows,
+        )
+
+def _rebuild_clearance_rollups(db) -> int:
+    """롤업 테이블을 shipments/shipment_details에서 다시 계산 (한 트랜잭션, 쓰기 스레드에서)"""
+    S, D, R = Shipment.__table__, ShipmentDetails.__table__, ClearanceRollup.__table__
+    db.execute(R.delete())
+    deltas = [
+        ((p[0], origin or "", p[1]), p[2], 1)
+        for cleared_at, carrier, duration, origin in db.execute(
+            select(S.c.cleared_at, S.c.carrier, S.c.duration_sec, D.c.origin_country)
+              .select_from(S.outerjoin(D, D.c.shipment_id == S.c.id))
+              .where(S.c.cleared_at.is_not(None), S.c.duration_sec.is_not(None))
+        )
+        for p in [_rollup_point(cleared_at, carrier, duration)]
+    ]
+    _apply_rollup_deltas(db, deltas)
+    return len({g for g, _, _ in deltas})
+
+def _rebuild_clearance_rollups_if_empty(db) -> int:
+    # 롤업 도입 직후(테이블 비어 있음) 1회 재계산
+    if db.execute(select(ClearanceRollup.day).limit(1)).first() is not None:
+        return 0
+    if db.execute(select(Shipment.id).where(Shipment.cleared_at.is_not(None)).limit(1)).first() is None:
+        return 0
+    return _rebuild_clearance_rollups(db)
+
+def _record_event_changes(db, inserted) -> int:
+    # inserted: RETURNING (shipment_id, tracking_number) 행들 → 운송장별 events 변경 1줄
+    per_ship: Dict[Tuple[int, str], int] = {}
+    for sid, num in inserted:
+        per_ship[(sid, num)] = per_ship.get((sid, num), 0) + 1
+    _record_changes(db, [
+        {"shipment_id": sid, "tracking_number": num, "kind": "events", "count": n}
+        for (sid, num), n in per_ship.items()
+    ])
+    return sum(per_ship.values())
+
+_PG_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _pg_copy_field(v) -> str:
+    if v is None:
+        return "\\N"
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return str(v).translate(_PG_COPY_ESCAPES)
+
+def _copy_event_rows_pg(db, rows: List[Dict[str, Any]]) -> int:
+    """
+    PostgreSQL 대량 이벤트 로더.
+    COPY는 충돌 처리를 못 하므로 세션 임시 테이블로 COPY → INSERT ... SELECT ON CONFLICT (접힌 반복 스캔만 갱신).
+    psycopg(3) / psycopg2 드라이버 모두 지원.
+    """
+    cols = ", ".join(f'"{c}"' for c in _EVENT_COLUMNS)
+    db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS _event_stage ON COMMIT DELETE ROWS AS "
+        f"SELECT {cols} FROM {ShipmentEvent.__tablename__} WITH NO DATA"
+    ))
+    copy_sql = f"COPY _event_stage ({cols}) FROM STDIN"
+    raw = db.connection().connection.driver_connection
+    with raw.cursor() as cur:
+        if hasattr(cur, "copy"):  # psycopg 3
+            with cur.copy(copy_sql) as cp:
+                for r in rows:
+                    cp.write_row(tuple(r[c] for c in _EVENT_COLUMNS))
+        else:  # psycopg2: COPY text 포맷 (NULL=\N, 빈 문자열과 구분)
+            buf = io.StringIO()
+            for r in rows:
+                buf.write("\t".join(_pg_copy_field(r[c]) for c in _EVENT_COLUMNS) + "\n")
+            buf.seek(0)
+            cur.copy_expert(copy_sql, buf)
+
+    stage = table("_event_stage", *(column(c) for c in _EVENT_COLUMNS))
+    E = ShipmentEvent.__table__
+    ins = pg_insert(E).from_select(list(_EVENT_COLUMNS), select(stage))
+    inserted = db.execute(_on_event_conflict(ins).returning(E.c.shipment_id, E.c.tracking_number)).all()
+    # 같은 트랜잭션에서 다시 호출될 수 있으므로 즉시 비움
+    db.execute(text("TRUNCATE _event_stage"))
+    return _record_event_changes(db, inserted)
+
+def _insert_event_rows(db, rows: List[Dict[str, Any]]) -> int:
+    if not rows:
+        return 0
+    _touch_shipments(db, *{r["tracking_number"] for r in rows})
+    if db.get_bind().dialect.name == "postgresql" and len(rows) >= PG_COPY_MIN_ROWS:
+        return _copy_event_rows_pg(db, rows)
+    # DB 레벨 중복 무시 (UNIQUE (shipment_id, fingerprint)), 접힌 반복 스캔만 갱신
+    # RETURNING은 실제로 들어가거나 바뀐 행만 돌려줌 → 정확한 건수 + 변경 로그
+    E = ShipmentEvent.__table__
+    stmt = _on_event_conflict(_upsert_insert(db, E)).returning(E.c.shipment_id, E.c.tracking_number)
+    return _record_event_changes(db, db.execute(stmt, rows).all())
+
+def _upsert_events_for_shipment(
+    db,
+    shipment_obj: Shipment,
+    normalized_events: List[Dict[str, Any]],
+    source: str = "normalized",
+) -> int:
+    """
+    normalized_events 아이템 예시:
+    { "ts": "2025-09-16T13:30:00Z", "stage": "IN_PROGRESS", "desc": "..." }
+    """
+    if not normalized_events:
+        return 0
+    rows = _event_rows(shipment_obj.id, shipment_obj.tracking_number, normalized_events, source)
+    return _insert_event_rows(db, _drop_archived(
+        rows, shipment_obj.events_archived_until, shipment_obj.events_archive_parts,
+    ))
 
-def upsert_shipment(db, tracking_number: str, summary: Dict[str, Any], normalized_events: List[Dict[str, Any]], any_events: bool = False, carrier: Optional[str] = None):
+def _drop_archived(rows: List[Dict[str, Any]], archived_until, archive_parts: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    보관본에 이미 있는 이벤트는 hot 테이블에 다시 넣지 않음.
+    보관 구간(archived_until 이하)이라도 보관본에 없는 이벤트(보관 뒤 늦게 들어온 과거 시각)는 hot에 넣는다
+    → 조회는 hot + 보관본을 합쳐 정렬하고, 다음 보관 작업이 옮긴다
+    """
+    if not archived_until or not rows:
+        return rows
+    cut = _as_utc(archived_until)
+    if all(_as_utc(r["ts"]) > cut for r in rows):
+        return rows
+    archived = _archived_fingerprints(rows[0]["shipment_id"], archive_parts)
+    return [r for r in rows if _as_utc(r["ts"]) > cut or r["fingerprint"] not in archived]
+
+def _cleared_regressed(state: CustomsSummaryState, incoming: CustomsSummaryState) -> bool:
+    """incoming cleared 시간이 기존보다 과거면 True (역행 방어)"""
+    # 뒤에 붙은 이벤트만 반영한 경우(absorb가 같은 객체 반환)는 cleared가 앞당겨질 수 없음
+    if incoming is state or not (incoming.cleared and state.cleared):
+        return False
+    return incoming.cleared < state.cleared
+
+def _incoming_status(state: CustomsSummaryState, hint: Optional[str]) -> str:
+    # 요약으로 판단이 안 되면(UNKNOWN) 호출부 힌트(예: 웹훅의 PRE_CUSTOMS) 사용
+    status = state.status
+    return (hint or status) if status == "UNKNOWN" else status
+
+def _regressed_status(incoming_status: Optional[str], last_status: Optional[str]) -> Optional[str]:
+    # 역행이어도 상태가 더 상세하면 보완(예: existing UNKNOWN -> incoming CLEARED)
+    if STAGE_PRIORITY.get(incoming_status, 99) > STAGE_PRIORITY.get(last_status or "UNKNOWN", -1):
+        return incoming_status
+    return last_status
+
+def _auto_details_patch(incoming_status: Optional[str], normalized_events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # 상태 텍스트는 내부 요약 → 한국식 표현으로 보조 매핑
+    auto_patch = {
+        "clearance_status_text": _kcs_status_text(incoming_status),
+        "progress_status_text": _kcs_status_text(incoming_status),
+    }
+    # 최신 이벤트 → 처리일시(이벤트기준)
+    if normalized_events:
+        latest = normalized_events[-1]
+        if latest.get("ts"):
+            auto_patch["event_processed_at"] = (
+                latest["ts"] if isinstance(latest["ts"], str) else latest["ts"].isoformat()
+            )
+    # 동기화 기준 처리일시(업서트 수행 시각)
+    auto_patch["sync_processed_at"] = datetime.now(timezone.utc).isoformat()
+    return auto_patch
+
+def upsert_shipment(db, tracking_number: str, summary: Optional[Dict[str, Any]], normalized_events: List[Dict[str, Any]], any_events: bool = False, carrier: Optional[str] = None):
     """
     안전 업서트:
+      - 요약은 저장된 상태에 새 이벤트만 반영 (CustomsSummaryState.absorb) — summary는 상태 힌트만 (선택)
       - 만약 기존 레코드가 있고 incoming cleared 시간이 기존보다 과거면 무시(역행 방어)
-      - normalized/events 는 문자열로 저장(간단히)
+      - normalized 는 바이너리(normalized_bin)로 저장
     """
     try:
+        _touch_shipments(db, tracking_number)
         obj = db.query(Shipment).filter(Shipment.tracking_number == str(tracking_number)).one_or_none()
-        normalized_json = _serialize_normalized(normalized_events)
+        # 요약 상태는 전체 타임라인으로, 저장(타임라인/이벤트 행)은 접힌 타임라인으로
+        stored_events = compact_timeline(normalized_events) if TIMELINE_COMPACT else normalized_events
+        normalized_bin = _serialize_normalized(stored_events)
         now = datetime.now(timezone.utc)
-        incoming_status = summary.get("status")
-        incoming_cleared_at = summary.get("cleared_at")
-        incoming_in_progress_at = summary.get("in_progress_at")
+        status_hint = (summary or {}).get("status")
+
+        before = None if obj is None else (obj.last_status, _as_utc(obj.last_event_ts), obj.normalized_count)
+        agg_before = None if obj is None else _agg_state(obj)
+        rollup_before = None if obj is None else _rollup_point(obj.cleared_at, obj.carrier, obj.duration_sec)
+        agg_deltas: Dict[Tuple[str, str], List[int]] = {}
 
         if obj is None:
+            state = CustomsSummaryState()
+            state.feed_many(normalized_events)
+            incoming_status = _incoming_status(state, status_hint)
             obj = Shipment(
                 tracking_number=str(tracking_number),
                 carrier=carrier,
                 last_status=incoming_status,
                 last_event=(normalized_events[-1]["desc"] if normalized_events else None),
-                normalized=normalized_json,
-                normalized_count=len(normalized_events),
+                normalized_bin=normalized_bin,
+                normalized_count=len(stored_events),
                 any_events=1 if any_events else 0,
             )
+            state.apply_to(obj)
+            db.add(obj)
+            db.flush() # id 확보 (상세/이벤트 FK)
+        else:
+            # 기존 레코드가 있다면 역행/중복 방어 로직
+            # 기존 요약 상태(cleared_at 등)는 shipments 컬럼에서 바로 읽음
+            stored_state = CustomsSummaryState.from_shipment(obj)
+            state = stored_state.absorb(normalized_events)
+            incoming_status = _incoming_status(state, status_hint)
+
+            # 만약 incoming cleared가 있고 existing_cleared가 더 최신이면, incoming를 무시 (역행 방어)
+            if _cleared_regressed(stored_state, state):
+                # 역행하므로 요약만 업데이트하지 않고 무시 (상태 보완만)
+                obj.last_status = _regressed_status(incoming_status, obj.last_status)
+                # normalized는 더 긴 것이 있으면 교체하지 않음
+                obj.any_events = int(any_events or obj.any_events)
+                if obj.last_status != before[0]:
+                    _record_changes(db, [{"shipment_id": obj.id, "tracking_number": obj.tracking_number,
+                                          "kind": "shipment", "last_status": obj.last_status}])
+                    _agg_transition(agg_deltas, agg_before, _agg_state(obj))
+                    _bump_aggregates(db, agg_deltas)
+                return obj
+
+            # 일반 업서트: 더 최신 정보로 교체 (요약 상태는 absorb에서 이미 반영)
+            state.apply_to(obj)
+            obj.carrier = carrier or obj.carrier
+            obj.last_status = (state.status if state.last_ts else None) or incoming_status or obj.last_status
+            obj.last_event = (normalized_events[-1]["desc"] if normalized_events else obj.last_event)
+            obj.normalized_bin = normalized_bin
+            obj.normalized = None
+            obj.normalized_count = len(stored_events)
+            obj.any_events = int(any_events or obj.any_events)
+            obj.updated_at = now
             db.add(obj)
-            db.flush()
-            return obj
-
-        # 기존 레코드가 있다면 역행/중복 방어 로직
-        # 기존의 cleared_at 혹은 in_progress_at을 normalized에서 추출해 비교 (간단하게 문자열 검색)
-        try:
-            existing_norm = json.loads(obj.normalized or "[]")
-            existing_cleared = None
-            for e in existing_norm:
-                if e.get("stage") == "CLEARED":
-                    existing_cleared = e.get("ts")
-                    break
-        except Exception:
-            existing_cleared = None
-
-        # 만약 incoming cleared가 있고 existing_cleared가 더 최신이면, incoming를 무시 (역행 방어)
-        if incoming_cleared_at and existing_cleared:
-            try:
-                existing_dt = dtp.parse(existing_cleared)
-                incoming_dt = dtp.parse(incoming_cleared_at)
-                if incoming_dt < existing_dt:
-                    # 역행하므로 요약만 업데이트하지 않고 무시
-                    # 단, 상태가 더 상세하면 보완(예: existing UNKNOWN -> incoming CLEARED)
-                    if STAGE_PRIORITY.get(incoming_status, 99) > STAGE_PRIORITY.get(obj.last_status or "UNKNOWN", -1):
-                        obj.last_status = incoming_status
-                    # normalized는 더 긴 것이 있으면 교체하지 않음
-                    obj.any_events = int(any_events or obj.any_events)
-                    return obj
-            except Exception:
-                pass
-
-        # 일반 업서트: 더 최신 정보로 교체
-        obj.carrier = carrier or obj.carrier
-        obj.last_status = incoming_status or obj.last_status
-        obj.last_event = (normalized_events[-1]["desc"] if normalized_events else obj.last_event)
-        obj.normalized = normalized_json
-        obj.normalized_count = len(normalized_events)
-        obj.any_events = int(any_events or obj.any_events)
-        obj.updated_at = now
-        db.add(obj)
 
+        # 신규/갱신 모두 같은 트랜잭션에서 상세·이벤트까지 기록 (조회 경로는 쓰지 않음)
         # --- 자동 상세 채움(가능한 범위) ---
-        # 상태 텍스트는 내부 요약 → 한국식 표현으로 보조 매핑
-        auto_patch = {
-            "clearance_status_text": _kcs_status_text(incoming_status),
-            "progress_status_text": _kcs_status_text(incoming_status),
-        }
-        # 최신 이벤트 → 처리일시(이벤트기준)
-        if normalized_events:
-            latest = normalized_events[-1]
-            if latest.get("ts"):
-                auto_patch["event_processed_at"] = (
-                    latest["ts"] if isinstance(latest["ts"], str) else latest["ts"].isoformat()
-                )
-        # 동기화 기준 처리일시(업서트 수행 시각)
-        auto_patch["sync_processed_at"] = datetime.now(timezone.utc).isoformat()
-
         # 17TRACK payload에서 힌트 추출 (적재항/적출국 등)
         # upsert_shipment 호출부에서 track 객체가 없으니, 여기서는 생략하거나
         # _fetch_and_upsert_many() 쪽에서 추출하여 넘겨도 OK. 우선 normalized만으로 진행.
-        upsert_shipment_details(db, obj, auto_patch)
+        upsert_shipment_details(db, obj, _auto_details_patch(incoming_status, normalized_events))
         # 기존 코드의 obj 생성/갱신 후, 커밋 전에 이벤트 적재
-        _inserted = _upsert_events_for_shipment(db, obj, normalized_events, source="normalized")
+        _inserted = _upsert_events_for_shipment(db, obj, stored_events, source="normalized")
         # 필요시 로깅: print(f"events inserted: {_inserted}")
 
+        # 변경 로그: 신규 또는 상태/마지막 이벤트/타임라인 길이가 바뀐 경우만
+        if before != (obj.last_status, _as_utc(obj.last_event_ts), obj.normalized_count):
+            _record_changes(db, [{"shipment_id": obj.id, "tracking_number": obj.tracking_number,
+                                  "kind": "shipment", "last_status": obj.last_status}])
+        # 대시보드 집계: 상태/지연/소요시간 전이분만
+        _agg_transition(agg_deltas, agg_before, _agg_state(obj), new_origin=agg_before is None)
+        _bump_aggregates(db, agg_deltas)
+        # 일별 통관 소요시간 롤업: 통관완료 점이 바뀐 경우만
+        rollup_after = _rollup_point(obj.cleared_at, obj.carrier, obj.duration_sec)
+        if rollup_after != rollup_before:
+            _apply_rollup_moves(db, [(obj.id, rollup_before, rollup_after)])
         db.flush()
         return obj
 
@@ -1398,9 +2497,459 @@ def upsert_shipment(db, tracking_number: str, summary: Dict[str, Any], normalize
         db.rollback()
         raise
 
+# 벌크 업서트에서 shipments 행으로 쓰는 요약 상태 컬럼
+_SUMMARY_COLUMNS = (
+    "in_progress_at", "cleared_at", "last_event_ts", "has_delay", "duration_sec",
+    "first_in_at", "first_in_import", "cleared_import", "pre_cleared_at", "prev_event_ts", "delays_json",
+    "summary_event_count",
+)
+
+def bulk_upsert_shipments(db, entries: List[Dict[str, Any]], source: str = "normalized") -> Dict[str, int]:
+    """
+    청크 단위 집합 업서트 (upsert_shipment와 같은 규칙, 왕복 횟수는 청크 크기와 무관).
+      entries: [{"tracking_number", "normalized", "any_events", "summary"(선택, 상태 힌트), "carrier"(선택)}]
+      1) 기존 shipments를 IN 쿼리 1회로 조회
+      2) shipments: INSERT ... ON CONFLICT(tracking_number) DO UPDATE (executemany)
+         역행(cleared 과거) 건은 상태 보완만 UPDATE (executemany)
+      3) shipment_details / shipment_events: ON CONFLICT executemany
+    """
+    if not entries:
+        return {"shipments": 0, "regressed": 0, "events": 0}
+
+    # 같은 청크에 같은 번호가 여러 번 오면 마지막 것만 사용
+    by_number: Dict[str, Dict[str, Any]] = {}
+    for ent in entries:
+        by_number[str(ent["tracking_number"])] = ent
+    numbers = list(by_number)
+    _touch_shipments(db, *numbers)
+
+    S = Shipment.__table__
+    existing = {
+        row.tracking_number: row
+        for row in db.execute(
+            select(S.c.id, S.c.tracking_number, S.c.last_status, S.c.any_events, S.c.carrier, S.c.last_event,
+                   S.c.normalized_count, S.c.events_archived_until, S.c.events_archive_parts,
+                   *[S.c[c] for c in _SUMMARY_COLUMNS])
+            .where(S.c.tracking_number.in_(numbers))
+        )
+    }
+
+    now = datetime.now(timezone.utc)
+    upserts: List[Dict[str, Any]] = []
+    regressed: List[Dict[str, Any]] = []
+    written_numbers: List[str] = [] # 상세/이벤트까지 기록할 번호 (신규 + 역행 아닌 갱신)
+    changes: List[Dict[str, Any]] = [] # 변경 로그 (신규 건 shipment_id는 INSERT 후 채움)
+    agg_deltas: Dict[Tuple[str, str], List[int]] = {} # 대시보드 집계 변화분
+    rollup_moves: List[list] = [] # [번호, 이전 점, 이후 점] (신규 건 id는 INSERT 후)
+    stored: Dict[str, List[Dict[str, Any]]] = {} # 번호 → 저장할(접힌) 타임라인
+    incoming: Dict[str, str] = {} # 번호 → 이번 타임라인 기준 상태 (상세 자동 채움용)
+    for num, ent in by_number.items():
+        status_hint = (ent.get("summary") or {}).get("status")
+        normalized_events = ent.get("normalized") or []
+        stored_events = compact_timeline(normalized_events) if TIMELINE_COMPACT else normalized_events
+        stored[num] = stored_events
+        any_events = bool(ent.get("any_events"))
+        row = existing.get(num)
+
+        if row is None:
+            state = CustomsSummaryState()
+            state.feed_many(normalized_events)
+            incoming_status = incoming[num] = _incoming_status(state, status_hint)
+            last_status = incoming_status
+            carrier = ent.get("carrier")
+            last_event = normalized_events[-1]["desc"] if normalized_events else None
+        else:
+            stored_state = CustomsSummaryState.from_shipment(row)
+            state = stored_state.absorb(normalized_events)
+            incoming_status = incoming[num] = _incoming_status(state, status_hint)
+            if _cleared_regressed(stored_state, state):
+                regressed.append({
+                    "b_id": row.id,
+                    "last_status": _regressed_status(incoming_status, row.last_status),
+                    "any_events": int(any_events or row.any_events),
+                })
+                if regressed[-1]["last_status"] != row.last_status:
+                    changes.append({"shipment_id": row.id, "tracking_number": num, "kind": "shipment",
+                                    "last_status": regressed[-1]["last_status"]})
+                    _agg_transition(agg_deltas, _agg_state(row),
+                                    (regressed[-1]["last_status"], row.carrier, int(row.has_delay or 0), row.duration_sec))
+                continue
+            last_status = (state.status if state.last_ts else None) or incoming_status or row.last_status
+            carrier = ent.get("carrier") or row.carrier
+            last_event = normalized_events[-1]["desc"] if normalized_events else row.last_event
+            any_events = any_events or bool(row.any_events)
+
+        written_numbers.append(num)
+        cols = SimpleNamespace()
+        state.apply_to(cols)
+        if row is None or (last_status, cols.last_event_ts, len(stored_events)) != (
+            row.last_status, _as_utc(row.last_event_ts), row.normalized_count
+        ):
+            changes.append({"shipment_id": row.id if row else None, "tracking_number": num, "kind": "shipment",
+                            "last_status": last_status})
+        _agg_transition(agg_deltas, _agg_state(row) if row is not None else None,
+                        (last_status, carrier, cols.has_delay, cols.duration_sec), new_origin=row is None)
+        rollup_before = _rollup_point(row.cleared_at, row.carrier, row.duration_sec) if row is not None else None
+        rollup_after = _rollup_point(cols.cleared_at, carrier, cols.duration_sec)
+        if rollup_after != rollup_before:
+            rollup_moves.append([num, rollup_before, rollup_after])
+        upserts.append({
+            "tracking_number": num,
+            "carrier": carrier,
+            "last_status": last_status,
+            "last_event": last_event,
+            "normalized": None,
+            "normalized_bin": _serialize_normalized(stored_events),
+            "normalized_count": len(stored_events),
+            "any_events": int(any_events),
+            "updated_at": now,
+            **vars(cols),
+        })
+
+    if upserts:
+        ins = _upsert_insert(db, S)
+        stmt = ins.on_conflict_do_update(
+            index_elements=["tracking_number"],
+            set_={k: ins.excluded[k] for k in upserts[0] if k != "tracking_number"},
+        )
+        db.execute(stmt, upserts)
+    if regressed:
+        db.execute(
+            update(S).where(S.c.id == bindparam("b_id")),
+            regressed,
+        )
+
+    # 상세/이벤트도 같은 트랜잭션에서 (신규 포함, upsert_shipment와 동일)
+    events_written = 0
+    if written_numbers:
+        ids = dict(
+            db.execute(select(S.c.tracking_number, S.c.id).where(S.c.tracking_number.in_(written_numbers))).all()
+        )
+        detail_rows: List[Dict[str, Any]] = []
+        event_rows: List[Dict[str, Any]] = []
+        for num in written_numbers:
+            ent = by_number[num]
+            normalized_events = ent.get("normalized") or []
+            patch = _auto_details_patch(incoming[num], normalized_events)
+            detail_rows.append({
+                "shipment_id": ids[num],
+                "tracking_number": num,
+                "clearance_status_text": patch["clearance_status_text"],
+                "progress_status_text": patch["progress_status_text"],
+                "event_processed_at": _dt_or_none(patch.get("event_processed_at")),
+                "sync_processed_at": _dt_or_none(patch["sync_processed_at"]),
+                "updated_at": now,
+            })
+            event_rows.extend(_drop_archived(
+                _event_rows(ids[num], num, stored[num], source),
+                existing[num].events_archived_until if num in existing else None,
+                existing[num].events_archive_parts if num in existing else None,
+            ))
+
+        D = ShipmentDetails.__table__
+        ins = _upsert_insert(db, D)
+        db.execute(
+            ins.on_conflict_do_update(
+                index_elements=["shipment_id"],
+                set_={
+                    "clearance_status_text": ins.excluded.clearance_status_text,
+                    "progress_status_text": ins.excluded.progress_status_text,
+                    "event_processed_at": func.coalesce(ins.excluded.event_processed_at, D.c.event_processed_at),
+                    "sync_processed_at": ins.excluded.sync_processed_at,
+                    "updated_at": ins.excluded.updated_at,
+                },
+            ),
+            detail_rows,
+        )
+        events_written = _insert_event_rows(db, event_rows)
+
+    for c in changes:
+        if c["shipment_id"] is None:
+            c["shipment_id"] = ids[c["tracking_number"]] # 신규 건은 항상 written_numbers에 있음
+    _record_changes(db, changes)
+    _bump_aggregates(db, agg_deltas)
+    if rollup_moves:
+        _apply_rollup_moves(db, [(ids[num], b, a) for num, b, a in rollup_moves])
+
+    return {"shipments": len(upserts), "regressed": len(regressed), "events": events_written}
+
 # ---------- END: 업서트 유틸 ----------
 
 
+# [ANCHOR: EVENT_RETENTION] 통관완료 후 N일 지난 운송장의 이벤트를 보관 파일로 이동
+# - 보관 파일: event_archive.py (통관완료 일자 파티션, 열 단위 gzip)
+# - 조회는 /admin/shipments/{number}/events 에서 hot + 보관본을 합쳐 투명하게 제공
+EVENT_ARCHIVE_DIR = Path(os.getenv("EVENT_ARCHIVE_DIR", str(event_archive.DEFAULT_ARCHIVE_DIR)))
+EVENT_RETENTION_DAYS = int(os.getenv("EVENT_RETENTION_DAYS", "0")) # 0이면 주기 작업 끔 (수동 엔드포인트만)
+EVENT_RETENTION_INTERVAL = float(os.getenv("EVENT_RETENTION_INTERVAL", "3600")) # 초
+
+def _archive_events_batch(db, cutoff: datetime, after_id: int, batch: int = 200) -> Tuple[int, int, int]:
+    """
+    cleared_at < cutoff 이고 hot 이벤트가 남은 운송장 최대 batch건을 보관.
+    반환: (마지막 shipment id, 처리 운송장 수, 이동 이벤트 수) — 운송장이 없으면 id는 -1
+    """
+    S, E = Shipment.__table__, ShipmentEvent.__table__
+    ships = db.execute(
+        select(S.c.id, S.c.tracking_number, S.c.cleared_at, S.c.events_archived_until, S.c.events_archive_parts)
+          .where(S.c.id > after_id, S.c.cleared_at < cutoff,
+                 select(E.c.id).where(E.c.shipment_id == S.c.id).exists())
+          .order_by(S.c.id)
+          .limit(batch)
+    ).all()
+    if not ships:
+        return -1, 0, 0
+    ship_ids = [r.id for r in ships]
+    _touch_shipments(db, *[r.tracking_number for r in ships])
+    events = db.execute(
+        select(E.c.id, *[E.c[c] for c in event_archive.ARCHIVE_COLUMNS])
+          .where(E.c.shipment_id.in_(ship_ids))
+    ).all()
+
+    # 통관완료 일자별 part 파일 1개씩
+    cleared_on = {r.id: _as_utc(r.cleared_at).date() for r in ships}
+    by_day: Dict[Any, List[Dict[str, Any]]] = {}
+    until: Dict[int, datetime] = {}
+    for ev in events:
+        ts = _as_utc(ev.ts)
+        row = {c: getattr(ev, c) for c in event_archive.ARCHIVE_COLUMNS}
+        row["ts"] = ts.isoformat()
+        row["last_ts"] = _iso_or_none(ev.last_ts)
+        by_day.setdefault(cleared_on[ev.shipment_id], []).append(row)
+        until[ev.shipment_id] = max(until.get(ev.shipment_id, ts), ts)
+    part_of_day = {day: event_archive.write_part(EVENT_ARCHIVE_DIR, day, rows) for day, rows in by_day.items()}
+
+    # 읽은 이벤트만 삭제 (그 사이 들어온 이벤트는 id가 더 큼)
+    max_event_id = max(ev.id for ev in events)
+    db.execute(E.delete().where(E.c.shipment_id.in_(ship_ids), E.c.id <= max_event_id))
+    now = datetime.now(timezone.utc)
+    marks = []
+    for r in ships:
+        if r.id not in until:
+            continue
+        prev_until = _as_utc(r.events_archived_until)
+        marks.append({
+            "b_id": r.id,
+            "events_archived_at": now,
+            "events_archived_until": max(until[r.id], prev_until) if prev_until else until[r.id],
+            "events_archive_parts": json.dumps(
+                (json.loads(r.events_archive_parts) if r.events_archive_parts else []) + [part_of_day[cleared_on[r.id]]]
+            ),
+        })
+    if marks:
+        # updated_at(목록 정렬 기준)은 건드리지 않음
+        db.execute(update(S).where(S.c.id == bindparam("b_id")).values(updated_at=S.c.updated_at), marks)
+    return ship_ids[-1], len(marks), len(events)
+
+async def archive_cleared_events(older_than_days: int, batch: int = 200) -> Dict[str, Any]:
+    """배치마다 DB 쓰기 스레드에 넘겨 동기화 쓰기와 번갈아 실행"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    last_id, shipments, moved = 0, 0, 0
+    while True:
+        last_id, n_ships, n_events = await run_in_db(_archive_events_batch, cutoff, last_id, batch)
+        if last_id < 0:
+            break
+        shipments += n_ships
+        moved += n_events
+    return {"ok": True, "older_than_days": older_than_days, "shipments": shipments, "events": moved}
+
+def _archived_events(ship: Shipment) -> List[Dict[str, Any]]:
+    return _read_archived(ship.id, ship.events_archive_parts)
+
+def _read_archived(shipment_id: int, archive_parts: Optional[str]) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for rel in json.loads(archive_parts or "[]"):
+        rows.extend(event_archive.read_events(EVENT_ARCHIVE_DIR, rel, shipment_id))
+    return rows
+
+def _archived_fingerprints(shipment_id: int, archive_parts: Optional[str]) -> set:
+    return {_event_fingerprint(e["ts"], e["stage"], e["desc"]) for e in _read_archived(shipment_id, archive_parts)}
+
+# [ANCHOR: GROUP_COMMIT] 단일 쓰기 서비스 (운송장 단위 병합 + 그룹 커밋)
+WRITE_COALESCE_MS = float(os.getenv("WRITE_COALESCE_MS", "50"))
+
+class GroupCommitWriter:
+    """
+    모든 쓰기 경로(웹훅, 일괄 동기화, 상세 수정)가 쓰기 intent를 넣는 단일 writer.
+    - 같은 운송장 intent는 window(WRITE_COALESCE_MS) 안에서 하나로 합친다
+      · shipment: normalized 이벤트는 합집합(요약 재계산), carrier는 나중 intent 우선
+      · details: 패치 dict를 순서대로 덮어씀
+    - window마다 모인 intent를 DB 쓰기 스레드에서 한 트랜잭션으로 커밋
+      · intent가 실패하면 운송장별 savepoint로 다시 써서 실패한 intent만 예외, 나머지는 그대로 커밋
+    - submit_* 는 Future 반환: await 하면 커밋(내구성)까지 기다림, 안 기다려도 됨
+    """
+
+    def __init__(self, window_ms: float):
+        self.window = window_ms / 1000
+        self._shipments: Dict[str, list] = {} # number -> [entry, futures]
+        self._details: Dict[str, list] = {} # number -> [patch, futures]
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"intents": 0, "merged": 0, "commits": 0, "shipments": 0}
+
+    # ---------- 제출 (이벤트 루프에서 호출) ----------
+    def submit_shipment(self, entry: Dict[str, Any]) -> asyncio.Future:
+        num = str(entry["tracking_number"])
+        slot = self._shipments.get(num)
+        if slot:
+            slot[0] = self._merge_shipment(slot[0], entry)
+        else:
+            slot = self._shipments[num] = [entry, []]
+        return self._enqueue(slot[1], merged=slot[1] != [])
+
+    def submit_shipments(self, entries: List[Dict[str, Any]]) -> asyncio.Future:
+        return asyncio.gather(*[self.submit_shipment(e) for e in entries])
+
+    def submit_details(self, number: str, patch: Dict[str, Any]) -> asyncio.Future:
+        slot = self._details.setdefault(number, [{}, []])
+        slot[0].update(patch)
+        return self._enqueue(slot[1], merged=len(slot[1]) > 0)
+
+    @staticmethod
+    def _merge_shipment(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        events: Dict[Any, Dict[str, Any]] = {}
+        for e in (old.get("normalized") or []) + (new.get("normalized") or []):
+            key = _event_fingerprint(e["ts"], e.get("stage"), e.get("desc")) if e.get("ts") else id(e)
+            events[key] = e
+        merged = dict(new)
+        merged["normalized"] = sorted(events.values(), key=lambda e: _as_utc(e["ts"]) if e.get("ts") else datetime.min.replace(tzinfo=timezone.utc))
+        # 요약은 쓰기 시 저장된 상태에서 증분 계산 — 상태 힌트(예: PRE_CUSTOMS)만 나중 intent 것 유지
+        merged["summary"] = new.get("summary") or old.get("summary")
+        merged["any_events"] = bool(old.get("any_events")) or bool(new.get("any_events"))
+        merged["carrier"] = new.get("carrier") or old.get("carrier")
+        return merged
+
+    def _enqueue(self, futures: list, merged: bool) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        fut = loop.create_future()
+        futures.append(fut)
+        self.stats["intents"] += 1
+        self.stats["merged"] += int(merged)
+        self._wakeup.set()
+        return fut
+
+    # ---------- 커밋 루프 ----------
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # window 동안 intent를 더 모은 뒤 한 번에 커밋
+            await asyncio.sleep(self.window)
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        batch = (self._shipments, self._details)
+        self._shipments, self._details = {}, {}
+        if not any(batch):
+            return
+        futures = [f for slots in batch for slot in slots.values() for f in slot[1]]
+        try:
+            results = await run_in_db(self._commit, *batch)
+        except Exception as e:
+            print(f"[writer] 커밋 실패 ({len(futures)} intents): {e}")
+            for f in futures:
+                if not f.done():
+                    f.set_exception(e)
+                    f.add_done_callback(lambda f: f.exception()) # 아무도 안 기다려도 경고 없음
+            return
+        self.stats["commits"] += 1
+        self.stats["shipments"] += len(batch[0])
+        for kind, slots in zip(("shipment", "details"), batch):
+            for num, slot in slots.items():
+                res = results[kind].get(num)
+                for f in slot[-1]:
+                    if f.done():
+                        continue
+                    if isinstance(res, Exception):
+                        f.set_exception(res)
+                        f.add_done_callback(lambda f: f.exception())
+                    else:
+                        f.set_result(res)
+
+    @staticmethod
+    def _commit(db, shipments, details) -> Dict[str, Dict[str, Any]]:
+        """운송장 → 결과 (실패한 intent는 예외 객체, 그 intent의 쓰기만 savepoint로 되돌림)"""
+        results: Dict[str, Dict[str, Any]] = {"shipment": {}, "details": {}}
+        _begin_write(db)
+        if shipments:
+            try:
+                # 보통은 window 전체를 한 번에 (집합 업서트)
+                with db.begin_nested():
+                    counts = bulk_upsert_shipments(db, [slot[0] for slot in shipments.values()])
+                results["shipment"] = {num: counts for num in shipments}
+            except Exception as e:
+                print(f"[writer] 일괄 업서트 실패, 운송장별로 재시도 ({len(shipments)}건): {e}")
+                for num, slot in shipments.items():
+                    try:
+                        with db.begin_nested():
+                            results["shipment"][num] = bulk_upsert_shipments(db, [slot[0]])
+                    except Exception as e:
+                        print(f"[writer] {num} 업서트 실패: {e}")
+                        results["shipment"][num] = e
+        if details:
+            ships = {
+                s.tracking_number: s
+                for s in db.query(Shipment).filter(Shipment.tracking_number.in_(list(details)))
+            }
+            for num, (patch, _) in details.items():
+                ship = ships.get(num)
+                try:
+                    with db.begin_nested():
+                        row = upsert_shipment_details(db, ship, patch) if ship else None
+                        if row is not None:
+                            _record_changes(db, [{"shipment_id": ship.id, "tracking_number": num, "kind": "details"}])
+                            db.flush()
+                            db.refresh(row)
+                except Exception as e:
+                    print(f"[writer] {num} 상세 저장 실패: {e}")
+                    results["details"][num] = e
+                    continue
+                updated_at = row.updated_at.isoformat() if row is not None and row.updated_at else None
+                results["details"][num] = {"found": ship is not None, "updated_at": updated_at}
+        return results
+
+    async def shutdown(self):
+        """남은 intent를 커밋하고 종료"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._flush()
+
+group_writer = GroupCommitWriter(WRITE_COALESCE_MS)
+
+async def _event_retention_loop():
+    while True:
+        try:
+            res = await archive_cleared_events(EVENT_RETENTION_DAYS)
+            if res["events"]:
+                print(f"[retention] {res['shipments']}건 운송장 이벤트 {res['events']}개 보관")
+        except Exception as e:
+            print(f"[retention] 보관 실패: {e}")
+        await asyncio.sleep(EVENT_RETENTION_INTERVAL)
+
+async def _change_log_prune_loop():
+    while True:
+        try:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=CHANGE_LOG_RETENTION_DAYS)
+            pruned = 0
+            while True:
+                n = await run_in_db(_prune_change_log, cutoff)
+                pruned += n
+                if n == 0:
+                    break
+            if pruned:
+                print(f"[changes] 변경 로그 {pruned}건 정리")
+        except Exception as e:
+            print(f"[changes] 정리 실패: {e}")
+        await asyncio.sleep(EVENT_RETENTION_INTERVAL)
+
+
 # ---------- START: 관리자 엔드포인트들 (동기화 / 샘플 추가 / 수동 조회) ----------
 
 from fastapi import BackgroundTasks
@@ -1427,56 +2976,63 @@ def _load_numbers_from_file(path: str) -> List[str]:
     except Exception:
         return []
 
+# 번호별 마지막 17TRACK 조회 시도 시각 (프로세스 메모리, 오래된 것부터 버림)
+# shipments.updated_at은 응답에 없던 번호(행 없음)·회귀 행(갱신 안 함)에선 안 바뀜 → 재조회 판단은 이것과 함께 봄
+POLL_MEMORY_SEC = 24 * 3600 # /api/recent-events refresh_older_than 상한(1440분)
+_poll_lock = threading.Lock() # _last_polled, _recent_refreshing (스레드 풀·이벤트 루프 양쪽에서 접근)
+_last_polled: "OrderedDict[str, datetime]" = OrderedDict()
+
+def _mark_polled(numbers: List[str]):
+    now = datetime.now(timezone.utc)
+    horizon = now - timedelta(seconds=POLL_MEMORY_SEC)
+    with _poll_lock:
+        for n in numbers:
+            _last_polled[n] = now
+            _last_polled.move_to_end(n)
+        while _last_polled and next(iter(_last_polled.values())) < horizon:
+            _last_polled.popitem(last=False)
+
 async def _fetch_and_upsert_many(numbers: List[str], batch: int = 40) -> Dict[str, Any]:
     numbers = [str(n).strip() for n in numbers if str(n).strip()]
     if not numbers:
         return {"ok": True, "synced": 0, "reason": "no numbers in file"}
 
     total_synced, processed = 0, set()
+    pending_write: Optional[asyncio.Future] = None
 
     for chunk in _chunked(numbers, batch):
+        # 응답을 스트리밍 디코드하며 track이 도착하는 대로 정규화
+        entries: List[Dict[str, Any]] = []
         try:
-            payload = await get_trackinfo(chunk)
-        except Exception:
-            payload = None
-
-        # 스키마 방어
-        tracks: List[Dict[str, Any]] = []
-        if isinstance(payload, list):
-            tracks = payload
-        elif isinstance(payload, dict):
-            data_obj = payload.get("data")
-            if isinstance(data_obj, dict):
-                buckets: List[Dict[str, Any]] = []
-                for key in ("accepted", "result", "list"):
-                    v = data_obj.get(key)
-                    if isinstance(v, list):
-                        buckets.extend(v)
-                tracks = buckets
-            elif isinstance(payload.get("result"), list) or isinstance(payload.get("list"), list):
-                tracks = payload.get("result") or payload.get("list") or []
-            elif payload.get("number"):
-                tracks = [payload]
-
-        # 업서트
-        with get_db() as db:
-            for item in tracks:
-                if not isinstance(item, dict):
-                    continue
-                num = item.get("number") or item.get("no") or item.get("tracking") or ""
+            async for item in iter_trackinfo(chunk):
+                num, track_obj = _split_track_item(item)
                 if not num:
                     continue
-                processed.add(str(num))
-                track_obj = item.get("track") or item.get("track_info") or item
+                processed.add(num)
                 normalized = normalize_from_track(track_obj or {})
-                summary = summarize_customs(normalized)
-                any_events = _count_raw_events(track_obj or {}) > 0
-                upsert_shipment(db, num, summary, normalized, any_events)
-                total_synced += 1
+                entries.append({
+                    "tracking_number": num,
+                    "normalized": normalized,
+                    "any_events": _count_raw_events(track_obj or {}) > 0,
+                })
+        except (httpx.HTTPError, RuntimeError, ValueError) as e:
+            # 응답이 중간에 끊겨도 이미 받은 track은 저장
+            print(f"[sync] gettrackinfo 실패({len(chunk)}건): {e}")
+        # 응답에 없었거나 실패한 번호도 조회 시도로 기록 (다음 재조회 판단용)
+        _mark_polled(chunk)
+
+        # 업서트: 청크를 group writer에 넘기고 다음 청크 요청과 겹쳐 진행
+        # (이전 청크가 커밋된 뒤 다음 청크 제출 → 밀려 쌓이지 않음)
+        if entries:
+            if pending_write:
+                await pending_write
+            pending_write = group_writer.submit_shipments(entries)
+            total_synced += len(entries)
 
         await asyncio.sleep(0.25 + random.random() * 0.2)
 
-    # 응답에 없었던 번호도 최소 행 생성
+    if pending_write:
+        await pending_write
 
     return {"ok": True, "requested": len(numbers), "synced": total_synced}
 
@@ -1504,55 +3060,761 @@ async def admin_fetch_from_file(
     res["file"] = picked
     return res
 
-def _parse_normalized_json(s: Optional[str]) -> list[dict]:
+@app.post("/admin/retention/archive-events")
+async def admin_archive_events(
+    older_than_days: int = Query(EVENT_RETENTION_DAYS or 90, ge=1, description="통관완료 후 경과 일수"),
+):
+    """통관완료 후 older_than_days 지난 운송장의 이벤트를 보관 파일로 이동 (조회는 그대로 가능)"""
+    return await archive_cleared_events(older_than_days)
+
+def _parse_normalized_json(s) -> list[dict]:
+    """저장된 타임라인(normalized_bin 바이너리 또는 레거시 normalized JSON) -> 이벤트 dict 목록"""
     if not s:
         return []
     try:
+        if timeline_codec.is_encoded(s):
+            return timeline_codec.decode_timeline(s)
         v = json.loads(s)
         return v if isinstance(v, list) else []
     except Exception:
         return []
 
-def _serialize_row(obj: Shipment) -> dict:
-    """DB Shipment -> 프론트 공통 포맷"""
-    norm = _parse_normalized_json(obj.normalized)
-    last_ev_desc = (norm[-1].get("desc") if norm else None)
-    last_ev_ts   = (norm[-1].get("ts")   if norm else None)
+def _iso_or_none(dt) -> Optional[str]:
+    return _as_utc(dt).isoformat() if dt else None
+
+# 목록 응답에 필요한 좁은 컬럼만 (normalized 등 큰 TEXT는 읽지 않음)
+_LIST_COLUMNS = (
+    Shipment.id,
+    Shipment.tracking_number,
+    Shipment.last_status,
+    Shipment.last_event, # 쓰기 시 마지막 이벤트 설명 저장
+    Shipment.last_event_ts, # 쓰기 시 마지막 이벤트 시각 저장
+    Shipment.updated_at,
+    Shipment.any_events,
+    Shipment.carrier,
+    Shipment.normalized_count,
+    Shipment.in_progress_at,
+    Shipment.cleared_at,
+    Shipment.has_delay,
+    Shipment.duration_sec,
+)
 
+def _serialize_row(r) -> dict:
+    """목록 행(_LIST_COLUMNS 매핑) -> 프론트 공통 포맷 (normalized 역직렬화 없음)"""
+    updated_at = r["updated_at"]
     # 화면 공통 스키마
     return {
-        "number": obj.tracking_number,
-        "status": (obj.last_status or "UNKNOWN").upper(),
-        "last_event_text": obj.last_event or last_ev_desc or "",
-        "last_event_at": obj.updated_at.isoformat() if getattr(obj, "updated_at", None) else last_ev_ts,
-        "source": "17TRACK" if (obj.any_events or 0) else "DB",
+        "number": r["tracking_number"],
+        "status": (r["last_status"] or "UNKNOWN").upper(),
+        "last_event_text": r["last_event"] or "",
+        "last_event_at": updated_at.isoformat() if updated_at else _iso_or_none(r["last_event_ts"]),
+        "source": "17TRACK" if (r["any_events"] or 0) else "DB",
         # 참고용(프론트에서 쓰면 편한 필드들)
-        "carrier": obj.carrier,
-        "normalized_count": obj.normalized_count,
+        "carrier": r["carrier"],
+        "normalized_count": r["normalized_count"],
+        "in_progress_at": _iso_or_none(r["in_progress_at"]),
+        "cleared_at": _iso_or_none(r["cleared_at"]),
+        "has_delay": bool(r["has_delay"]),
+        "duration_sec": r["duration_sec"],
     }
 
 # ======= 목록 엔드포인트들 =======
 
+LIST_PAGE_DEFAULT = 200
+LIST_PAGE_MAX = 1000
+
+def _listing_key_column(db):
+    # sqlite: func.now() 기본값은 마이크로초 없이, 파이썬 datetime은 마이크로초 포함으로 저장되어
+    # datetime 바인딩과 저장 문자열 형식이 다를 수 있음 → 저장된 문자열 그대로 비교 (인덱스는 그대로 사용)
+    if db.get_bind().dialect.name == "sqlite":
+        return type_coerce(Shipment.updated_at, String)
+    return Shipment.updated_at
+
+def _encode_list_cursor(key, id_: int) -> str:
+    key = key.isoformat() if isinstance(key, datetime) else key
+    raw = json.dumps([key, id_], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _list_etag(version: int, **params) -> str:
+    """목록 ETag: 쓰기 스탬프 + 정규화한 조회 조건 (limit/cursor/필터가 다르면 다른 태그)"""
+    key = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+    return make_etag("list", version, hashlib.blake2b(key.encode(), digest_size=8).hexdigest())
+
+def _decode_list_cursor(db, cursor: str):
+    try:
+        key, id_ = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if db.get_bind().dialect.name != "sqlite":
+            key = datetime.fromisoformat(key)
+        return key, int(id_)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
 @app.get("/admin/shipments")
-def admin_shipments():
-    """관리자: DB의 모든 운송장 최신순"""
-    with get_db() as db:
-        rows = (
-            db.query(Shipment)
-              .order_by(Shipment.updated_at.desc(), Shipment.created_at.desc())
-              .all()
+@app.get("/admin/list-shipments") # 레거시 호환(같은 응답)
+@app.get("/user/trackings") # 사용자 목록 (같은 포맷)
+def admin_shipments(
+    request: Request,
+    response: Response,
+    limit: int = Query(LIST_PAGE_DEFAULT, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = Query(None, description="이전 응답의 X-Next-Cursor 헤더 값"),
+    status: Optional[str] = Query(None, description="상태 필터 (쉼표 구분, 예: CLEARED,DELAY)"),
+    carrier: Optional[str] = Query(None, description="carrier 일치 필터"),
+    updated_since: Optional[datetime] = Query(None, description="updated_at >= 이 시각 (ISO8601)"),
+):
+    """
+    DB 운송장 목록 최신순 (updated_at DESC, id DESC).
+    - 응답 본문은 기존과 같은 배열, 다음 페이지가 있으면 X-Next-Cursor 헤더로 커서 전달
+    - 마지막 쓰기 이후 같은 요청이면 If-None-Match로 304 (조회 없음)
+    """
+    wanted = sorted({x.strip().upper() for x in status.split(",") if x.strip()}) if status else []
+    version, changed_at = shipment_read_cache.version()
+    etag = _list_etag(
+        version, limit=limit, cursor=cursor, status=wanted, carrier=carrier,
+        updated_since=_as_utc(updated_since).isoformat() if updated_since else None,
+    )
+    cached = not_modified(request, response, etag, changed_at)
+    if cached is not None:
+        return cached
+    with get_read_db() as db:
+        key_col = _listing_key_column(db)
+        # ORM 엔티티 대신 컬럼 프로젝션 → 행 매핑을 바로 응답 dict로 (identity map 미사용)
+        stmt = select(*_LIST_COLUMNS, key_col.label("list_key"))
+        if wanted:
+            stmt = stmt.where(Shipment.last_status.in_(wanted))
+        if carrier:
+            stmt = stmt.where(Shipment.carrier == carrier)
+        if updated_since:
+            stmt = stmt.where(Shipment.updated_at >= _as_utc(updated_since))
+        if cursor:
+            stmt = stmt.where(tuple_(key_col, Shipment.id) < tuple_(*_decode_list_cursor(db, cursor)))
+        stmt = stmt.order_by(key_col.desc(), Shipment.id.desc()).limit(limit + 1)
+        rows = db.execute(stmt).mappings().all()
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = _encode_list_cursor(rows[-1]["list_key"], rows[-1]["id"])
+        return [_serialize_row(r) for r in rows]
+
+# ======= 대시보드 집계 =======
+
+@app.get("/api/stats/overview")
+def stats_overview():
+    """
+    대시보드 요약 (상태/carrier/출발국별 건수, 지연 건수, 평균 통관 소요시간, 소요시간 히스토그램).
+    shipment_aggregates 카운터만 읽으므로 운송장 수와 무관하게 일정한 비용.
+    """
+    with get_read_db() as db:
+        rows = db.execute(select(ShipmentAggregate.__table__)).all()
+    by_dim: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        by_dim.setdefault(r.dim, {})[r.key] = r
+
+    def counts(dim: str) -> Dict[str, int]:
+        return {k: r.count for k, r in sorted(by_dim.get(dim, {}).items()) if r.count}
+
+    total = by_dim.get("total", {}).get("")
+    dur = by_dim.get("duration", {}).get("")
+    hist = by_dim.get("duration_hist", {})
+    delayed = by_dim.get("delay", {}).get("")
+    return {
+        "total": total.count if total else 0,
+        "by_status": counts("status"),
+        "by_carrier": counts("carrier"),
+        "by_origin": counts("origin"),
+        "delayed": delayed.count if delayed else 0,
+        "duration": {
+            "count": dur.count if dur else 0,
+            "avg_sec": round(dur.duration_sum / dur.count) if dur and dur.count else None,
+            "histogram": [
+                {"bucket": label, "count": hist[label].count if label in hist else 0}
+                for label in [b[1] for b in DURATION_BUCKETS] + [DURATION_BUCKET_LAST]
+            ],
+        },
+    }
+
+TREND_QUANTILES = (("p50_sec", 0.5), ("p90_sec", 0.9), ("p95_sec", 0.95))
+
+def _trend_period(day: date, interval: str) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday()) # 월요일 시작
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+@app.get("/api/stats/clearance-trend")
+def stats_clearance_trend(
+    start: Optional[date] = Query(None, description="통관완료 일자 시작 (UTC, 기본: end - 364일)"),
+    end: Optional[date] = Query(None, description="통관완료 일자 끝 (포함, 기본: 오늘)"),
+    interval: str = Query("day", pattern="^(day|week|month)$"),
+    origin: Optional[str] = Query(None, description="출발국 일치 필터"),
+    carrier: Optional[str] = Query(None, description="carrier 일치 필터"),
+):
+    """
+    통관 소요시간 추이 (기간별 건수, 평균/최소/최대, p50/p90/p95).
+    일별 롤업 행(일 x 출발국 x carrier)만 합치므로 1년 범위도 운송장/이벤트를 읽지 않는다.
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=364)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be <= end")
+    R = ClearanceRollup.__table__
+    stmt = select(R).where(R.c.day >= start, R.c.day <= end)
+    if origin is not None:
+        stmt = stmt.where(R.c.origin_country == origin)
+    if carrier is not None:
+        stmt = stmt.where(R.c.carrier == carrier)
+    with get_read_db() as db:
+        rows = db.execute(stmt.order_by(R.c.day)).all()
+
+    periods: Dict[date, Dict[str, Any]] = {}
+    for r in rows:
+        p = periods.setdefault(_trend_period(r.day, interval), {"count": 0, "sum": 0, "min": None, "max": None, "sketch": {}})
+        p["count"] += r.count
+        p["sum"] += r.duration_sum
+        p["min"] = r.duration_min if p["min"] is None else min(p["min"], r.duration_min)
+        p["max"] = r.duration_max if p["max"] is None else max(p["max"], r.duration_max)
+        quantile_sketch.merge(p["sketch"], quantile_sketch.loads(r.sketch))
+    out = []
+    for period, p in periods.items():
+        item = {
+            "period": period.isoformat(),
+            "count": p["count"],
+            "avg_sec": round(p["sum"] / p["count"]) if p["count"] else None,
+            "min_sec": p["min"],
+            "max_sec": p["max"],
+        }
+        for name, q in TREND_QUANTILES:
+            v = quantile_sketch.quantile(p["sketch"], q)
+            item[name] = round(v) if v is not None else None
+        out.append(item)
+    return {"start": start.isoformat(), "end": end.isoformat(), "interval": interval, "series": out}
+
+# [ANCHOR: SLA] 통관완료 → 배송완료 SLA 준수율 (Monitoring.run_comprehensive_test 5번의 DB 버전)
+# - 배송완료 이벤트는 stage가 CLEARED로 정규화되므로 설명 문구로 구분 (PATTERNS["CLEARED"]의 delivered/배송 완료와 같은 기준)
+# - 운송장별 첫 배송완료는 MIN, 그룹별 분위수는 ROW_NUMBER/COUNT 창 함수로 DB 안에서 계산 (행을 끌어오지 않음)
+# - 결과는 파라미터별로 캐시하고, 변경 로그 head 커서가 바뀌면(새 이벤트/상세 반영) 다시 계산
+SLA_DEFAULT_HOURS = 48.0
+SLA_WINDOW_MIN_HOURS = 1.0 # Monitoring.build_delivery_windows 와 같은 유효 구간
+SLA_WINDOW_MAX_HOURS = 336.0
+SLA_CACHE_SIZE = int(os.getenv("SLA_CACHE_SIZE", "64")) # 0이면 캐시 끔
+_SLA_DELIVERED_LIKE = ("%delivered%", "%배송%완료%", "%배달%완료%")
+_SLA_NOT_DELIVERED_LIKE = ("%undelivered%", "%not delivered%")
+_SLA_GROUP_KEYS = ("carrier", "origin", "customs_office", "day", "week", "month")
+_SLA_PERCENTILES = (("p50_hours", 0.5), ("p90_hours", 0.9))
+
+_sla_cache: "OrderedDict[tuple, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+_sla_cache_lock = threading.Lock()
+
+def _sql_hours_between(dialect: str, a, b):
+    if dialect == "postgresql":
+        return func.extract("epoch", b - a) / 3600.0
+    return (func.julianday(b) - func.julianday(a)) * 24.0
+
+def _sql_period(dialect: str, col, interval: str):
+    """UTC 기준 기간 시작일 문자열 (YYYY-MM-DD, 주는 월요일 시작 — _trend_period와 같음)"""
+    if dialect == "postgresql":
+        return func.to_char(func.date_trunc(interval, func.timezone("UTC", col)), "YYYY-MM-DD")
+    if interval == "week":
+        return func.date(col, "weekday 0", "-6 days")
+    if interval == "month":
+        return func.strftime("%Y-%m-01", col)
+    return func.date(col)
+
+def _compute_sla(db, sla_hours: float, start: date, end: date, keys: List[str]) -> List[Dict[str, Any]]:
+    dialect = db.get_bind().dialect.name
+    S, E, D = Shipment.__table__, ShipmentEvent.__table__, ShipmentDetails.__table__
+    start_dt = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+    end_dt = datetime(end.year, end.month, end.day, tzinfo=timezone.utc) + timedelta(days=1)
+
+    dlv = (
+        select(E.c.shipment_id, func.min(E.c.ts).label("ts"))
+        .select_from(E.join(S, S.c.id == E.c.shipment_id))
+        .where(
+            S.c.cleared_at >= start_dt, S.c.cleared_at < end_dt,
+            E.c.stage == "CLEARED", E.c.ts >= S.c.cleared_at,
+            or_(*[E.c.desc.ilike(p) for p in _SLA_DELIVERED_LIKE]),
+            *[~E.c.desc.ilike(p) for p in _SLA_NOT_DELIVERED_LIKE],
         )
-        return [_serialize_row(x) for x in rows]
+        .group_by(E.c.shipment_id)
+    ).cte("dlv")
+
+    key_exprs = {
+        "carrier": func.coalesce(S.c.carrier, ""),
+        "origin": func.coalesce(D.c.origin_country, ""),
+        "customs_office": func.coalesce(D.c.customs_office, ""),
+        "day": _sql_period(dialect, S.c.cleared_at, "day"),
+        "week": _sql_period(dialect, S.c.cleared_at, "week"),
+        "month": _sql_period(dialect, S.c.cleared_at, "month"),
+    }
+    hours = _sql_hours_between(dialect, S.c.cleared_at, dlv.c.ts)
+    win = (
+        select(*[key_exprs[k].label(k) for k in keys], hours.label("hours"))
+        .select_from(
+            S.join(dlv, dlv.c.shipment_id == S.c.id)
+             .outerjoin(D, D.c.shipment_id == S.c.id)
+        )
+        .where(hours > SLA_WINDOW_MIN_HOURS, hours < SLA_WINDOW_MAX_HOURS)
+    ).cte("win")
+
+    part = [win.c[k] for k in keys] or None
+    ranked = select(
+        *[win.c[k] for k in keys],
+        win.c.hours,
+        func.row_number().over(partition_by=part, order_by=win.c.hours).label("rn"),
+        func.count().over(partition_by=part).label("n"),
+    ).cte("ranked")
+    group = [ranked.c[k] for k in keys]
+    stmt = select(
+        *group,
+        func.count().label("shipments"),
+        func.sum(case((ranked.c.hours <= sla_hours, 1), else_=0)).label("compliant"),
+        func.avg(ranked.c.hours).label("avg_hours"),
+        func.max(ranked.c.hours).label("max_hours"),
+        # nearest-rank 분위수: 누적 비율이 q 이상인 첫 값
+        *[func.min(case((ranked.c.rn >= ranked.c.n * q, ranked.c.hours))).label(name) for name, q in _SLA_PERCENTILES],
+    ).group_by(*group).order_by(*group)
+
+    out = []
+    for r in db.execute(stmt).mappings():
+        item = {k: r[k] for k in keys}
+        item.update({
+            "shipments": r["shipments"],
+            "compliant": int(r["compliant"] or 0),
+            "compliance_rate": round(int(r["compliant"] or 0) / r["shipments"], 4) if r["shipments"] else None,
+            "avg_hours": round(float(r["avg_hours"]), 2) if r["avg_hours"] is not None else None,
+            "max_hours": round(float(r["max_hours"]), 2) if r["max_hours"] is not None else None,
+        })
+        for name, _ in _SLA_PERCENTILES:
+            item[name] = round(float(r[name]), 2) if r[name] is not None else None
+        out.append(item)
+    return out
+
+@app.get("/api/stats/sla")
+def stats_sla(
+    sla_hours: float = Query(SLA_DEFAULT_HOURS, gt=0, le=SLA_WINDOW_MAX_HOURS, description="통관완료 후 배송완료까지 허용 시간"),
+    start: Optional[date] = Query(None, description="통관완료 일자 시작 (UTC, 기본: end - 27일)"),
+    end: Optional[date] = Query(None, description="통관완료 일자 끝 (포함, 기본: 오늘)"),
+    group_by: str = Query("carrier", description=f"쉼표 구분 그룹 키 ({', '.join(_SLA_GROUP_KEYS)}), 빈 값이면 전체"),
+):
+    """
+    통관완료 → 첫 배송완료 소요시간의 SLA 준수율 (그룹별 건수/준수율/평균/p50/p90/최대).
+    - 유효 구간(1h 초과, 336h 미만) 밖의 소요시간은 제외 (Monitoring과 같음)
+    - 보관(아카이브)으로 옮겨진 이벤트는 대상이 아님
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=27)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be <= end")
+    keys = list(dict.fromkeys(k.strip().lower() for k in group_by.split(",") if k.strip()))
+    unknown = [k for k in keys if k not in _SLA_GROUP_KEYS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown group_by key(s): {', '.join(unknown)}")
+    if sum(k in ("day", "week", "month") for k in keys) > 1:
+        raise HTTPException(status_code=400, detail="use at most one of day/week/month")
+
+    cache_key = (sla_hours, start, end, tuple(keys))
+    C = ShipmentChange.__table__
+    with get_read_db() as db:
+        # 계산 전에 head를 읽는다: 계산 중 반영된 변경은 다음 요청에서 head 불일치로 다시 계산됨
+        head = db.execute(select(func.max(C.c.id))).scalar() or 0
+        with _sla_cache_lock:
+            hit = _sla_cache.get(cache_key)
+            if hit is not None and hit[0] == head:
+                _sla_cache.move_to_end(cache_key)
+                return hit[1]
+        groups = _compute_sla(db, sla_hours, start, end, keys)
+
+    shipments = sum(g["shipments"] for g in groups)
+    compliant = sum(g["compliant"] for g in groups)
+    result = {
+        "sla_hours": sla_hours,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": keys,
+        "shipments": shipments,
+        "compliant": compliant,
+        "compliance_rate": round(compliant / shipments, 4) if shipments else None,
+        "groups": groups,
+        "as_of_cursor": head,
+    }
+    if SLA_CACHE_SIZE > 0:
+        with _sla_cache_lock:
+            _sla_cache[cache_key] = (head, result)
+            _sla_cache.move_to_end(cache_key)
+            while len(_sla_cache) > SLA_CACHE_SIZE:
+                _sla_cache.popitem(last=False)
+    return result
+
+@app.post("/admin/stats/rebuild")
+async def admin_rebuild_stats():
+    """집계 카운터 / 일별 소요시간 롤업을 원본 테이블에서 다시 계산 (불일치 의심 시)"""
+    n = await run_in_db(_rebuild_aggregates)
+    groups = await run_in_db(_rebuild_clearance_rollups)
+    return {"ok": True, "rows": n, "rollup_groups": groups}
+
+# ======= 변경 로그 (델타 동기화) =======
+
+CHANGES_PAGE_DEFAULT = 500
+CHANGES_PAGE_MAX = 5000
+
+@app.get("/admin/changes")
+def admin_changes(
+    response: Response,
+    since: int = Query(0, ge=0, description="이전 응답의 X-Next-Cursor 헤더 값 (처음엔 0)"),
+    limit: int = Query(CHANGES_PAGE_DEFAULT, ge=1, le=CHANGES_PAGE_MAX),
+    kind: Optional[str] = Query(None, description="종류 필터 (쉼표 구분, 예: shipment,events)"),
+):
+    """
+    since 이후 변경만 id 오름차순으로 (목록 전체 재다운로드 대신 델타만).
+    - X-Next-Cursor: 다음 요청의 since (변경이 없어도 항상 설정)
+    - X-Head-Cursor: 현재 마지막 커서 (Next < Head 면 바로 이어서 요청)
+    - since가 이미 정리된 구간이면 410 → Head 커서를 받아 두고 목록을 다시 받은 뒤 그 커서부터
+    """
+    C = ShipmentChange.__table__
+    with get_read_db() as db:
+        oldest, head = db.execute(select(func.min(C.c.id), func.max(C.c.id))).one()
+        head = head or 0
+        if since and oldest is not None and since < oldest - 1:
+            raise HTTPException(status_code=410, detail="cursor expired; resync from the list")
+        stmt = select(C).where(C.c.id > since)
+        if kind:
+            stmt = stmt.where(C.c.kind.in_([x.strip().lower() for x in kind.split(",") if x.strip()]))
+        rows = db.execute(stmt.order_by(C.c.id).limit(limit)).mappings().all()
+
+    # 필터로 걸러진 구간도 건너뛸 수 있도록, 한 페이지를 다 못 채웠으면 head까지 전진
+    next_cursor = rows[-1]["id"] if len(rows) == limit else max(head, since, rows[-1]["id"] if rows else 0)
+    response.headers["X-Next-Cursor"] = str(next_cursor)
+    response.headers["X-Head-Cursor"] = str(head)
+    return [_change_out(r) for r in rows]
+
+def _change_out(r) -> Dict[str, Any]:
+    return {
+        "cursor": r["id"],
+        "kind": r["kind"],
+        "tracking_number": r["tracking_number"],
+        "last_status": r["last_status"],
+        "count": r["count"],
+        "at": _iso_or_none(r["created_at"]),
+    }
+
+# ======= 서버 푸시 (SSE) =======
+# [ANCHOR: PUSH]
+# - 원천은 변경 로그: 변경을 쓴 커밋 직후(after_commit) 분배기를 깨우고, 분배기가 커서 이후 행을 한 번 읽어 나눠 준다
+#   (다른 프로세스의 쓰기는 STREAM_POLL_SEC 주기 확인으로 따라잡음, 구독자가 없으면 조회하지 않음)
+# - SSE id = 변경 커서 → EventSource 자동 재연결(Last-Event-ID)은 놓친 구간을 로그에서 재생, 정리된 구간이면 resync
+# - 규제 공지는 be4 공지 서비스 listener로 받아 notice 이벤트로 (커서 없음)
+# - WebSocket 대신 SSE: 서버→클라이언트 단방향이고 구독 조건은 URL로 충분, 프록시/재연결 처리가 브라우저 기본
+STREAM_KINDS = ("shipment", "events", "details", "notice")
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "256")) # 연결별 대기 메시지 상한 (넘으면 resync)
+STREAM_HEARTBEAT_SEC = float(os.getenv("STREAM_HEARTBEAT_SEC", "25")) # 프록시 유휴 끊김 방지 주석 프레임
+STREAM_POLL_SEC = float(os.getenv("STREAM_POLL_SEC", "5"))
+STREAM_MAX_NUMBERS = int(os.getenv("STREAM_MAX_NUMBERS", "500"))
+STREAM_REPLAY_MAX = int(os.getenv("STREAM_REPLAY_MAX", "5000")) # 재연결 재생 상한 (넘으면 resync)
+
+def _read_changes_after(since: int, limit: int, upto: Optional[int] = None) -> List[Dict[str, Any]]:
+    C = ShipmentChange.__table__
+    stmt = select(C).where(C.c.id > since)
+    if upto is not None:
+        stmt = stmt.where(C.c.id <= upto)
+    with get_read_db() as db:
+        return [_change_out(r) for r in db.execute(stmt.order_by(C.c.id).limit(limit)).mappings()]
+
+def _read_change_head() -> int:
+    with get_read_db() as db:
+        return db.execute(select(func.max(ShipmentChange.id))).scalar() or 0
+
+def _read_change_oldest() -> Optional[int]:
+    with get_read_db() as db:
+        return db.execute(select(func.min(ShipmentChange.id))).scalar()
+
+change_broadcaster = ChangeBroadcaster(
+    _read_changes_after, _read_change_head,
+    queue_size=STREAM_QUEUE_SIZE, poll_interval=STREAM_POLL_SEC,
+)
+
+@sa_event.listens_for(SessionLocal, "after_commit")
+def _wake_broadcaster(session):
+    if session.info.pop("changes_recorded", False):
+        change_broadcaster.wake()
+
+@sa_event.listens_for(SessionLocal, "after_rollback")
+def _discard_changes_recorded(session):
+    session.info.pop("changes_recorded", None)
+
+def _publish_notices(version: int, added):
+    change_broadcaster.publish("notice", {
+        "version": version,
+        "added": [
+            {
+                "id": n.id,
+                "title": n.title,
+                "category": n.category,
+                "risk_level": n.risk_level,
+                "published_at": _iso_or_none(n.published_at),
+                "url": n.url,
+            }
+            for n in added if not n.is_fallback
+        ],
+    }, kind="notice")
+
+be4.notice_service.add_listener(_publish_notices)
+
+def _split_param(value: Optional[str]) -> List[str]:
+    return [x.strip() for x in (value or "").split(",") if x.strip()]
+
+@app.get("/api/stream")
+async def api_stream(
+    request: Request,
+    numbers: Optional[str] = Query(None, description="구독할 운송장 번호 (쉼표 구분, 없으면 전체)"),
+    kinds: Optional[str] = Query(None, description="shipment,events,details,notice 중 (쉼표 구분, 없으면 전부)"),
+    since: Optional[int] = Query(None, ge=0, description="이 커서 이후부터 (Last-Event-ID 헤더가 우선)"),
+):
+    """
+    text/event-stream. 프레임:
+    - event: change (id = 변경 커서, data = /admin/changes 항목과 같은 모양)
+    - event: notice (새 규제 공지, id 없음)
+    - event: ready (재생을 마친 시점의 커서) / event: resync (놓친 구간을 채울 수 없음 → 목록을 다시 받기)
+    """
+    wanted_numbers = _split_param(numbers)
+    if len(wanted_numbers) > STREAM_MAX_NUMBERS:
+        raise HTTPException(status_code=400, detail=f"numbers는 최대 {STREAM_MAX_NUMBERS}개")
+    wanted_kinds = {k.lower() for k in _split_param(kinds)} or set(STREAM_KINDS)
+    unknown = wanted_kinds - set(STREAM_KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 kinds: {', '.join(sorted(unknown))}")
+    last_id = request.headers.get("last-event-id")
+    if last_id is not None:
+        try:
+            since = int(last_id)
+        except ValueError:
+            since = None
+
+    sub, start = await change_broadcaster.subscribe(set(wanted_numbers) if wanted_numbers else None, wanted_kinds)
+
+    async def _replay() -> Tuple[List[Dict[str, Any]], bool]:
+        # (since, start] 구간 — 구독 등록 뒤에 읽으므로 start 이후는 큐로 들어와 빠짐없이 이어진다
+        if since is None or since >= start:
+            return [], False
+        oldest = await run_in_threadpool(_read_change_oldest)
+        if oldest is None or since < oldest - 1 or start - since > STREAM_REPLAY_MAX:
+            return [], True
+        rows = await run_in_threadpool(_read_changes_after, since, STREAM_REPLAY_MAX, start)
+        return [r for r in rows if sub.wants(r)], False
+
+    async def _frames():
+        try:
+            yield "retry: 3000\n\n"
+            rows, expired = await _replay()
+            for r in rows:
+                yield format_sse("change", r, r["cursor"])
+            if expired:
+                yield format_sse("resync", {"cursor": start}, start)
+            else:
+                yield format_sse("ready", {"cursor": start}, start)
+            while True:
+                try:
+                    event, id_, data = await asyncio.wait_for(sub.queue.get(), STREAM_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event, data, id_)
+        finally:
+            change_broadcaster.unsubscribe(sub)
+
+    return StreamingResponse(
+        _frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/admin/stream-stats")
+def admin_stream_stats():
+    return change_broadcaster.snapshot()
+
+# ======= 검색 (sqlite FTS5) =======
+# [ANCHOR: SEARCH]
+# - shipment_fts: 운송장 1건 = 문서 1개 (번호/carrier + 상세의 품목·세관·출발국·포워더·컨테이너)
+#   trigram 토크나이저 → 번호 중간 일부("345678")나 띄어쓰기 없는 한글("공항세관")도 부분 일치
+# - event_fts: shipment_events.desc 외부 콘텐츠 테이블 (본문 중복 저장 없음), unicode61 + 접두 인덱스
+# - 둘 다 트리거로 같은 트랜잭션에서 동기화 (쓰기 경로 코드는 그대로)
+SEARCH_EVENT_CANDIDATES = int(os.getenv("SEARCH_EVENT_CANDIDATES", "2000")) # 이벤트는 최신 N건 후보 안에서 순위
+_SHIPMENT_FTS_DETAIL_COLUMNS = ("product_info", "customs_office", "origin_country", "forwarder_name", "container_no")
+_SHIPMENT_FTS_WEIGHTS = (10.0, 2.0, 3.0, 3.0, 2.0, 1.0, 2.0) # tracking_number, carrier, 상세 컬럼 순
+_EVENT_FTS_PREFIXES = (2, 3, 4, 5, 6) # 이 길이까지의 접두 검색만 색인으로 바로 찾음 (더 긴 토큰은 완전 일치)
+
+def _ensure_search_index() -> bool:
+    """FTS 테이블/트리거를 만들고, 새로 만든 경우 기존 데이터로 채운다. FTS5가 없거나 sqlite가 아니면 False"""
+    if engine.dialect.name != "sqlite":
+        return False
+    detail_cols = ", ".join(_SHIPMENT_FTS_DETAIL_COLUMNS)
+    detail_new = ", ".join(f"coalesce(new.{c}, '')" for c in _SHIPMENT_FTS_DETAIL_COLUMNS)
+    detail_set = ", ".join(f"{c} = coalesce(new.{c}, '')" for c in _SHIPMENT_FTS_DETAIL_COLUMNS)
+    detail_changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in _SHIPMENT_FTS_DETAIL_COLUMNS)
+    try:
+        with engine.begin() as conn:
+            have = {r[0] for r in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "shipment_fts" not in have:
+                try:
+                    conn.exec_driver_sql(
+                        f"CREATE VIRTUAL TABLE shipment_fts USING fts5(tracking_number, carrier, {detail_cols}, "
+                        f"tokenize = 'trigram')"
+                    )
+                except SQLAlchemyError: # trigram은 sqlite 3.34+
+                    conn.exec_driver_sql(
+                        f"CREATE VIRTUAL TABLE shipment_fts USING fts5(tracking_number, carrier, {detail_cols}, "
+                        f"prefix = '2 3 4')"
+                    )
+                conn.exec_driver_sql(
+                    f"INSERT INTO shipment_fts (rowid, tracking_number, carrier, {detail_cols}) "
+                    f"SELECT s.id, s.tracking_number, coalesce(s.carrier, ''), "
+                    + ", ".join(f"coalesce(d.{c}, '')" for c in _SHIPMENT_FTS_DETAIL_COLUMNS)
+                    + " FROM shipments s LEFT JOIN shipment_details d ON d.shipment_id = s.id"
+                )
+            if "event_fts" not in have:
+                conn.exec_driver_sql(
+                    "CREATE VIRTUAL TABLE event_fts USING fts5(\"desc\", content = 'shipment_events', "
+                    f"content_rowid = 'id', prefix = '{' '.join(map(str, _EVENT_FTS_PREFIXES))}')"
+                )
+                conn.exec_driver_sql("INSERT INTO event_fts (event_fts) VALUES ('rebuild')")
+            for ddl in (
+                # 운송장
+                "CREATE TRIGGER IF NOT EXISTS shipments_fts_ai AFTER INSERT ON shipments BEGIN "
+                "INSERT INTO shipment_fts (rowid, tracking_number, carrier) "
+                "VALUES (new.id, new.tracking_number, coalesce(new.carrier, '')); END",
+                "CREATE TRIGGER IF NOT EXISTS shipments_fts_au AFTER UPDATE OF carrier ON shipments "
+                "WHEN old.carrier IS NOT new.carrier BEGIN "
+                "UPDATE shipment_fts SET carrier = coalesce(new.carrier, '') WHERE rowid = new.id; END",
+                "CREATE TRIGGER IF NOT EXISTS shipments_fts_ad AFTER DELETE ON shipments BEGIN "
+                "DELETE FROM shipment_fts WHERE rowid = old.id; END",
+                # 상세 (동기화마다 바뀌는 상태 텍스트/처리일시는 색인하지 않음)
+                f"CREATE TRIGGER IF NOT EXISTS shipment_details_fts_ai AFTER INSERT ON shipment_details BEGIN "
+                f"UPDATE shipment_fts SET {detail_set} WHERE rowid = new.shipment_id; END",
+                f"CREATE TRIGGER IF NOT EXISTS shipment_details_fts_au AFTER UPDATE OF {detail_cols} ON shipment_details "
+                f"WHEN {detail_changed} BEGIN "
+                f"UPDATE shipment_fts SET {detail_set} WHERE rowid = new.shipment_id; END",
+                # 이벤트 (중복은 INSERT 전에 걸러지고, 보관 이동은 DELETE)
+                "CREATE TRIGGER IF NOT EXISTS shipment_events_fts_ai AFTER INSERT ON shipment_events BEGIN "
+                "INSERT INTO event_fts (rowid, \"desc\") VALUES (new.id, new.\"desc\"); END",
+                "CREATE TRIGGER IF NOT EXISTS shipment_events_fts_ad AFTER DELETE ON shipment_events BEGIN "
+                "INSERT INTO event_fts (event_fts, rowid, \"desc\") VALUES ('delete', old.id, old.\"desc\"); END",
+            ):
+                conn.exec_driver_sql(ddl)
+        return True
+    except SQLAlchemyError as e:
+        print(f"[search] FTS5 사용 불가, LIKE 검색으로 대체: {e}")
+        return False
 
-@app.get("/admin/list-shipments")
-def admin_list_shipments():
-    """레거시 호환(같은 응답)"""
-    return admin_shipments()
+SEARCH_FTS = _ensure_search_index()
 
-@app.get("/user/trackings")
-def user_trackings():
-    """사용자: DB의 모든 운송장 목록 (같은 포맷)"""
-    return admin_shipments()
+def _fts_query(q: str, prefix_max: int = 0, min_len: int = 1) -> Optional[str]:
+    """
+    사용자 입력 → 안전한 FTS5 MATCH 식 (토큰마다 따옴표, AND). 쓸 토큰이 없으면 None
+    prefix_max: 입력 중인 마지막 토큰이 이 길이 이하면 접두 일치
+      (접두 인덱스에 없는 길이의 확장은 doclist 병합이라 흔한 단어에서 수십 ms)
+    """
+    tokens = [t for t in re.findall(r"\w+", q) if len(t) >= min_len]
+    if not tokens:
+        return None
+    last = len(tokens) - 1
+    return " ".join(f'"{t}"' + ("*" if i == last and len(t) <= prefix_max else "") for i, t in enumerate(tokens))
+
+def _search_fts(db, q: str, scope: str, limit: int) -> Dict[str, list]:
+    shipments, events = [], []
+    if scope in ("all", "shipments"):
+        # trigram은 3글자 이상 토큰만 색인 조회 가능 (부분 일치라 접두 * 불필요)
+        match = _fts_query(q, min_len=3)
+        if match:
+            weights = ", ".join(str(w) for w in _SHIPMENT_FTS_WEIGHTS)
+            hits = db.execute(text(
+                f"SELECT rowid, bm25(shipment_fts, {weights}) AS score, "
+                f"snippet(shipment_fts, -1, '[', ']', '…', 32) AS snip "
+                f"FROM shipment_fts WHERE shipment_fts MATCH :q ORDER BY score LIMIT :limit"
+            ), {"q": match, "limit": limit}).all()
+            rows = {r["id"]: r for r in db.execute(
+                select(*_LIST_COLUMNS).where(Shipment.id.in_([h.rowid for h in hits]))
+            ).mappings()}
+            shipments = [
+                {**_serialize_row(rows[h.rowid]), "score": round(-h.score, 4), "snippet": h.snip}
+                for h in hits if h.rowid in rows
+            ]
+    if scope in ("all", "events"):
+        match = _fts_query(q, prefix_max=max(_EVENT_FTS_PREFIXES))
+        if match:
+            # bm25는 단어마다 전체 doclist를 세므로 흔한 단어(수십만 건)에서는 비용이 커진다.
+            # 최신순 후보를 먼저 N건 세어 보고, 다 차면(흔한 검색어) 최신순, 아니면 bm25 관련도순
+            cand = max(SEARCH_EVENT_CANDIDATES, limit)
+            n_cand = db.execute(text(
+                "SELECT count(*) FROM (SELECT rowid FROM event_fts WHERE event_fts MATCH :q "
+                "ORDER BY rowid DESC LIMIT :cand)"
+            ), {"q": match, "cand": cand}).scalar()
+            if n_cand >= cand:
+                inner = ("SELECT rowid, NULL AS score, snippet(event_fts, 0, '[', ']', '…', 10) AS snip "
+                         "FROM event_fts WHERE event_fts MATCH :q ORDER BY rowid DESC LIMIT :limit")
+            else:
+                inner = ("SELECT rowid, bm25(event_fts) AS score, snippet(event_fts, 0, '[', ']', '…', 10) AS snip "
+                         "FROM event_fts WHERE event_fts MATCH :q ORDER BY rank LIMIT :limit")
+            # FTS 조회와 본문 조회를 나눈다 (서브쿼리 JOIN은 평탄화되어 LIMIT 전에 이벤트 테이블을 훑음)
+            hits = db.execute(text(inner), {"q": match, "limit": limit}).all()
+            E = ShipmentEvent
+            rows = {r.id: r for r in db.execute(
+                select(E.id, E.tracking_number, E.ts, E.stage, E.desc, E.source)
+                  .where(E.id.in_([h.rowid for h in hits]))
+            )}
+            events = [
+                {
+                    "tracking_number": rows[h.rowid].tracking_number,
+                    "ts": _iso_or_none(rows[h.rowid].ts),
+                    "stage": rows[h.rowid].stage,
+                    "desc": rows[h.rowid].desc,
+                    "source": rows[h.rowid].source,
+                    "score": round(-h.score, 4) if h.score is not None else None,
+                    "snippet": h.snip,
+                }
+                for h in hits if h.rowid in rows
+            ]
+    return {"shipments": shipments, "events": events}
+
+def _search_like(db, q: str, scope: str, limit: int) -> Dict[str, list]:
+    # FTS5가 없는 환경(postgresql 등): 부분 일치 LIKE (순위 없음, 최신순)
+    pattern = f"%{q.strip()}%"
+    shipments, events = [], []
+    if scope in ("all", "shipments"):
+        D = ShipmentDetails
+        rows = db.execute(
+            select(*_LIST_COLUMNS)
+              .outerjoin(D, D.shipment_id == Shipment.id)
+              .where(or_(Shipment.tracking_number.ilike(pattern), Shipment.carrier.ilike(pattern),
+                         *[getattr(D, c).ilike(pattern) for c in _SHIPMENT_FTS_DETAIL_COLUMNS]))
+              .order_by(Shipment.updated_at.desc())
+              .limit(limit)
+        ).mappings().all()
+        shipments = [{**_serialize_row(r), "score": None, "snippet": None} for r in rows]
+    if scope in ("all", "events"):
+        E = ShipmentEvent
+        rows = db.execute(
+            select(E.tracking_number, E.ts, E.stage, E.desc, E.source)
+              .where(E.desc.ilike(pattern)).order_by(E.id.desc()).limit(limit)
+        ).all()
+        events = [
+            {"tracking_number": r.tracking_number, "ts": _iso_or_none(r.ts), "stage": r.stage, "desc": r.desc,
+             "source": r.source, "score": None, "snippet": None}
+            for r in rows
+        ]
+    return {"shipments": shipments, "events": events}
+
+@app.get("/api/search")
+def api_search(
+    q: str = Query(..., min_length=1, max_length=200, description="검색어 (공백 구분 AND, 이벤트는 마지막 단어 접두 일치)"),
+    scope: str = Query("all", pattern="^(all|shipments|events)$"),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """
+    운송장 번호 일부 / 품목 / 세관 / 출발국 / 포워더 / 이벤트 설명 검색 (관련도순).
+    보관(아카이브)된 이벤트는 대상이 아님.
+    """
+    with get_read_db() as db:
+        res = _search_fts(db, q, scope, limit) if SEARCH_FTS else _search_like(db, q, scope, limit)
+    return {"q": q, "scope": scope, **res}
 
 def translate_event_description(desc: str, stage: str) -> str:
     """이벤트 설명을 한국어로 번역"""
@@ -1631,186 +3893,153 @@ def translate_event_description(desc: str, stage: str) -> str:
     return desc
 
 
+_STATUS_KO = {
+    "CLEARED": "통관 완료",
+    "IN_PROGRESS": "통관 진행 중",
+    "DELAY": "세관 보류",
+    "UNKNOWN": "확인 중",
+}
+
+def _time_ago(event_time: datetime) -> str:
+    diff = datetime.now(timezone.utc) - event_time
+    if diff.total_seconds() < 60:
+        return "방금 전"
+    if diff.total_seconds() < 3600:
+        return f"{int(diff.total_seconds() / 60)}분 전"
+    if diff.total_seconds() < 86400:
+        return f"{int(diff.total_seconds() / 3600)}시간 전"
+    if diff.days < 7:
+        return f"{diff.days}일 전"
+    return event_time.strftime("%Y-%m-%d")
+
+def _recent_event_item(num: str, key, stage: Optional[str], desc: Optional[str], event_time) -> Dict[str, Any]:
+    """최신 이벤트 1건 → 활동 피드 항목"""
+    stage = stage or "UNKNOWN"
+    status_ko = _STATUS_KO.get(stage, "확인 중")
+    event_time = _as_utc(event_time) if event_time else None
+    return {
+        "id": f"{num}_{key}",
+        "tracking_number": num,
+        "title": f"{status_ko} - #{num[-8:]}",
+        "description": translate_event_description(desc or "", stage),
+        "time": _time_ago(event_time) if event_time else "알 수 없음",
+        "time_iso": event_time.isoformat() if event_time else None,
+        "stage": stage,
+        "status": status_ko,
+        "source": "DB",
+    }
+
+def _load_recent_events(numbers: List[str]) -> Tuple[List[Dict[str, Any]], Dict[str, Optional[datetime]]]:
+    """
+    번호별 최신 이벤트를 한 쿼리로 (청크당): shipments에서 번호를 찾고, 각 번호의 최신 이벤트 id를
+    (tracking_number, ts DESC) 인덱스 한 번 탐색으로 골라 조인.
+    hot 테이블에 이벤트가 없으면(보관 이동 등) 운송장 요약 컬럼으로 대신한다.
+    반환: (피드 항목, 번호 → 마지막 갱신 시각) — DB에 없는 번호는 두 번째 dict에도 없음
+    """
+    S, E = Shipment.__table__, ShipmentEvent.__table__
+    latest_id = (
+        select(E.c.id)
+        .where(E.c.tracking_number == S.c.tracking_number)
+        .order_by(E.c.ts.desc(), E.c.id.desc())
+        .limit(1)
+        .correlate(S)
+        .scalar_subquery()
+    )
+    items: List[Dict[str, Any]] = []
+    updated: Dict[str, Optional[datetime]] = {}
+    with get_read_db() as db:
+        for chunk in _chunked(numbers, 500):
+            rows = db.execute(
+                select(
+                    S.c.tracking_number, S.c.updated_at, S.c.last_status, S.c.last_event, S.c.last_event_ts,
+                    E.c.id.label("event_id"), E.c.ts, E.c.last_ts, E.c.stage, E.c.desc,
+                )
+                .select_from(S.outerjoin(E, E.c.id == latest_id))
+                .where(S.c.tracking_number.in_(chunk))
+            ).mappings().all()
+            for r in rows:
+                num = r["tracking_number"]
+                updated[num] = _as_utc(r["updated_at"]) if r["updated_at"] else None
+                if r["event_id"] is not None:
+                    # 접힌 반복 스캔은 ts = 첫 시각 → 최근 활동은 마지막 시각(last_ts)
+                    ts = _as_utc(r["last_ts"] or r["ts"])
+                    items.append(_recent_event_item(num, r["event_id"], r["stage"], r["desc"], ts))
+                elif r["last_event_ts"] is not None:
+                    items.append(_recent_event_item(
+                        num, int(_as_utc(r["last_event_ts"]).timestamp()),
+                        r["last_status"], r["last_event"], r["last_event_ts"],
+                    ))
+    return items, updated
+
+RECENT_REFRESH_MAX = int(os.getenv("RECENT_REFRESH_MAX", "200")) # 요청 1건이 예약하는 재조회 상한
+_recent_refreshing: set = set() # 재조회 진행 중 번호 (대시보드가 반복 요청해도 한 번만, _poll_lock으로 보호)
+
+async def _refresh_recent_numbers(numbers: List[str]):
+    try:
+        await _fetch_and_upsert_many(numbers)
+    except Exception as e:
+        print(f"[recent-events] 백그라운드 재조회 실패({len(numbers)}건): {e}")
+    finally:
+        with _poll_lock:
+            _recent_refreshing.difference_update(numbers)
+
+
 @app.get("/api/recent-events")
-async def get_recent_events(
+def get_recent_events(
+    background_tasks: BackgroundTasks,
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
-    tracking_numbers: Optional[str] = Query(None, description="쉼표로 구분된 운송장 번호 목록 (필터링용)")
+    tracking_numbers: Optional[str] = Query(None, description="쉼표로 구분된 운송장 번호 목록 (필터링용)"),
+    refresh_older_than: Optional[int] = Query(
+        None, ge=1, le=1440,
+        description="이 시간(분) 안에 갱신·조회되지 않은 번호(DB에 없는 번호 포함)는 백그라운드로 17TRACK 재조회 (응답은 기다리지 않음)",
+    ),
 ):
-    """최근 통관 이벤트 조회 (활동 피드용) - 17track API에서 직접 조회"""
-    print(f"[recent-events] 요청 받음: limit={limit}, tracking_numbers={tracking_numbers}")
-    
-    # tracking_numbers 파라미터가 필수
-    if not tracking_numbers:
-        print(f"[recent-events] 경고: tracking_numbers 파라미터가 없음. 빈 배열 반환")
-        return []
-    
-    # 쉼표로 구분된 운송장 번호 목록 파싱
-    numbers_list = [num.strip() for num in tracking_numbers.split(",") if num.strip()]
+    """
+    최근 통관 이벤트 조회 (활동 피드용) - 저장된 이벤트(shipment_events)에서 번호별 최신 1건.
+    재조회 결과는 저장 후 변경 로그 → /api/stream 구독자에게 푸시된다.
+    X-Refresh-Queued: 이번 요청으로 재조회를 예약한 번호 수
+    """
+    numbers_list = list(dict.fromkeys(_parse_numbers_str(tracking_numbers or "")))
     if not numbers_list:
-        print(f"[recent-events] 경고: 파싱된 운송장 번호가 없음. 빈 배열 반환")
         return []
-    
-    print(f"[recent-events] 조회할 운송장 번호: {numbers_list}")
-    
-    # 17track API에서 직접 조회
-    result = []
-    
-    # 40개씩 배치로 나누어 조회 (17track API 제한)
-    for chunk in _chunked(numbers_list, 40):
-        try:
-            # 17track API 호출
-            print(f"[recent-events] 17track API 호출 중: {len(chunk)}개 운송장")
-            payload = await get_trackinfo(chunk)
-            print(f"[recent-events] 17track API 응답 받음: type={type(payload)}, keys={list(payload.keys()) if isinstance(payload, dict) else 'not dict'}")
-        except Exception as e:
-            print(f"[recent-events] 17track API 호출 실패: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
-        
-        # 스키마 방어: payload에서 track 정보 추출
-        tracks: List[Dict[str, Any]] = []
-        if isinstance(payload, list):
-            tracks = payload
-        elif isinstance(payload, dict):
-            data_obj = payload.get("data")
-            if isinstance(data_obj, dict):
-                buckets: List[Dict[str, Any]] = []
-                for key in ("accepted", "result", "list"):
-                    v = data_obj.get(key)
-                    if isinstance(v, list):
-                        buckets.extend(v)
-                tracks = buckets
-            elif isinstance(payload.get("result"), list) or isinstance(payload.get("list"), list):
-                tracks = payload.get("result") or payload.get("list") or []
-            elif payload.get("number"):
-                tracks = [payload]
-        
-        if not tracks:
-            print(f"[recent-events] 경고: payload에서 tracks를 찾을 수 없음. payload type={type(payload)}, keys={list(payload.keys()) if isinstance(payload, dict) else 'not dict'}")
-            continue
-        
-        print(f"[recent-events] 추출된 tracks 수: {len(tracks)}")
-        
-        # 각 운송장의 최신 이벤트 추출
-        for item in tracks:
-            if not isinstance(item, dict):
-                continue
-            
-            num = item.get("number") or item.get("no") or item.get("tracking") or ""
-            if not num:
-                continue
-            
-            track_obj = item.get("track") or item.get("track_info") or item
-            
-            # 이벤트 정규화 (통관 이벤트 우선)
-            normalized = normalize_from_track(track_obj or {})
-            
-            # 통관 이벤트가 없으면 최신 일반 이벤트 추출
-            if not normalized:
-                print(f"[recent-events] 통관 이벤트 없음: {num}, track_obj type={type(track_obj)}, keys={list(track_obj.keys()) if isinstance(track_obj, dict) else 'not dict'}")
-                # v2 providers에서 최신 이벤트 추출
-                ti = _ti_view(track_obj or {})
-                providers = (((ti.get("tracking") or {}).get("providers")) or [])
-                latest_general_event = None
-                latest_time = None
-                
-                for prov in providers:
-                    for e in (prov.get("events") or []):
-                        ts = _parse_multi_time(e)
-                        if ts and (latest_time is None or ts > latest_time):
-                            latest_time = ts
-                            latest_general_event = {
-                                "ts": ts,
-                                "stage": "UNKNOWN",
-                                "desc": (e.get("description") or "").strip() or "이벤트 정보 없음"
-                            }
-                
-                # latest_event에서도 확인
-                le = ti.get("latest_event")
-                if le:
-                    ts = _parse_multi_time(le)
-                    if ts and (latest_time is None or ts > latest_time):
-                        latest_time = ts
-                        latest_general_event = {
-                            "ts": ts,
-                            "stage": "UNKNOWN",
-                            "desc": (le.get("description") or "").strip() or "이벤트 정보 없음"
-                        }
-                
-                if latest_general_event:
-                    print(f"[recent-events] 최신 일반 이벤트 사용: {num}, desc={latest_general_event.get('desc', '')[:50]}")
-                    normalized = [latest_general_event]
-                else:
-                    print(f"[recent-events] 이벤트 없음: {num}")
+
+    result, updated = _load_recent_events(numbers_list)
+
+    queued: List[str] = []
+    if refresh_older_than:
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=refresh_older_than)
+        with _poll_lock:
+            for num in numbers_list:
+                if len(queued) >= RECENT_REFRESH_MAX:
+                    break
+                if num in _recent_refreshing:
                     continue
-            
-            # 최신 이벤트 (가장 최근 시간)
-            latest_event = max(normalized, key=lambda e: e.get("ts") or datetime.min.replace(tzinfo=timezone.utc))
-            
-            stage = latest_event.get("stage", "UNKNOWN")
-            desc = latest_event.get("desc", "")
-            event_time = latest_event.get("ts")
-            
-            # 상태에 따른 한글 표시
-            status_ko = {
-                "CLEARED": "통관 완료",
-                "IN_PROGRESS": "통관 진행 중",
-                "DELAY": "세관 보류",
-                "UNKNOWN": "확인 중"
-            }.get(stage, "확인 중")
-            
-            # 이벤트 설명 한국어 번역
-            description_ko = translate_event_description(desc or "", stage)
-            
-            # 상대 시간 계산
-            if event_time and isinstance(event_time, datetime):
-                now = datetime.now(timezone.utc)
-                if event_time.tzinfo is None:
-                    event_time = event_time.replace(tzinfo=timezone.utc)
-                else:
-                    event_time = event_time.astimezone(timezone.utc)
-                
-                diff = now - event_time
-                
-                if diff.total_seconds() < 60:
-                    time_ago = "방금 전"
-                elif diff.total_seconds() < 3600:
-                    minutes = int(diff.total_seconds() / 60)
-                    time_ago = f"{minutes}분 전"
-                elif diff.total_seconds() < 86400:
-                    hours = int(diff.total_seconds() / 3600)
-                    time_ago = f"{hours}시간 전"
-                elif diff.days < 7:
-                    days = diff.days
-                    time_ago = f"{days}일 전"
-                else:
-                    time_ago = event_time.strftime("%Y-%m-%d")
-            else:
-                time_ago = "알 수 없음"
-                event_time = datetime.now(timezone.utc)
-            
-            result.append({
-                "id": f"{num}_{hash(str(event_time))}",  # 고유 ID 생성
-                "tracking_number": num,
-                "title": f"{status_ko} - #{num[-8:]}",
-                "description": description_ko,
-                "time": time_ago,
-                "time_iso": event_time.isoformat() if hasattr(event_time, "isoformat") else str(event_time),
-                "stage": stage,
-                "status": status_ko,
-                "source": "17TRACK"
-            })
-    
+                seen, polled = updated.get(num), _last_polled.get(num)
+                if polled is not None and (seen is None or polled > seen):
+                    seen = polled
+                if seen is None or seen < cutoff:
+                    queued.append(num)
+            _recent_refreshing.update(queued)
+        if queued:
+            background_tasks.add_task(_refresh_recent_numbers, queued)
+    response.headers["X-Refresh-Queued"] = str(len(queued))
+
     # 시간순으로 정렬 (최신순) 및 limit 적용
-    result.sort(key=lambda x: x.get("time_iso", ""), reverse=True)
-    print(f"[recent-events] 최종 결과: {len(result)}개 이벤트 반환")
+    result.sort(key=lambda x: x.get("time_iso") or "", reverse=True)
     return result[:limit]
 
 
 @app.get("/admin/shipments/{number}/events")
-def admin_shipment_events(number: str):
-    with get_db() as db:
+def admin_shipment_events(number: str, request: Request, response: Response):
+    version, changed_at = shipment_read_cache.version(number)
+    cached = not_modified(request, response, make_etag("events", version), changed_at)
+    if cached is not None:
+        return cached
+    return shipment_read_cache.get_or_load("events", number, lambda: _load_shipment_events(number))
+
+def _load_shipment_events(number: str) -> List[Dict[str, Any]]:
+    with get_read_db() as db:
         ship = db.query(Shipment).filter(Shipment.tracking_number == number).first()
         if not ship:
             raise HTTPException(status_code=404, detail="shipment not found")
@@ -1820,34 +4049,51 @@ def admin_shipment_events(number: str):
                   .order_by(ShipmentEvent.ts.asc())
                   .all())
 
-        # 만약 과거 데이터로 인해 이벤트 테이블이 비어있다면, normalized에서 백필 + 즉시 반환
+        # 보관된 운송장: 보관본 + (보관 이후 들어온) hot 이벤트를 합쳐 반환
+        if ship.events_archive_parts:
+            merged = _archived_events(ship) + [
+                {"ts": _iso_or_none(r.ts), "stage": r.stage, "desc": r.desc, "source": r.source,
+                 "last_ts": _iso_or_none(r.last_ts), "repeat": r.repeat}
+                for r in rows
+            ]
+            merged.sort(key=lambda e: _as_utc(e["ts"]))
+            return [
+                EventOut(ts=e["ts"], stage=e["stage"], desc=e["desc"], source=e["source"],
+                         last_ts=e.get("last_ts"), repeat=e.get("repeat")).model_dump()
+                for e in merged
+            ]
+
+        # 이벤트 테이블이 비어 있는 과거 레코드(백필 작업 전): normalized에서 만들어 응답만 (쓰기 없음)
         if not rows:
-            try:
-                norm = json.loads(ship.normalized or "[]")
-            except Exception:
-                norm = []
-            # 백필
-            if norm:
-                _upsert_events_for_shipment(db, ship, norm, source="normalized")
-                db.commit()
-                rows = (db.query(ShipmentEvent)
-                          .filter(ShipmentEvent.shipment_id == ship.id)
-                          .order_by(ShipmentEvent.ts.asc())
-                          .all())
+            norm = _parse_normalized_json(ship.normalized_bin or ship.normalized)
+            return [
+                EventOut(ts=_iso_or_none(r["ts"]), stage=r["stage"], desc=r["desc"], source=r["source"],
+                         last_ts=_iso_or_none(r["last_ts"]), repeat=r["repeat"]).model_dump()
+                for r in sorted(_event_rows(ship.id, ship.tracking_number, norm), key=lambda r: _as_utc(r["ts"]))
+            ]
 
         return [
             EventOut(
-                ts=(r.ts.isoformat() if hasattr(r.ts, "isoformat") else str(r.ts)),
+                ts=_iso_or_none(r.ts),
                 stage=r.stage,
                 desc=r.desc,
                 source=r.source,
+                last_ts=_iso_or_none(r.last_ts),
+                repeat=r.repeat,
             ).model_dump()
             for r in rows
         ]
 
 @app.get("/admin/shipments/{number}/details")
-def admin_get_shipment_details(number: str):
-    with get_db() as db:
+def admin_get_shipment_details(number: str, request: Request, response: Response):
+    version, changed_at = shipment_read_cache.version(number)
+    cached = not_modified(request, response, make_etag("details", version), changed_at)
+    if cached is not None:
+        return cached
+    return shipment_read_cache.get_or_load("details", number, lambda: _load_shipment_details(number))
+
+def _load_shipment_details(number: str) -> Dict[str, Any]:
+    with get_read_db() as db:
         ship = db.query(Shipment).filter(Shipment.tracking_number == number).one_or_none()
         if not ship:
             raise HTTPException(status_code=404, detail="shipment not found")
@@ -1914,16 +4160,13 @@ def debug_from_json(payload: dict = Body(...)):
     }
 
 @app.put("/admin/shipments/{number}/details")
-def admin_put_shipment_details(number: str, body: ShipmentDetailsIn):
-    with get_db() as db:
-        ship = db.query(Shipment).filter(Shipment.tracking_number == number).one_or_none()
-        if not ship:
-            raise HTTPException(status_code=404, detail="shipment not found")
-        patch = body.model_dump(exclude_unset=True)
-        # 날짜 문자열은 upsert 함수에서 파싱
-        row = upsert_shipment_details(db, ship, patch)
-        def _iso(dt): return dt.isoformat() if getattr(dt, "isoformat", None) else None
-        return {"ok": True, "tracking_number": number, "updated_at": _iso(row.updated_at) if row else None}
+async def admin_put_shipment_details(number: str, body: ShipmentDetailsIn):
+    patch = body.model_dump(exclude_unset=True)
+    # 날짜 문자열은 upsert 함수에서 파싱, group writer 커밋까지 기다림
+    res = await group_writer.submit_details(number, patch)
+    if not res["found"]:
+        raise HTTPException(status_code=404, detail="shipment not found")
+    return {"ok": True, "tracking_number": number, "updated_at": res["updated_at"]}
 
 
 # =============== 예측 API ===============
@@ -6,16 +6,18 @@ import json
 import re
 from datetime import datetime, date, timezone, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Literal
+from typing import Callable, Dict, List, Optional, Literal
 from urllib.parse import urlparse
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel, Field
 from html import escape
 import xml.etree.ElementTree as ET
 
+from http_cache import make_etag, not_modified
+
 
 DATA_DIR = Path(__file__).with_name("be4_data")
 DATA_DIR.mkdir(exist_ok=True)
@@ -474,7 +476,15 @@ class RegulationNoticeService:
         self._notices: Dict[str, RegulationNotice] = {}
         self._task: Optional[asyncio.Task] = None
         self._fallback_details: Dict[str, Dict[str, object]] = {}
+        # 조건부 GET용: 공지 목록 내용이 실제로 바뀔 때만 오르는 버전
+        self.version = 0
+        self.updated_at = datetime.now(timezone.utc)
+        self._digest: Optional[str] = None
+        # 내용이 바뀌면 listener(version, 새로 생긴 공지 목록) 호출 (서버 푸시용, 이벤트 루프에서)
+        self._listeners: List[Callable[[int, List[RegulationNotice]], None]] = []
+        self._known_ids: set = set()
         self._load_cache()
+        self._touch()
 
     def _load_cache(self):
         cache = _load_json(self.cache_path, [])
@@ -593,9 +603,29 @@ class RegulationNoticeService:
             else:
                 self._seed_fallback(datetime.now(timezone.utc))
             self._save_cache()
+            self._touch()
 
         return stats
 
+    def _touch(self):
+        digest = hashlib.sha1(
+            "\n".join(sorted(n.model_dump_json() for n in self._notices.values())).encode("utf-8")
+        ).hexdigest()
+        if digest != self._digest:
+            self._digest = digest
+            self.version += 1
+            self.updated_at = datetime.now(timezone.utc)
+            added = [n for nid, n in self._notices.items() if nid not in self._known_ids]
+            self._known_ids = set(self._notices)
+            for listener in self._listeners:
+                try:
+                    listener(self.version, added)
+                except Exception as e:
+                    print(f"[be4] notice listener 실패: {e}")
+
+    def add_listener(self, listener: Callable[[int, List[RegulationNotice]], None]):
+        self._listeners.append(listener)
+
     def _merge_source(self, source: Dict[str, str], xml_text: str) -> int:
         count = 0
         try:
@@ -873,19 +903,29 @@ def evaluate_rules(request: RuleEvaluationRequest, module: BE4Module = Depends(g
 
 @router.get("/notices", response_model=List[RegulationNotice])
 def list_notices(
+    request: Request,
+    response: Response,
     limit: int = 20,
     category: Optional[str] = None,
     source: Optional[str] = None,
     module: BE4Module = Depends(get_be4),
 ):
     limit = max(1, min(limit, 100))
-    return module.notice_service.list_notices(limit=limit, category=category, source=source)
+    service = module.notice_service
+    cached = not_modified(request, response, make_etag("notices", service.version), service.updated_at)
+    if cached is not None:
+        return cached
+    return service.list_notices(limit=limit, category=category, source=source)
 
 
 @router.get("/notices/highlights", response_model=List[RegulationNotice])
-def highlight_notices(limit: int = 3, module: BE4Module = Depends(get_be4)):
+def highlight_notices(request: Request, response: Response, limit: int = 3, module: BE4Module = Depends(get_be4)):
     limit = max(1, min(limit, 5))
-    return module.notice_service.highlights(limit)
+    service = module.notice_service
+    cached = not_modified(request, response, make_etag("notices", service.version), service.updated_at)
+    if cached is not None:
+        return cached
+    return service.highlights(limit)
 
 
 @router.post("/notices/refresh")
@@ -0,0 +1,54 @@
+import importlib.util
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+# backend/ 보조 모듈(timeline_codec 등)을 패키지 없이 import
+sys.path.insert(0, str(BACKEND))
+
+STAGES = ["INFO_RECEIVED", "PICKED_UP", "IN_TRANSIT", "CUSTOMS", "CLEARED", "OUT_FOR_DELIVERY", "DELIVERED"]
+
+
+def load_web(db_path: Path):
+    """17web.py를 주어진 sqlite 파일로 로드 (import 시 테이블/마이그레이션 실행)"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SEVENTEENTRACK_API_KEY", "bench")
+    spec = importlib.util.spec_from_file_location("web", BACKEND / "17web.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["web"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def fake_events(rng: random.Random, count: int, start: datetime = None) -> List[Dict[str, Any]]:
+    """정규화 이벤트 목록 (시간 오름차순)"""
+    ts = start or datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(500000))
+    out = []
+    for i in range(count):
+        ts += timedelta(minutes=rng.randrange(5, 600))
+        stage = STAGES[min(i * len(STAGES) // max(count, 1), len(STAGES) - 1)]
+        out.append({"ts": ts.isoformat(), "stage": stage, "desc": f"{stage.lower()} hub {rng.randrange(40)}"})
+    return out
+
+
+def numbers(n: int, prefix: str = "BN") -> List[str]:
+    return [f"{prefix}{i:09d}KR" for i in range(n)]
+
+
+class Timer:
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.t0
+
+
+def rate(n: int, seconds: float) -> str:
+    return f"{n / seconds:,.0f}/s ({seconds:.2f}s)"
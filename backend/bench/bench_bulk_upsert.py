@@ -0,0 +1,93 @@
+"""
+청크 업서트 벤치마크: upsert_shipment(건별) vs bulk_upsert_shipments(집합)
+  python bench/bench_bulk_upsert.py [--shipments 2000] [--events 20] [--chunk 40]
+
+- 같은 sqlite 파일에서 서로 다른 번호 집합으로 두 경로를 실행 (insert: 새 번호, update: 이벤트 추가 후 재업서트)
+- 끝나면 두 경로가 만든 shipments/details/events 내용을 번호 접두사만 바꿔 비교
+"""
+import argparse
+import random
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import select
+
+from _common import Timer, fake_events, load_web, numbers, rate
+
+SKIP_SHIPMENT_COLS = {"id", "tracking_number", "created_at", "updated_at"}
+SKIP_DETAIL_COLS = {"id", "shipment_id", "tracking_number", "created_at", "updated_at", "sync_processed_at"} # 시각(now) 제외
+
+
+def build_payloads(nums, n_events):
+    """번호 접두사를 뺀 부분으로 시드 → 두 경로가 같은 타임라인을 받음"""
+    return {n: fake_events(random.Random(n[2:]), n_events) for n in nums}
+
+
+def run_per_row(web, payloads, chunk):
+    items = list(payloads.items())
+    for i in range(0, len(items), chunk):
+        with web.get_db() as db:
+            for n, evs in items[i:i + chunk]:
+                web.upsert_shipment(db, n, None, evs, any_events=True)
+
+
+def run_bulk(web, payloads, chunk):
+    items = list(payloads.items())
+    for i in range(0, len(items), chunk):
+        with web.get_db() as db:
+            web.bulk_upsert_shipments(db, [
+                {"tracking_number": n, "normalized": evs, "any_events": True}
+                for n, evs in items[i:i + chunk]
+            ])
+
+
+def snapshot(web, prefix):
+    S, D, E = web.Shipment.__table__, web.ShipmentDetails.__table__, web.ShipmentEvent.__table__
+    strip = len(prefix)
+    with web.get_read_db() as db:
+        ships = {
+            r.tracking_number[strip:]: {k: v for k, v in r._mapping.items() if k not in SKIP_SHIPMENT_COLS}
+            for r in db.execute(select(S).where(S.c.tracking_number.like(prefix + "%")))
+        }
+        details = {
+            r.tracking_number[strip:]: {k: v for k, v in r._mapping.items() if k not in SKIP_DETAIL_COLS}
+            for r in db.execute(select(D).where(D.c.tracking_number.like(prefix + "%")))
+        }
+        events = sorted(
+            (r.tracking_number[strip:], r.ts, r.stage, r.desc, r.fingerprint)
+            for r in db.execute(select(E).where(E.c.tracking_number.like(prefix + "%")))
+        )
+    return ships, details, events
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--shipments", type=int, default=2000)
+    ap.add_argument("--events", type=int, default=20)
+    ap.add_argument("--extra", type=int, default=3, help="update 단계에서 번호마다 덧붙일 이벤트 수")
+    ap.add_argument("--chunk", type=int, default=40)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-bulk-"))
+    web = load_web(tmp / "bench.sqlite3")
+    suffixes = [n[2:] for n in numbers(args.shipments)]
+    results = {}
+    for label, prefix, fn in (("per-row", "RW", run_per_row), ("bulk", "BK", run_bulk)):
+        nums = [prefix + s for s in suffixes]
+        first = build_payloads(nums, args.events)
+        with Timer() as t_ins:
+            fn(web, first, args.chunk)
+        # 같은 시드로 더 길게 → 기존 타임라인 뒤에 이벤트가 붙은 재조회
+        second = build_payloads(nums, args.events + args.extra)
+        with Timer() as t_upd:
+            fn(web, second, args.chunk)
+        results[label] = (t_ins.elapsed, t_upd.elapsed)
+        print(f"{label:8s} insert {rate(len(nums), t_ins.elapsed)}  update {rate(len(nums), t_upd.elapsed)}")
+
+    same = snapshot(web, "RW") == snapshot(web, "BK")
+    print(f"rows/events/details identical: {same}")
+    print(f"db: {tmp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+이벤트 중복 키 벤치마크: UNIQUE (shipment_id, ts, stage, desc) vs UNIQUE (shipment_id, fingerprint)
+  python bench/bench_event_fingerprint.py [--events 60000] [--batch 100000] [--grow 800000] [--legacy 20000]
+
+1) 마이그레이션: 옛 스키마 DB(--legacy 건)를 17web.py import로 전환 → 행 수 유지, 같은 페이로드 재동기화 시 추가 0건
+2) 유니크 인덱스 크기 (--events 건, dbstat)
+3) executemany ON CONFLICT DO NOTHING 처리량: --batch 건씩 넣으며 테이블을 0 → --grow 건까지 키움
+   fingerprint 쪽은 현재 테이블 그대로 (활동 피드용 ix_shipment_events_number_ts 포함)
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Integer, MetaData, String, Table, Text, UniqueConstraint, create_engine, func,
+    insert, select, text,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from _common import STAGES, Timer, load_web, numbers
+
+legacy_meta = MetaData()
+legacy_shipments = Table(
+    "shipments", legacy_meta,
+    Column("id", Integer, primary_key=True),
+    Column("tracking_number", String(128), unique=True, nullable=False),
+)
+# 지문 도입 전 shipment_events (user-037 이전 스키마)
+legacy_events = Table(
+    "shipment_events", legacy_meta,
+    Column("id", Integer, primary_key=True),
+    Column("shipment_id", Integer, ForeignKey("shipments.id", ondelete="CASCADE"), index=True, nullable=False),
+    Column("tracking_number", String(128), index=True, nullable=False),
+    Column("ts", DateTime(timezone=True), index=True, nullable=False),
+    Column("stage", String(32), nullable=False),
+    Column("desc", Text, nullable=True),
+    Column("source", String(32), nullable=True),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    UniqueConstraint("shipment_id", "ts", "stage", "desc", name="uq_shipment_event_dedup"),
+)
+
+WORDS = ("import customs clearance completed arrived at sorting center departed from facility "
+         "shipment information received handed over to airline inspection scheduled released").split()
+
+
+def timeline(rng: random.Random, count: int):
+    """17TRACK 원문 길이(수십~수백 자)에 가까운 desc를 가진 정규화 이벤트"""
+    ts = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(500000))
+    out = []
+    for i in range(count):
+        ts += timedelta(minutes=rng.randrange(5, 600))
+        stage = STAGES[min(i * len(STAGES) // count, len(STAGES) - 1)]
+        desc = f"[{rng.choice(['Incheon', 'Shenzhen', 'Yantai', 'Seoul'])}] " + " ".join(
+            rng.choice(WORDS) for _ in range(rng.randrange(8, 40)))
+        out.append({"ts": ts.isoformat(), "stage": stage, "desc": desc})
+    return out
+
+
+def event_rows(web, count, per_shipment=20, start_shipment=1, seed=37):
+    rng = random.Random(seed)
+    rows = []
+    sid = start_shipment
+    while len(rows) < count:
+        rows.extend(web._event_rows(sid, f"FP{sid:09d}KR", timeline(rng, per_shipment)))
+        sid += 1
+    return rows[:count]
+
+
+def make_tables(tmp: Path, web, schema: str, label: str):
+    """schema(legacy / fingerprint)로 새 파일 → (엔진, 이벤트 테이블, 유니크 인덱스 이름, 충돌 키)"""
+    engine = create_engine(f"sqlite:///{tmp / f'{label}-{schema}.sqlite3'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+    if schema == "legacy":
+        legacy_meta.create_all(engine)
+        return engine, legacy_events, "sqlite_autoindex_shipment_events_1", ["shipment_id", "ts", "stage", "desc"]
+    web.Shipment.__table__.create(engine)
+    web.ShipmentEvent.__table__.create(engine)
+    return engine, web.ShipmentEvent.__table__, "sqlite_autoindex_shipment_events_1", ["shipment_id", "fingerprint"]
+
+
+def index_size(web, tmp, rows):
+    print(f"[2] unique index size, {len(rows):,} events")
+    for name in ("legacy", "fingerprint"):
+        engine, tbl, idx, _ = make_tables(tmp, web, name, "size")
+        cols = [c.name for c in tbl.columns if c.name in rows[0]]
+        with engine.begin() as conn:
+            conn.execute(insert(tbl), [{c: r[c] for c in cols} for r in rows])
+            size = conn.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name = :n"), {"n": idx}).scalar()
+        print(f"    {name:11s} {size / 1e6:.1f}MB")
+        engine.dispose()
+
+
+def insert_throughput(web, tmp, batch, grow):
+    print(f"[3] executemany ON CONFLICT DO NOTHING, {batch:,}-row batches, table 0 -> {grow:,}")
+    rows = event_rows(web, grow)
+    for name in ("legacy", "fingerprint"):
+        engine, tbl, _, conflict = make_tables(tmp, web, name, "grow")
+        cols = [c.name for c in tbl.columns if c.name in rows[0]]
+        stmt = sqlite_insert(tbl).on_conflict_do_nothing(index_elements=conflict)
+        rates = []
+        for i in range(0, grow, batch):
+            part = [{c: r[c] for c in cols} for r in rows[i:i + batch]]
+            with engine.begin() as conn, Timer() as t:
+                conn.execute(stmt, part)
+            rates.append(len(part) / t.elapsed)
+        print(f"    {name:11s} " + " ".join(f"{r / 1000:.0f}k" for r in rates) + " rows/s")
+        engine.dispose()
+
+
+def build_legacy_db(path: Path, count: int):
+    """옛 스키마 DB: 번호당 20건, (번호, 타임라인) 반환"""
+    engine = create_engine(f"sqlite:///{path}")
+    legacy_meta.create_all(engine)
+    rng = random.Random(370)
+    payloads = {}
+    with engine.begin() as conn:
+        for sid, num in enumerate(numbers(count // 20, "LG"), start=1):
+            conn.execute(insert(legacy_shipments).values(id=sid, tracking_number=num))
+            evs = timeline(rng, 20)
+            payloads[num] = evs
+            conn.execute(insert(legacy_events), [
+                {"shipment_id": sid, "tracking_number": num, "ts": datetime.fromisoformat(e["ts"]),
+                 "stage": e["stage"], "desc": e["desc"], "source": "normalized"}
+                for e in evs
+            ])
+        before = conn.execute(select(func.count()).select_from(legacy_events)).scalar()
+    engine.dispose()
+    return payloads, before
+
+
+def migration(tmp, count):
+    path = tmp / "legacy-migrate.sqlite3"
+    payloads, before = build_legacy_db(path, count)
+    print(f"[1] legacy DB migration, {before:,} events")
+    t0 = time.perf_counter()
+    web = load_web(path) # import 시 _migrate_add_missing_columns + _migrate_event_fingerprint
+    print(f"    import + migrate {time.perf_counter() - t0:.2f}s")
+    E = web.ShipmentEvent.__table__
+    with web.get_read_db() as db:
+        after = db.execute(select(func.count()).select_from(E)).scalar()
+        missing_fp = db.execute(select(func.count()).select_from(E).where(E.c.fingerprint.is_(None))).scalar()
+        uniques = {u["name"] for u in web.inspect(db.get_bind()).get_unique_constraints(E.name)}
+    print(f"    rows {before:,} -> {after:,}, null fingerprints {missing_fp}, unique constraints {sorted(uniques)}")
+    items = list(payloads.items())
+    written = 0
+    for i in range(0, len(items), 40):
+        with web.get_db() as db:
+            written += web.bulk_upsert_shipments(db, [
+                {"tracking_number": n, "normalized": evs, "any_events": True} for n, evs in items[i:i + 40]
+            ])["events"]
+    print(f"    re-sync of the same payloads added {written} events")
+    return web
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=60000)
+    ap.add_argument("--batch", type=int, default=100000)
+    ap.add_argument("--grow", type=int, default=800000)
+    ap.add_argument("--legacy", type=int, default=20000)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-fp-"))
+    web = migration(tmp, args.legacy) # 17web.py를 옛 DB로 로드 (2~3은 지문/테이블 정의만 사용)
+    index_size(web, tmp, event_rows(web, args.events))
+    insert_throughput(web, tmp, args.batch, args.grow)
+    print(f"db: {tmp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+동시 읽기/쓰기 벤치마크: 저장 프로파일별 쓰기 처리량과 읽기 지연
+  python bench/bench_wal_concurrency.py [--seconds 10] [--readers 4] [--seed 2000]
+
+프로파일
+  baseline : rollback journal(DELETE) + synchronous=FULL, 읽기도 쓰기 엔진 공유 (WAL 도입 전 설정)
+  wal      : 17web.py 기본 (WAL + NORMAL + pragma 훅, 읽기는 mode=ro 엔진, WalCheckpointer 주기 실행)
+
+쓰기 스레드 1개가 bulk_upsert_shipments 청크를 계속 커밋하는 동안
+읽기 프로세스 N개(워커 여러 개 배포와 같음, GIL 경합 없음)가 목록 첫 페이지(keyset) + 임의 번호의 이벤트를 조회한다.
+"""
+import argparse
+import functools
+import multiprocessing as mp
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+
+from _common import Timer, fake_events, load_web, numbers
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def seed(web, session_factory, nums, n_events, chunk):
+    for i in range(0, len(nums), chunk):
+        db = session_factory()
+        try:
+            web.bulk_upsert_shipments(db, [
+                {"tracking_number": n, "normalized": fake_events(random.Random(n), n_events), "any_events": True}
+                for n in nums[i:i + chunk]
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+
+def reader(web, url, readonly, nums, page, seed_, go, stop, out):
+    """읽기 프로세스: 자기 엔진으로 조회 반복, 끝나면 (지연 목록, 오류 수)"""
+    S, E = web.Shipment.__table__, web.ShipmentEvent.__table__
+    connect_args = {"check_same_thread": False, "timeout": web.SQLITE_BUSY_TIMEOUT_MS / 1000}
+    if readonly:
+        engine = create_engine(web._readonly_sqlite_url(url), connect_args=connect_args)
+        event.listen(engine, "connect", functools.partial(web._apply_sqlite_pragmas, readonly=True))
+    else:
+        engine = create_engine(url, connect_args=connect_args)
+    rng = random.Random(seed_)
+    lat, errors = [], 0
+    go.wait()
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(select(S.c.id, S.c.tracking_number, S.c.last_status, S.c.updated_at)
+                             .order_by(S.c.updated_at.desc(), S.c.id.desc()).limit(page)).all()
+                conn.execute(select(E.c.ts, E.c.stage, E.c.desc)
+                             .where(E.c.tracking_number == rng.choice(nums)).order_by(E.c.ts)).all()
+            lat.append(time.perf_counter() - t0)
+        except Exception:
+            errors += 1
+    out.put((lat, errors))
+
+
+def run_profile(web, label, write_factory, url, readonly, nums, args, checkpoint=None):
+    ctx = mp.get_context("fork")
+    go, stop = ctx.Event(), ctx.Event()
+    out = ctx.Queue()
+    lat, errors = [], {"read": 0, "write": 0}
+    writes = {"chunks": 0, "shipments": 0}
+    wal_max = {"bytes": 0}
+
+    def writer():
+        rng = random.Random(31)
+        round_ = 0
+        while not stop.is_set():
+            round_ += 1
+            picked = rng.sample(nums, args.chunk)
+            db = write_factory()
+            try:
+                web.bulk_upsert_shipments(db, [
+                    # 같은 시드 타임라인을 round만큼 늘려서 매번 실제 변경이 생기게
+                    {"tracking_number": n, "normalized": fake_events(random.Random(n), args.events + round_), "any_events": True}
+                    for n in picked
+                ])
+                db.commit()
+                writes["chunks"] += 1
+                writes["shipments"] += len(picked)
+            except Exception:
+                db.rollback()
+                errors["write"] += 1
+            finally:
+                db.close()
+
+    def checkpointer():
+        while not stop.wait(args.checkpoint_interval):
+            try:
+                r = checkpoint()
+                wal_max["bytes"] = max(wal_max["bytes"], r["wal_bytes_before"])
+            except Exception:
+                pass
+
+    readers = [
+        ctx.Process(target=reader, args=(web, url, readonly, nums, args.page, i, go, stop, out))
+        for i in range(args.readers)
+    ]
+    for p in readers:
+        p.start()
+    threads = [threading.Thread(target=writer)]
+    if checkpoint is not None:
+        threads.append(threading.Thread(target=checkpointer))
+    with Timer() as t:
+        go.set()
+        for th in threads:
+            th.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for th in threads:
+            th.join()
+        for _ in readers:
+            part, errs = out.get()
+            lat.extend(part)
+            errors["read"] += errs
+    for p in readers:
+        p.join()
+
+    ms = lambda s: f"{s * 1000:.1f}ms"
+    print(
+        f"{label:8s} writes {writes['shipments'] / t.elapsed:,.0f} shipments/s ({writes['chunks']} commits)  "
+        f"reads {len(lat) / t.elapsed:,.0f}/s p50 {ms(percentile(lat, 0.5))} p99 {ms(percentile(lat, 0.99))} "
+        f"max {ms(max(lat) if lat else float('nan'))}  errors r={errors['read']} w={errors['write']}"
+        + (f"  wal max {wal_max['bytes'] / 1e6:.1f}MB" if checkpoint is not None else "")
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=2000, help="미리 넣을 운송장 수")
+    ap.add_argument("--events", type=int, default=20)
+    ap.add_argument("--chunk", type=int, default=40)
+    ap.add_argument("--page", type=int, default=50)
+    ap.add_argument("--checkpoint-interval", type=float, default=1.0)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-wal-"))
+    web = load_web(tmp / "wal.sqlite3")
+    nums = numbers(args.seed)
+
+    # baseline: 같은 스키마, 별도 파일, pragma 훅 없음
+    base_url = f"sqlite:///{tmp / 'baseline.sqlite3'}"
+    base_engine = create_engine(
+        base_url,
+        connect_args={"check_same_thread": False, "timeout": web.SQLITE_BUSY_TIMEOUT_MS / 1000},
+    )
+    with base_engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+    web.Base.metadata.create_all(base_engine)
+    base_sessions = sessionmaker(bind=base_engine, autoflush=False)
+    seed(web, base_sessions, nums, args.events, args.chunk)
+    base_engine.dispose()
+    run_profile(web, "baseline", base_sessions, base_url, False, nums, args)
+
+    seed(web, web.SessionLocal, nums, args.events, args.chunk)
+    web.wal_checkpointer.checkpoint()
+    web.engine.dispose() # fork 전에 풀 비우기 (자식은 자기 엔진 사용)
+    run_profile(web, "wal", web.SessionLocal, web.DATABASE_URL, True, nums, args,
+                checkpoint=web.wal_checkpointer.checkpoint)
+    print(f"db: {tmp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+# 서버 푸시(SSE) 분배기
+# - 원천은 변경 로그(shipment_changes): SSE id = 변경 커서라서 재연결(Last-Event-ID)이 /admin/changes 커서와 이어진다
+# - 펌프 태스크 하나가 커밋 알림(wake)마다 커서 이후 변경을 한 번 읽어 나눠 준다 → 조회 비용은 연결 수와 무관
+# - 구독자 색인: 전체 구독 + 운송장 번호 → 구독자 (행마다 해당 구독자만 방문, 유휴 연결은 큐 대기만 함)
+# - 구독자별 큐 상한을 넘으면 그 연결의 밀린 메시지를 버리고 resync 1건으로 대체 (느린 연결이 펌프를 막지 않음)
+Message = Tuple[str, Optional[int], Dict[str, Any]] # (event, id, data)
+
+
+def format_sse(event: str, data: Dict[str, Any], id_: Optional[int] = None) -> str:
+    head = f"id: {id_}\n" if id_ is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("numbers", "kinds", "queue", "last_id", "dropped")
+
+    def __init__(self, numbers: Optional[Set[str]], kinds: Set[str], maxsize: int):
+        self.numbers = numbers # None = 전체
+        self.kinds = kinds
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(maxsize)
+        self.last_id: Optional[int] = None
+        self.dropped = 0
+
+    def wants(self, change: Dict[str, Any]) -> bool:
+        return change["kind"] in self.kinds and (self.numbers is None or change["tracking_number"] in self.numbers)
+
+    def offer(self, msg: Message) -> bool:
+        """큐에 넣는다. 넘치면 밀린 메시지를 비우고 resync 하나로 바꾼 뒤 False"""
+        if msg[1] is not None:
+            self.last_id = msg[1]
+        try:
+            self.queue.put_nowait(msg)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("resync", self.last_id, {"cursor": self.last_id}))
+            return False
+
+
+class ChangeBroadcaster:
+    """
+    read_changes(since, limit) -> 커서 오름차순 변경 dict 목록 ({"cursor", "kind", "tracking_number", ...})
+    read_head() -> 현재 마지막 커서
+    둘 다 동기 함수 (스레드 풀에서 실행)
+    """
+
+    def __init__(
+        self,
+        read_changes: Callable[[int, int], List[Dict[str, Any]]],
+        read_head: Callable[[], int],
+        queue_size: int = 256,
+        poll_interval: float = 5.0,
+        batch: int = 1000,
+    ):
+        self._read_changes = read_changes
+        self._read_head = read_head
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval # 다른 프로세스/엔진 직접 쓰기 대비 (구독자가 있을 때만)
+        self.batch = batch
+        self._subs: Set[Subscriber] = set()
+        self._all: Set[Subscriber] = set()
+        self._by_number: Dict[str, Set[Subscriber]] = {}
+        self.cursor: Optional[int] = None # 구독자가 없으면 None (다음 구독 때 head부터)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"pumps": 0, "delivered": 0, "resyncs": 0}
+
+    async def start(self):
+        if self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def shutdown(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    def wake(self):
+        """변경 로그를 쓴 커밋 직후 호출 (아무 스레드에서나)"""
+        loop, ev = self._loop, self._wakeup
+        if loop is not None and ev is not None and self._subs:
+            loop.call_soon_threadsafe(ev.set)
+
+    # ---------- 구독 (이벤트 루프에서 호출) ----------
+    async def subscribe(self, numbers: Optional[Set[str]], kinds: Set[str]) -> Tuple[Subscriber, int]:
+        """등록 후 (구독자, 시작 커서). 시작 커서 이후 변경은 모두 이 구독자 큐로 들어온다"""
+        if self.cursor is None:
+            head = await asyncio.get_running_loop().run_in_executor(None, self._read_head)
+            if self.cursor is None:
+                self.cursor = head
+        sub = Subscriber(numbers, kinds, self.queue_size)
+        self._subs.add(sub)
+        if numbers is None:
+            self._all.add(sub)
+        else:
+            for n in numbers:
+                self._by_number.setdefault(n, set()).add(sub)
+        return sub, self.cursor
+
+    def unsubscribe(self, sub: Subscriber):
+        self._subs.discard(sub)
+        self._all.discard(sub)
+        for n in sub.numbers or ():
+            group = self._by_number.get(n)
+            if group is not None:
+                group.discard(sub)
+                if not group:
+                    del self._by_number[n]
+        if not self._subs:
+            self.cursor = None
+
+    def publish(self, event: str, data: Dict[str, Any], kind: str):
+        """변경 로그 밖의 알림 (예: 규제 공지) — kind를 구독한 모든 연결에"""
+        for sub in self._subs:
+            if kind in sub.kinds:
+                self._offer(sub, (event, None, data))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "subscribers": len(self._subs),
+            "subscribed_numbers": len(self._by_number),
+            "cursor": self.cursor,
+            "queued": sum(s.queue.qsize() for s in self._subs),
+        }
+
+    # ---------- 펌프 ----------
+    def _offer(self, sub: Subscriber, msg: Message):
+        if sub.offer(msg):
+            self.stats["delivered"] += 1
+        else:
+            self.stats["resyncs"] += 1
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._subs or self.cursor is None:
+                continue
+            try:
+                await self._pump()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[stream] 변경 로그 읽기 실패: {e}")
+                await asyncio.sleep(1.0)
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        while self._subs and self.cursor is not None:
+            since = self.cursor
+            rows = await loop.run_in_executor(None, self._read_changes, since, self.batch)
+            if self.cursor != since: # 읽는 동안 구독이 모두 끊겼다가 다시 시작됨 (새 구독의 head부터)
+                return
+            self.stats["pumps"] += 1
+            for r in rows:
+                msg: Message = ("change", r["cursor"], r)
+                for sub in self._all:
+                    if r["kind"] in sub.kinds:
+                        self._offer(sub, msg)
+                for sub in self._by_number.get(r["tracking_number"], ()):
+                    if r["kind"] in sub.kinds:
+                        self._offer(sub, msg)
+            if rows:
+                self.cursor = rows[-1]["cursor"]
+            if len(rows) < self.batch:
+                return
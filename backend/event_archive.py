@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import bisect
+import gzip
+import json
+import os
+import uuid
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+# 보관(아카이브) 파일 포맷: 열 단위(column-major) JSON + gzip
+#   {"version": 1, "columns": [...], "data": {col: [값, ...]}}
+# - 행은 (shipment_id, ts) 순으로 정렬되어 있어 운송장 단위 조회는 이분 탐색
+# - 파일은 쓰고 나면 바꾸지 않음 (조회 캐시는 경로 기준)
+# - 열 추가는 버전을 올리지 않음: 예전 part에 없는 열은 None으로 읽힘 (last_ts, repeat)
+ARCHIVE_VERSION = 1
+ARCHIVE_COLUMNS = ("shipment_id", "tracking_number", "ts", "stage", "desc", "source", "last_ts", "repeat")
+DEFAULT_ARCHIVE_DIR = Path(__file__).with_name("event_archive")
+
+
+def partition_dir(root: Path, cleared_on: date) -> Path:
+    """통관완료 일자 기준 파티션: <root>/cleared_date=YYYY-MM-DD/"""
+    return Path(root) / f"cleared_date={cleared_on.isoformat()}"
+
+
+def write_part(root: Path, cleared_on: date, rows: List[Dict[str, Any]]) -> str:
+    """
+    rows(ts는 ISO 문자열)를 파티션에 새 part 파일로 기록하고 root 기준 상대 경로를 반환.
+    임시 파일에 쓴 뒤 os.replace 로 교체하므로 중간 실패 시 반쪽 파일이 남지 않는다.
+    """
+    rows = sorted(rows, key=lambda r: (r["shipment_id"], r["ts"]))
+    payload = {
+        "version": ARCHIVE_VERSION,
+        "columns": list(ARCHIVE_COLUMNS),
+        "data": {c: [r.get(c) for r in rows] for c in ARCHIVE_COLUMNS},
+    }
+    part_dir = partition_dir(root, cleared_on)
+    part_dir.mkdir(parents=True, exist_ok=True)
+    final = part_dir / f"events-{uuid.uuid4().hex[:12]}.json.gz"
+    tmp = final.with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, final)
+    return final.relative_to(root).as_posix()
+
+
+@lru_cache(maxsize=16)
+def _load_part(path: str) -> Dict[str, list]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("version") != ARCHIVE_VERSION:
+        raise ValueError(f"unsupported event archive version in {path}")
+    return payload["data"]
+
+
+def read_events(root: Path, rel_path: str, shipment_id: int) -> List[Dict[str, Any]]:
+    """part 파일에서 한 운송장의 이벤트만 (ts 오름차순) 꺼낸다"""
+    data = _load_part(str(Path(root) / rel_path))
+    ids = data["shipment_id"]
+    lo = bisect.bisect_left(ids, shipment_id)
+    hi = bisect.bisect_right(ids, shipment_id, lo)
+    cols = {c: data.get(c) for c in ARCHIVE_COLUMNS}
+    return [{c: (v[i] if v is not None else None) for c, v in cols.items()} for i in range(lo, hi)]
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+# 폴링 대상 조회 API의 조건부 GET (ETag / Last-Modified)
+# - 태그는 본문 해시가 아니라 쓰기 경로가 올리는 버전 카운터로 만든다 → 304 판정에 조회/직렬화가 필요 없음
+# - 카운터는 프로세스 메모리 값이라 재시작하면 같은 숫자가 다시 나오므로 기동 ID를 태그에 넣는다
+# - Cache-Control: no-cache → 브라우저 fetch가 매번 If-None-Match로 재검증하고, 304면 캐시 본문을 그대로 쓴다
+BOOT_ID = uuid.uuid4().hex[:8]
+BOOT_AT = datetime.now(timezone.utc)
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + "-".join([BOOT_ID, *map(str, parts)]) + '"'
+
+
+def _opaque(tag: str) -> str:
+    # 약한 비교 (W/ 접두 무시)
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def not_modified(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+) -> Optional[Response]:
+    """
+    검증 헤더를 response에 싣고, 클라이언트 사본이 최신이면 304 Response를 반환 (아니면 None).
+    If-None-Match가 있으면 그것만 보고, 없을 때만 If-Modified-Since를 비교한다.
+    버전은 조회 전에 읽어야 한다 (조회 중 커밋된 변경은 다음 요청에서 태그 불일치로 드러남).
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    response.headers.update(headers)
+
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = {_opaque(t) for t in inm.split(",") if t.strip()}
+        if "*" in tags or _opaque(etag) in tags:
+            return Response(status_code=304, headers=headers)
+        return None
+
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since:
+            return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+DATA_DIR = Path(__file__).with_name("track_data")
+COUNTRY_NAMES_PATH = DATA_DIR / "country_names.json"
+CARRIER_ORIGIN_PATH = DATA_DIR / "carrier_origin.json"
+# 17TRACK 공식 국가표(https://res.17track.net/asset/carrier/info/country.all.json)를 받아 두면 v1 정수코드 전체를 해석
+# (저장소에는 없음 — 없으면 아래 V1_COUNTRY_INT_TO_ISO2 만 사용)
+V1_COUNTRY_TABLE_PATH = DATA_DIR / "country.all.json"
+
+# v1 track.b(정수 국가코드) → ISO2: 확인된 빈출 코드만 내장
+V1_COUNTRY_INT_TO_ISO2 = {
+    301: "CN",   # China
+    2105: "FR",  # 프랑스 (문서 예시에 등장)
+}
+
+# UPU S10 번호(서비스 2자 + 일련번호 8자리 + 검증 1자리 + 국가 2자, 예: RB123456789CN)의 국가 접미
+# 다른 형식의 운송사 번호가 우연히 숫자+2자로 끝나도 국가로 보지 않도록 전체 모양을 고정
+_UPU_SUFFIX_RE = re.compile(r"^[A-Z]{2}\d{9}([A-Z]{2})$")
+_NAME_SPLIT_RE = re.compile(r"[^0-9a-z]+")
+
+
+def _load_json(path: Path, default):
+    if not path.exists():
+        return default
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return default
+
+
+def _norm_name(s: str) -> str:
+    return " ".join(t for t in _NAME_SPLIT_RE.split((s or "").lower()) if t)
+
+
+class OriginIndex:
+    """
+    적출국 추정용 조회 인덱스 (프로세스당 1회 로드).
+      - country_names.json: ISO2 → 영문/한글 국가명
+      - v1 정수코드: V1_COUNTRY_INT_TO_ISO2 + (있으면) 17TRACK 공식표 행({"key", "_name"})을 영문명으로 ISO2에 연결
+      - carrier_origin.json: 운송사 → 적출국(ISO2) 표 (provider key / 이름 별칭)
+    모든 조회는 dict 1회(이름은 토큰 수만큼) 로 끝난다.
+    """
+
+    def __init__(self, countries: list, carriers: list, v1_countries: Optional[list] = None):
+        self.ko_by_iso2: Dict[str, str] = {}
+        self.iso2_by_int: Dict[int, str] = dict(V1_COUNTRY_INT_TO_ISO2)
+        self.iso2_by_provider_key: Dict[int, str] = {}
+        self.iso2_by_alias: Dict[str, str] = {}
+
+        iso2_by_en: Dict[str, str] = {}
+        for row in countries or []:
+            iso2 = (row.get("iso2") or "").strip().upper()
+            if not iso2:
+                continue
+            if row.get("name_ko"):
+                self.ko_by_iso2[iso2] = row["name_ko"]
+            if row.get("name_en"):
+                iso2_by_en[_norm_name(row["name_en"])] = iso2
+        for row in v1_countries or []:
+            iso2 = iso2_by_en.get(_norm_name(row.get("_name") or ""))
+            if iso2 and isinstance(row.get("key"), int):
+                self.iso2_by_int.setdefault(row["key"], iso2)
+
+        for row in carriers or []:
+            iso2 = (row.get("origin") or "").strip().upper()
+            if not iso2:
+                continue
+            for k in row.get("keys") or []:
+                if isinstance(k, int):
+                    self.iso2_by_provider_key[k] = iso2
+            for alias in row.get("aliases") or []:
+                a = _norm_name(alias)
+                if a:
+                    self.iso2_by_alias[a] = iso2
+
+    @classmethod
+    def load(
+        cls,
+        country_path: Path = COUNTRY_NAMES_PATH,
+        carrier_path: Path = CARRIER_ORIGIN_PATH,
+        v1_country_path: Path = V1_COUNTRY_TABLE_PATH,
+    ) -> "OriginIndex":
+        return cls(_load_json(country_path, []), _load_json(carrier_path, []), _load_json(v1_country_path, []))
+
+    # ----- 단건 조회 -----
+    def ko_from_iso2(self, code: Optional[str]) -> Optional[str]:
+        if not code or not isinstance(code, str):
+            return None
+        return self.ko_by_iso2.get(code.strip().upper())
+
+    def ko_from_int(self, code: Any) -> Optional[str]:
+        if not isinstance(code, int):
+            return None
+        return self.ko_from_iso2(self.iso2_by_int.get(code))
+
+    def ko_from_tracking_number(self, number: Optional[str]) -> Optional[str]:
+        if not isinstance(number, str):
+            return None
+        m = _UPU_SUFFIX_RE.search(number.strip().upper())
+        return self.ko_from_iso2(m.group(1)) if m else None
+
+    def iso2_from_provider_name(self, name: Optional[str]) -> Optional[str]:
+        n = _norm_name(name or "")
+        if not n:
+            return None
+        if n in self.iso2_by_alias:
+            return self.iso2_by_alias[n]
+        tokens = n.split(" ")
+        # 2어절 별칭(royal mail 등) → 1어절 별칭 순
+        for a, b in zip(tokens, tokens[1:]):
+            iso2 = self.iso2_by_alias.get(f"{a} {b}")
+            if iso2:
+                return iso2
+        for t in tokens:
+            iso2 = self.iso2_by_alias.get(t)
+            if iso2:
+                return iso2
+        return None
+
+    def ko_from_provider(self, provider_info: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        providers[].provider 객체 → (한글 국가명, 출처)
+        우선순위: provider.country > provider.key > provider.name
+        """
+        p = provider_info or {}
+        mapped = self.ko_from_iso2(p.get("country"))
+        if mapped:
+            return mapped, "provider.country"
+        key = p.get("key")
+        if isinstance(key, int) and key in self.iso2_by_provider_key:
+            return self.ko_from_iso2(self.iso2_by_provider_key[key]), "provider.key"
+        mapped = self.ko_from_iso2(self.iso2_from_provider_name(p.get("name")))
+        if mapped:
+            return mapped, "provider.name"
+        return None, None
+
+
+ORIGIN_INDEX = OriginIndex.load()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Dict, Optional
+
+
+# 소요시간 분위수 스케치 (로그 구간 히스토그램, DDSketch 방식)
+# - 값 x(초) >= 1 은 구간 i = ceil(log_gamma(x)) 에 1을 더하고, 1 미만은 구간 0
+# - 구간 대표값 2·gamma^i / (gamma + 1) 은 구간 안 모든 값에 대해 상대오차 <= RELATIVE_ACCURACY
+# - 더하기/빼기/합치기가 모두 구간별 카운트 합이라 일별 롤업을 기간 단위로 그대로 합칠 수 있다
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+Sketch = Dict[int, int]
+
+
+def bucket_of(value: float) -> int:
+    if value < 1:
+        return 0
+    return max(1, math.ceil(math.log(value) / _LOG_GAMMA))
+
+
+def add(sk: Sketch, value: float, n: int = 1):
+    """n < 0 이면 제거. 카운트가 0이 된 구간은 지운다"""
+    i = bucket_of(value)
+    c = sk.get(i, 0) + n
+    if c:
+        sk[i] = c
+    else:
+        sk.pop(i, None)
+
+
+def merge(into: Sketch, other: Sketch):
+    for i, c in other.items():
+        into[i] = into.get(i, 0) + c
+
+
+def quantile(sk: Sketch, q: float) -> Optional[float]:
+    total = sum(sk.values())
+    if total <= 0:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for i in sorted(sk):
+        seen += sk[i]
+        if seen > rank:
+            return 0.0 if i == 0 else 2 * GAMMA ** i / (GAMMA + 1)
+    return None
+
+
+def dumps(sk: Sketch) -> str:
+    return json.dumps({str(i): c for i, c in sorted(sk.items())}, separators=(",", ":"))
+
+
+def loads(s: Optional[str]) -> Sketch:
+    return {int(i): int(c) for i, c in json.loads(s).items()} if s else {}
@@ -0,0 +1,26 @@
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+# backend/ 모듈(17web.py 옆의 보조 모듈들)을 패키지 없이 import
+sys.path.insert(0, str(BACKEND))
+
+
+@pytest.fixture(scope="session")
+def web(tmp_path_factory):
+    """17web.py 모듈 (임시 sqlite DB로 1회 로드)"""
+    if "web" in sys.modules:
+        return sys.modules["web"]
+    db_path = tmp_path_factory.mktemp("db") / "test.sqlite3"
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SEVENTEENTRACK_API_KEY", "test")
+    spec = importlib.util.spec_from_file_location("web", BACKEND / "17web.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["web"] = module
+    spec.loader.exec_module(module)
+    return module
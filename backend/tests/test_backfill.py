@@ -0,0 +1,93 @@
+import asyncio
+import functools
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+
+def _legacy_rows(web, prefix, n):
+    """요약/이벤트/상세 도입 전 모양의 레코드: 레거시 JSON 타임라인만 있음"""
+    S = web.Shipment.__table__
+    timeline = [
+        {"ts": "2025-05-01T01:00:00+00:00", "stage": "IN_PROGRESS", "desc": "import customs started"},
+        {"ts": "2025-05-01T05:00:00+00:00", "stage": "CLEARED", "desc": "import customs cleared"},
+    ]
+    numbers = [f"{prefix}{i:06d}KR" for i in range(n)]
+    with web.get_db() as db:
+        db.execute(S.insert(), [
+            {"tracking_number": num, "normalized": json.dumps(timeline), "normalized_count": len(timeline),
+             "last_status": "CLEARED"}
+            for num in numbers
+        ])
+    return numbers
+
+
+def test_backfills_run_one_batch_per_writer_job(web, monkeypatch):
+    numbers = _legacy_rows(web, "BFL", 7)
+    for name in ("_backfill_summary_columns", "_backfill_events_and_details", "_backfill_normalized_encoding"):
+        monkeypatch.setattr(web, name, functools.partial(getattr(web, name), batch=3))
+    submitted = []
+    real = web.run_in_db
+
+    async def counting(fn, *args, **kwargs):
+        submitted.append(getattr(fn, "func", fn).__name__)
+        return await real(fn, *args, **kwargs)
+
+    monkeypatch.setattr(web, "run_in_db", counting)
+    asyncio.run(web._run_backfills())
+
+    # 대상 7건 / 배치 3 → 백필마다 3번 제출 (3 + 3 + 1)
+    for name in ("_backfill_summary_columns", "_backfill_events_and_details", "_backfill_normalized_encoding"):
+        assert submitted.count(name) >= 3
+
+    S, E, D = web.Shipment.__table__, web.ShipmentEvent.__table__, web.ShipmentDetails.__table__
+    with web.get_read_db() as db:
+        rows = db.execute(select(S).where(S.c.tracking_number.in_(numbers))).all()
+        events = db.execute(select(func.count()).select_from(E).where(E.c.tracking_number.in_(numbers))).scalar()
+        details = db.execute(select(func.count()).select_from(D).where(D.c.tracking_number.in_(numbers))).scalar()
+    assert all(r.cleared_at is not None and r.normalized is None and r.normalized_bin for r in rows)
+    assert (events, details) == (14, 7)
+
+
+def test_backfill_failure_is_logged(web, monkeypatch, capsys):
+    def broken(db, last_id):
+        raise RuntimeError("backfill exploded")
+
+    monkeypatch.setattr(web, "_backfill_summary_columns", broken)
+
+    async def run():
+        task = asyncio.create_task(web._run_backfills(), name="backfill")
+        task.add_done_callback(web._log_task_failure)
+        await asyncio.wait([task])
+        await asyncio.sleep(0) # done-callback 실행
+
+    asyncio.run(run())
+    assert "[backfill] 실패: RuntimeError: backfill exploded" in capsys.readouterr().out
+
+
+def test_encoding_backfill_keeps_rows_it_cannot_convert(web, capsys):
+    S = web.Shipment.__table__
+    good = [{"ts": "2025-06-01T01:00:00+00:00", "stage": "IN_PROGRESS", "desc": "ok"}]
+    legacy = {
+        "ENC000001KR": json.dumps(good),
+        "ENC000002KR": json.dumps([{"ts": "not-a-date", "stage": "IN_PROGRESS", "desc": "bad ts"}]),
+        "ENC000003KR": "{broken json",
+    }
+    with web.get_db() as db:
+        db.execute(S.insert(), [{"tracking_number": n, "normalized": t, "normalized_count": 1} for n, t in legacy.items()])
+        web._backfill_normalized_encoding(db, 0)
+
+    with web.get_read_db() as db:
+        rows = {r.tracking_number: r for r in db.execute(select(S).where(S.c.tracking_number.in_(list(legacy))))}
+    assert rows["ENC000001KR"].normalized is None
+    assert web._parse_normalized_json(rows["ENC000001KR"].normalized_bin)[0]["desc"] == "ok"
+    for n in ("ENC000002KR", "ENC000003KR"):
+        assert rows[n].normalized == legacy[n] and rows[n].normalized_bin is None
+    out = capsys.readouterr().out
+    assert out.count("normalized 변환 건너뜀") == 2
+
+
+def test_serialize_normalized_does_not_hide_failures(web):
+    with pytest.raises(ValueError):
+        web._serialize_normalized([{"ts": None, "stage": "IN_PROGRESS", "desc": "x"}])
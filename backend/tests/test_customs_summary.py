@@ -0,0 +1,119 @@
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def _baseline_summarize(events):
+    # 증분 상태 도입 전 summarize_customs (비교 기준)
+    _has = lambda e, kw: kw in (e.get("desc") or "").lower()
+    imp_in = next((e["ts"] for e in events if e["stage"] == "IN_PROGRESS" and _has(e, "import")), None)
+    any_in = next((e["ts"] for e in events if e["stage"] == "IN_PROGRESS"), None)
+    first_in = imp_in or any_in
+    imp_cl = next((e["ts"] for e in events if e["stage"] == "CLEARED" and _has(e, "import")), None)
+    any_cl = next((e["ts"] for e in events if e["stage"] == "CLEARED"), None)
+    cleared = imp_cl or any_cl
+    delays = []
+    for e in events:
+        if e["stage"] == "DELAY" and _has(e, "import"):
+            if not (cleared and cleared > e["ts"]):
+                delays.append(dict(at=e["ts"].isoformat(), hint=(e["desc"] or "")[:140]))
+    if cleared and not first_in and events:
+        idx = next((i for i, e in enumerate(events) if e["ts"] == cleared), None)
+        if idx:
+            first_in = events[idx - 1]["ts"]
+    duration_sec = int((cleared - first_in).total_seconds()) if (first_in and cleared) else None
+    return {
+        "status": "CLEARED" if cleared else ("IN_PROGRESS" if first_in else "UNKNOWN"),
+        "in_progress_at": first_in.isoformat() if first_in else None,
+        "cleared_at": cleared.isoformat() if cleared else None,
+        "has_delay": bool(delays),
+        "delays": delays,
+        "duration_sec": duration_sec,
+    }
+
+
+_DESCS = ["Import customs clearance", "Arrived at import facility", "Held: import inspection",
+          "Export scan", "Departed", "Customs clearance", ""]
+_T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _timeline(rng, web):
+    n = rng.randint(0, 12)
+    events = []
+    for _ in range(n):
+        ev = {
+            "ts": _T0 + timedelta(hours=rng.randint(0, 8)),
+            "stage": rng.choice(["IN_PROGRESS", "CLEARED", "DELAY", "UNKNOWN"]),
+            "desc": rng.choice(_DESCS),
+        }
+        events.append(ev)
+        if rng.random() < 0.15:
+            events.append(dict(ev)) # 같은 이벤트 중복 (원본은 지연 두 건으로 셈)
+    events.sort(key=web._sort_key)
+    return events
+
+
+def _roundtrip(web, state):
+    cols = SimpleNamespace()
+    state.apply_to(cols)
+    return web.CustomsSummaryState.from_shipment(cols)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_full_feed_matches_baseline(web, seed):
+    rng = random.Random(seed)
+    for _ in range(5000):
+        events = _timeline(rng, web)
+        assert web.summarize_customs(events) == _baseline_summarize(events)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_absorb_matches_full_recompute(web, seed):
+    # 타임라인이 조금씩(늦게 도착한 과거 이벤트 포함) 자라며 저장/로드를 반복해도 최종 결과는 전체 재계산과 같다
+    rng = random.Random(100 + seed)
+    for _ in range(3000):
+        final = _timeline(rng, web)
+        keep = sorted(rng.sample(range(len(final)), rng.randint(0, len(final))))
+        snapshots = []
+        for _ in range(rng.randint(1, 4)):
+            keep = sorted(set(keep) | set(rng.sample(range(len(final)), rng.randint(0, len(final)))))
+            snapshots.append([final[i] for i in keep])
+        snapshots.append(final)
+
+        state = web.CustomsSummaryState()
+        for snap in snapshots:
+            state = _roundtrip(web, state).absorb(snap)
+        assert state.summary() == _baseline_summarize(final)
+        assert state.count == len(final)
+
+
+def test_append_only_feeds_tail(web):
+    ev = lambda h, stage, desc="Import": {"ts": _T0 + timedelta(hours=h), "stage": stage, "desc": desc}
+    old = [ev(0, "IN_PROGRESS"), ev(1, "DELAY")]
+    state = web.CustomsSummaryState()
+    state.feed_many(old)
+    stored = _roundtrip(web, state)
+    new = stored.absorb(old + [ev(2, "CLEARED")])
+    assert new is stored and new.count == 3 # 꼬리만 반영
+
+    stored = _roundtrip(web, state)
+    late = stored.absorb([ev(-1, "IN_PROGRESS")] + old)
+    assert late is not stored # 과거 이벤트가 끼어들면 전체 재계산
+    assert late.first_in == _T0 - timedelta(hours=1)
+
+
+def test_webhook_returns_summary_and_defers_write(web, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(web.group_writer, "submit_shipment", submitted.append)
+    client = TestClient(web.app)
+    payload = client.post("/test/webhook", params={"number": "HOOK00000001KR"}).json()
+    body = client.post("/webhooks/17track", json=payload).json()
+
+    assert body["summary"]["status"] == "CLEARED"
+    assert body["summary"] == web.summarize_customs(web.normalize_from_track(payload["data"]["track"]))
+    # 저장은 writer에 (요약 없이 힌트만) — 요약 상태는 writer의 absorb()가 갱신
+    assert [s["tracking_number"] for s in submitted] == ["HOOK00000001KR"]
+    assert submitted[0]["summary"] == {"status": "PRE_CUSTOMS"}
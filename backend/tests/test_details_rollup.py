@@ -0,0 +1,31 @@
+from datetime import date
+
+from sqlalchemy import select
+
+
+def test_origin_change_moves_rollup_group(web):
+    number = "ROLL00000001KR"
+    with web.get_db() as db:
+        web.bulk_upsert_shipments(db, [{
+            "tracking_number": number,
+            "carrier": "ROLLTEST",
+            "any_events": True,
+            "normalized": [
+                {"ts": "2024-02-03T01:00:00+00:00", "stage": "IN_PROGRESS", "desc": "import customs started"},
+                {"ts": "2024-02-03T04:00:00+00:00", "stage": "CLEARED", "desc": "import customs cleared"},
+            ],
+        }])
+    # 미상("") → 중국 → 일본: 롤업 건수가 출발국을 따라 한 그룹에만 남아야 함
+    for origin in ("중국", "일본"):
+        with web.get_db() as db:
+            ship = db.query(web.Shipment).filter_by(tracking_number=number).one()
+            web.upsert_shipment_details(db, ship, {"origin_country": origin})
+
+    R = web.ClearanceRollup.__table__
+    with web.get_read_db() as db:
+        groups = {
+            r.origin_country: r.count
+            for r in db.execute(select(R).where(R.c.day == date(2024, 2, 3), R.c.carrier == "ROLLTEST"))
+        }
+    assert {k: v for k, v in groups.items() if v} == {"일본": 1}
+    assert None not in groups
@@ -0,0 +1,92 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import event_archive
+from fastapi.testclient import TestClient
+
+TIMELINE = [
+    {"ts": "2025-01-01T01:00:00+00:00", "stage": "IN_PROGRESS", "desc": "import customs started"},
+    {"ts": "2025-01-01T05:00:00+00:00", "stage": "CLEARED", "desc": "import customs cleared"},
+]
+
+
+def _upsert(web, number, timeline):
+    with web.get_db() as db:
+        web.bulk_upsert_shipments(db, [{"tracking_number": number, "normalized": timeline, "any_events": True}])
+
+
+def _archive(web, number):
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    with web.get_db() as db:
+        ship_id = db.query(web.Shipment.id).filter_by(tracking_number=number).scalar()
+        _, n_ships, n_events = web._archive_events_batch(db, future, ship_id - 1, batch=1)
+    return n_ships, n_events
+
+
+def _hot_count(web, number):
+    with web.get_read_db() as db:
+        return db.query(web.ShipmentEvent).filter_by(tracking_number=number).count()
+
+
+def test_write_part_read_events_round_trip(tmp_path):
+    rows = [
+        {"shipment_id": 7, "tracking_number": "B", "ts": "2025-01-02T00:00:00+00:00", "stage": "CLEARED", "desc": "b", "source": "s"},
+        {"shipment_id": 3, "tracking_number": "A", "ts": "2025-01-01T00:00:00+00:00", "stage": "IN_PROGRESS", "desc": "a", "source": "s"},
+        {"shipment_id": 7, "tracking_number": "B", "ts": "2025-01-01T00:00:00+00:00", "stage": "IN_PROGRESS", "desc": "b0", "source": "s"},
+    ]
+    rel = event_archive.write_part(tmp_path, date(2025, 1, 2), rows)
+    assert rel.startswith("cleared_date=2025-01-02/")
+    assert [e["desc"] for e in event_archive.read_events(tmp_path, rel, 7)] == ["b0", "b"]
+    assert [e["desc"] for e in event_archive.read_events(tmp_path, rel, 3)] == ["a"]
+    assert event_archive.read_events(tmp_path, rel, 5) == []
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_archive_then_late_event_reads_back(web, tmp_path, monkeypatch):
+    monkeypatch.setattr(web, "EVENT_ARCHIVE_DIR", tmp_path)
+    number = "ARCH00000001KR"
+    _upsert(web, number, TIMELINE)
+    client = TestClient(web.app)
+    before = client.get(f"/admin/shipments/{number}/events").json()
+
+    assert _archive(web, number) == (1, 2)
+    assert _hot_count(web, number) == 0
+    with web.get_read_db() as db:
+        ship = db.query(web.Shipment).filter_by(tracking_number=number).one()
+        parts = json.loads(ship.events_archive_parts)
+        assert len(parts) == 1 and parts[0].startswith("cleared_date=2025-01-01/")
+        assert web._as_utc(ship.events_archived_until) == datetime(2025, 1, 1, 5, tzinfo=timezone.utc)
+    # 보관 후에도 같은 응답 (ts 표기 포함)
+    assert client.get(f"/admin/shipments/{number}/events").json() == before
+
+    # 같은 타임라인을 다시 받아도 보관본에 있는 이벤트는 hot에 다시 들어가지 않음
+    _upsert(web, number, TIMELINE)
+    assert _hot_count(web, number) == 0
+
+    # 보관 구간 안의 늦은 이벤트는 hot에 들어가고 보관본과 합쳐 정렬됨
+    late = {"ts": "2025-01-01T03:00:00+00:00", "stage": "DELAY", "desc": "import hold archlate"}
+    _upsert(web, number, TIMELINE + [late])
+    assert _hot_count(web, number) == 1
+    events = client.get(f"/admin/shipments/{number}/events").json()
+    assert [(e["ts"], e["stage"]) for e in events] == [
+        ("2025-01-01T01:00:00+00:00", "IN_PROGRESS"),
+        ("2025-01-01T03:00:00+00:00", "DELAY"),
+        ("2025-01-01T05:00:00+00:00", "CLEARED"),
+    ]
+    hits = client.get("/api/search", params={"q": "archlate", "scope": "events"}).json()
+    assert number in json.dumps(hits)
+
+    # 다음 보관 작업이 늦은 이벤트도 옮김 (part 추가, 응답은 그대로)
+    assert _archive(web, number) == (1, 1)
+    assert _hot_count(web, number) == 0
+    with web.get_read_db() as db:
+        ship = db.query(web.Shipment).filter_by(tracking_number=number).one()
+        assert len(json.loads(ship.events_archive_parts)) == 2
+    assert client.get(f"/admin/shipments/{number}/events").json() == events
+
+
+def test_event_timestamps_share_one_format(web):
+    number = "ARCH00000002KR"
+    _upsert(web, number, TIMELINE)
+    events = TestClient(web.app).get(f"/admin/shipments/{number}/events").json()
+    assert [e["ts"] for e in events] == ["2025-01-01T01:00:00+00:00", "2025-01-01T05:00:00+00:00"]
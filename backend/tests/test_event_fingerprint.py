@@ -0,0 +1,55 @@
+from sqlalchemy import create_engine, event, inspect
+
+LEGACY_DDL = """
+CREATE TABLE shipment_events (
+    id INTEGER PRIMARY KEY,
+    shipment_id INTEGER NOT NULL,
+    tracking_number VARCHAR(128) NOT NULL,
+    ts DATETIME NOT NULL,
+    stage VARCHAR(32) NOT NULL,
+    "desc" TEXT,
+    source VARCHAR(32),
+    fingerprint BIGINT,
+    last_ts DATETIME,
+    repeat INTEGER,
+    created_at DATETIME,
+    CONSTRAINT uq_shipment_event_dedup UNIQUE (shipment_id, ts, stage, "desc")
+)
+"""
+
+
+def _statements(engine):
+    seen = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cur, stmt, *a: seen.append(stmt))
+    return seen
+
+
+def test_converted_db_skips_fingerprint_scan(web):
+    seen = _statements(web.engine)
+    web._migrate_event_fingerprint()
+    assert not [s for s in seen if "fingerprint IS NULL" in s]
+    assert not [s for s in seen if s.lstrip().upper().startswith(("BEGIN", "UPDATE", "ALTER"))]
+
+
+def test_legacy_db_is_converted_once(web, tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite3'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(LEGACY_DDL)
+        conn.exec_driver_sql(
+            "INSERT INTO shipment_events (shipment_id, tracking_number, ts, stage, \"desc\") VALUES "
+            "(1, 'A', '2025-01-01 01:00:00', 'IN_PROGRESS', 'arrived'),"
+            "(1, 'A', '2025-01-01 01:00:00', 'IN_PROGRESS', 'arrived  '),"  # 공백만 다름 → 하나만 남김
+            "(1, 'A', '2025-01-01 02:00:00', 'CLEARED', 'released')"
+        )
+    monkeypatch.setattr(web, "engine", engine)
+
+    web._migrate_event_fingerprint()
+    names = {u["name"] for u in inspect(engine).get_unique_constraints("shipment_events")}
+    assert names == {"uq_shipment_event_fp"}
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT fingerprint FROM shipment_events ORDER BY id").all()
+    assert len(rows) == 2 and all(r[0] is not None for r in rows)
+
+    seen = _statements(engine)
+    web._migrate_event_fingerprint()
+    assert not [s for s in seen if "fingerprint IS NULL" in s]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+
+def _entry(number, hours=3):
+    return {
+        "tracking_number": number,
+        "normalized": [
+            {"ts": f"2025-04-01T0{h}:00:00+00:00", "stage": "IN_PROGRESS", "desc": f"hub {h}"} for h in range(hours)
+        ],
+        "any_events": True,
+    }
+
+
+def _stored(web, numbers):
+    S, E = web.Shipment.__table__, web.ShipmentEvent.__table__
+    with web.get_read_db() as db:
+        ships = set(db.execute(select(S.c.tracking_number).where(S.c.tracking_number.in_(numbers))).scalars())
+        events = db.execute(select(func.count()).select_from(E).where(E.c.tracking_number.in_(numbers))).scalar()
+    return ships, events
+
+
+def test_failing_intent_does_not_sink_the_window(web, monkeypatch):
+    good, bad = ["GCW000000001KR", "GCW000000003KR"], "GCW000000002KR"
+    real = web.bulk_upsert_shipments
+
+    def flaky(db, entries, *args, **kwargs):
+        # 쓰기를 마친 뒤 실패 → 그 intent의 쓰기는 savepoint로 되돌아가야 함
+        out = real(db, entries, *args, **kwargs)
+        if any(e["tracking_number"] == bad for e in entries):
+            raise ValueError("boom")
+        return out
+
+    monkeypatch.setattr(web, "bulk_upsert_shipments", flaky)
+
+    async def run():
+        writer = web.GroupCommitWriter(5)
+        futs = [writer.submit_shipment(_entry(n)) for n in (good[0], bad, good[1])]
+        try:
+            return await asyncio.gather(*futs, return_exceptions=True)
+        finally:
+            await writer.shutdown()
+
+    first, failed, last = asyncio.run(run())
+    assert isinstance(failed, ValueError)
+    assert first == last == {"shipments": 1, "regressed": 0, "events": 3}
+    assert _stored(web, good + [bad]) == (set(good), 6)
+
+
+def test_failing_details_patch_is_isolated(web, monkeypatch):
+    numbers = ["GCW000000011KR", "GCW000000012KR"]
+    real = web.upsert_shipment_details
+
+    def flaky(db, ship, patch):
+        row = real(db, ship, patch)
+        if ship.tracking_number == numbers[0]:
+            db.flush()
+            raise RuntimeError("detail boom")
+        return row
+
+    async def run():
+        writer = web.GroupCommitWriter(5)
+        try:
+            await writer.submit_shipments([_entry(n) for n in numbers])
+            monkeypatch.setattr(web, "upsert_shipment_details", flaky)
+            return await asyncio.gather(
+                *[writer.submit_details(n, {"product_info": "DOLLS"}) for n in numbers], return_exceptions=True
+            )
+        finally:
+            await writer.shutdown()
+
+    failed, ok = asyncio.run(run())
+    assert isinstance(failed, RuntimeError)
+    assert ok["found"] is True
+    D = web.ShipmentDetails.__table__
+    with web.get_read_db() as db:
+        info = dict(db.execute(select(D.c.tracking_number, D.c.product_info).where(D.c.tracking_number.in_(numbers))).all())
+    assert info == {numbers[0]: None, numbers[1]: "DOLLS"}
@@ -0,0 +1,48 @@
+import json
+
+from fastapi.testclient import TestClient
+
+
+def _client(web):
+    return TestClient(web.app) # lifespan(startup) 없이
+
+
+def test_list_etag_depends_on_query(web):
+    client = _client(web)
+    base = client.get("/admin/shipments", params={"limit": 5})
+    etag = base.headers["ETag"]
+    assert client.get("/admin/shipments", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 304
+
+    for params in ({"limit": 6}, {"limit": 5, "status": "CLEARED"}, {"limit": 5, "carrier": "X"},
+                   {"limit": 5, "updated_since": "2025-01-01T00:00:00Z"}):
+        r = client.get("/admin/shipments", params=params, headers={"If-None-Match": etag})
+        assert r.status_code == 200, params
+        assert r.headers["ETag"] != etag
+
+    # 같은 조건은 표기만 달라도 같은 태그 (상태 순서/대소문자)
+    a = client.get("/admin/shipments", params={"status": "cleared,DELAY"}).headers["ETag"]
+    b = client.get("/admin/shipments", params={"status": "DELAY, CLEARED"}).headers["ETag"]
+    assert a == b
+
+
+def test_summary_backfill_bumps_list_etag(web):
+    S = web.Shipment.__table__
+    timeline = [
+        {"ts": "2025-07-01T01:00:00+00:00", "stage": "IN_PROGRESS", "desc": "import customs started"},
+        {"ts": "2025-07-01T03:00:00+00:00", "stage": "CLEARED", "desc": "import customs cleared"},
+    ]
+    with web.get_db() as db:
+        db.execute(S.insert().values(tracking_number="ETAG00001KR", normalized=json.dumps(timeline),
+                                     normalized_count=2, last_status="CLEARED"))
+    client = _client(web)
+    etag = client.get("/admin/shipments").headers["ETag"]
+
+    last_id = 0
+    while last_id is not None:
+        with web.get_db() as db:
+            _, last_id = web._backfill_summary_columns(db, last_id)
+
+    r = client.get("/admin/shipments", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    row = next(x for x in r.json() if x["number"] == "ETAG00001KR")
+    assert row["cleared_at"] is not None and row["duration_sec"] == 7200
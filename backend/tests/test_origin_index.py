@@ -0,0 +1,16 @@
+from origin_index import OriginIndex
+
+COUNTRIES = [
+    {"iso2": "CN", "name_en": "China", "name_ko": "중국"},
+    {"iso2": "US", "name_en": "United States", "name_ko": "미국"},
+    {"iso2": "KR", "name_en": "Korea", "name_ko": "한국"},
+]
+
+
+def test_tracking_number_suffix_only_for_s10_numbers():
+    idx = OriginIndex(COUNTRIES, [])
+    assert idx.ko_from_tracking_number("RB123456789CN") == "중국"
+    assert idx.ko_from_tracking_number(" lp123456789us ") == "미국"
+    # 숫자+2자로 끝나지만 S10 모양이 아닌 운송사 번호
+    for number in ("YT2412345678901KR", "1234567890US", "SF1234567890CN", "RB12345678CN", None):
+        assert idx.ko_from_tracking_number(number) is None, number
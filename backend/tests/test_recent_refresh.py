@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+
+def _queued(client, numbers):
+    r = client.get("/api/recent-events", params={"tracking_numbers": ",".join(numbers), "refresh_older_than": 5})
+    assert r.status_code == 200
+    return int(r.headers["X-Refresh-Queued"])
+
+
+def test_refresh_remembers_numbers_without_rows(web, monkeypatch):
+    """17TRACK이 돌려주지 않은 번호(행 없음)도 한 번 조회하면 다음 요청에서 다시 예약하지 않는다"""
+    polled = []
+
+    async def no_tracks(numbers):
+        polled.extend(numbers)
+        return
+        yield
+
+    monkeypatch.setattr(web, "iter_trackinfo", no_tracks)
+    client = TestClient(web.app)
+    numbers = ["POLL00001KR", "POLL00002KR"]
+
+    assert _queued(client, numbers) == 2 # 응답 후 백그라운드 작업까지 실행됨
+    assert polled == numbers
+    assert _queued(client, numbers) == 0
+    assert not web._recent_refreshing
+
+    # 조회 시도가 cutoff보다 오래되면 다시 예약
+    with web._poll_lock:
+        web._last_polled["POLL00001KR"] = datetime.now(timezone.utc) - timedelta(minutes=10)
+    assert _queued(client, numbers) == 1
+    assert polled == numbers + ["POLL00001KR"]
+
+
+def test_mark_polled_forgets_old_entries(web):
+    old = datetime.now(timezone.utc) - timedelta(seconds=web.POLL_MEMORY_SEC + 60)
+    with web._poll_lock:
+        web._last_polled["POLLOLD01KR"] = old
+        web._last_polled.move_to_end("POLLOLD01KR", last=False)
+    web._mark_polled(["POLLNEW01KR"])
+    assert "POLLOLD01KR" not in web._last_polled
+    assert "POLLNEW01KR" in web._last_polled
@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete
+
+from test_event_fingerprint import LEGACY_DDL
+
+
+def _search(web, q, scope="all"):
+    return TestClient(web.app).get("/api/search", params={"q": q, "scope": scope}).json()
+
+
+def _numbers(res):
+    return [r["number"] for r in res["shipments"]]
+
+
+def _event_descs(res):
+    return [e["desc"] for e in res["events"]]
+
+
+def _upsert(web, number, carrier, timeline):
+    with web.get_db() as db:
+        web.bulk_upsert_shipments(db, [{"tracking_number": number, "carrier": carrier,
+                                        "normalized": timeline, "any_events": True}])
+
+
+TIMELINE = [{"ts": "2025-04-01T01:00:00+00:00", "stage": "IN_PROGRESS", "desc": "arrived at quokkaport gateway"}]
+
+
+@pytest.fixture
+def fts(web):
+    if not web.SEARCH_FTS:
+        pytest.skip("FTS5 없음")
+    return web
+
+
+def test_triggers_follow_insert_update_delete(fts):
+    web, number = fts, "SRCHQZX00001KR"
+    _upsert(web, number, "WOMBATEXPRESS", TIMELINE)
+    assert _numbers(_search(web, "wombatexpress", "shipments")) == [number]
+    assert _numbers(_search(web, "HQZX0000", "shipments")) == [number] # 번호 중간 일부 (trigram)
+    assert _event_descs(_search(web, "quokk", "events")) == [TIMELINE[0]["desc"]] # 접두 일치
+
+    # carrier 변경 / 상세 입력 → 색인 갱신
+    _upsert(web, number, "NUMBATPOST", TIMELINE)
+    with web.get_db() as db:
+        ship = db.query(web.Shipment).filter_by(tracking_number=number).one()
+        web.upsert_shipment_details(db, ship, {"customs_office": "인천공항세관", "product_info": "platypus plush"})
+    assert _numbers(_search(web, "wombatexpress", "shipments")) == []
+    assert _numbers(_search(web, "numbatpost", "shipments")) == [number]
+    assert _numbers(_search(web, "공항세관", "shipments")) == [number]
+    assert _numbers(_search(web, "platypus", "shipments")) == [number]
+
+    # 이벤트 삭제(보관 이동과 같은 경로) → 이벤트 색인에서 빠짐
+    with web.get_db() as db:
+        db.execute(delete(web.ShipmentEvent.__table__).where(web.ShipmentEvent.tracking_number == number))
+    assert _search(web, "quokkaport", "events")["events"] == []
+
+    # 운송장 삭제 → 운송장 색인에서 빠짐
+    with web.get_db() as db:
+        db.execute(delete(web.ShipmentDetails.__table__).where(web.ShipmentDetails.tracking_number == number))
+        db.execute(delete(web.Shipment.__table__).where(web.Shipment.tracking_number == number))
+    assert _numbers(_search(web, "numbatpost", "shipments")) == []
+
+
+def test_like_fallback(web, monkeypatch):
+    number = "SRCH00000002KR"
+    _upsert(web, number, "DINGOFREIGHT", [
+        {"ts": "2025-04-02T01:00:00+00:00", "stage": "DELAY", "desc": "held for bilbyinspection"},
+    ])
+    monkeypatch.setattr(web, "SEARCH_FTS", False)
+    res = _search(web, "ingofrei")
+    assert _numbers(res) == [number]
+    assert res["shipments"][0]["score"] is None
+    assert _event_descs(_search(web, "bilbyinsp", "events")) == ["held for bilbyinspection"]
+
+
+def test_triggers_survive_fingerprint_table_rebuild(fts, tmp_path, monkeypatch):
+    web = fts
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.sqlite3'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(LEGACY_DDL)
+        conn.exec_driver_sql(
+            "INSERT INTO shipment_events (id, shipment_id, tracking_number, ts, stage, \"desc\") VALUES "
+            "(1, 1, 'A', '2025-01-01 01:00:00', 'IN_PROGRESS', 'echidna  hub'),"
+            "(2, 1, 'A', '2025-01-01 01:00:00', 'IN_PROGRESS', 'echidna hub')" # 공백만 다른 중복
+        )
+    web.Base.metadata.create_all(engine)
+    monkeypatch.setattr(web, "engine", engine)
+    # 기존 색인 → (다음 기동) 중복 키 전환으로 테이블 재생성 → 검색 색인/트리거 확인
+    assert web._ensure_search_index()
+    web._migrate_event_fingerprint()
+    assert web._ensure_search_index()
+
+    with engine.begin() as conn:
+        hits = conn.exec_driver_sql("SELECT rowid FROM event_fts WHERE event_fts MATCH 'echidna'").all()
+        assert hits == [(1,)]
+        conn.execute(web.ShipmentEvent.__table__.insert().values(
+            shipment_id=1, tracking_number="A", ts=datetime(2025, 1, 1, 2, tzinfo=timezone.utc),
+            stage="CLEARED", desc="released by kookaburra", fingerprint=7,
+        ))
+        assert len(conn.exec_driver_sql("SELECT rowid FROM event_fts WHERE event_fts MATCH 'kookaburra'").all()) == 1
+        conn.exec_driver_sql("DELETE FROM shipment_events")
+        assert conn.exec_driver_sql("SELECT count(*) FROM event_fts WHERE event_fts MATCH 'echidna OR kookaburra'").scalar() == 0
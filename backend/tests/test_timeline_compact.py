@@ -0,0 +1,69 @@
+import copy
+
+import timeline_codec
+from fastapi.testclient import TestClient
+
+
+def _ev(ts, stage="IN_PROGRESS", desc="arrived at sort facility", location="ICN"):
+    return {"ts": f"2025-03-01T{ts}:00+00:00", "stage": stage, "desc": desc, "location": location}
+
+
+SCANS = [
+    _ev("01:00", desc="departed origin"),
+    _ev("02:00"), _ev("03:00"), _ev("04:00"),
+    _ev("05:00", stage="CLEARED", desc="import customs cleared"),
+]
+
+
+def test_compact_folds_adjacent_repeats(web):
+    out = web.compact_timeline(SCANS)
+    assert [e.get("repeat") for e in out] == [None, 3, None]
+    assert out[1]["ts"] == SCANS[1]["ts"] and out[1]["last_ts"] == SCANS[3]["ts"]
+    assert "last_ts" not in out[0] and "repeat" not in out[2]
+    assert "repeat" not in SCANS[1] # 입력은 건드리지 않음
+
+
+def test_compact_is_idempotent(web):
+    once = web.compact_timeline(SCANS)
+    assert web.compact_timeline(copy.deepcopy(once)) == once
+    # 접힌 목록 뒤에 같은 스캔이 더 붙어도 한 항목으로 이어짐
+    grown = web.compact_timeline(copy.deepcopy(once[:2]) + [_ev("04:30")])
+    assert grown[1]["repeat"] == 4 and grown[1]["last_ts"] == _ev("04:30")["ts"]
+
+
+def test_compact_keeps_non_adjacent_repeats(web):
+    events = [_ev("01:00"), _ev("02:00", desc="departed hub"), _ev("03:00"), _ev("04:00", location="GMP")]
+    assert web.compact_timeline(events) == events
+
+
+def test_codec_round_trips_repeats():
+    compact = [
+        {"ts": "2025-03-01T01:00:00+00:00", "stage": "IN_PROGRESS", "desc": "a", "location": None},
+        {"ts": "2025-03-01T02:00:00+00:00", "stage": "IN_PROGRESS", "desc": "b", "location": "ICN",
+         "last_ts": "2025-03-01T04:30:00+00:00", "repeat": 3},
+        {"ts": "2025-03-01T05:00:00.250000+00:00", "stage": "CLEARED", "desc": "c", "location": None},
+    ]
+    blob = timeline_codec.encode_timeline(compact)
+    assert blob[3] & timeline_codec.FLAG_REPEATS
+    assert timeline_codec.decode_timeline(blob) == compact
+
+    plain = [{k: v for k, v in e.items() if k not in ("last_ts", "repeat")} for e in compact]
+    blob = timeline_codec.encode_timeline(plain)
+    assert not blob[3] & timeline_codec.FLAG_REPEATS
+    assert timeline_codec.decode_timeline(blob) == plain
+
+
+def test_folded_run_keeps_last_ts_on_event_rows(web):
+    number = "FOLD00000001KR"
+    client = TestClient(web.app)
+    for scans in (SCANS[:3], SCANS[:4]): # 반복이 이어져 늘어남
+        with web.get_db() as db:
+            web.bulk_upsert_shipments(db, [{"tracking_number": number, "normalized": scans, "any_events": True}])
+
+    events = client.get(f"/admin/shipments/{number}/events").json()
+    assert [(e["stage"], e["repeat"], e["last_ts"]) for e in events] == [
+        ("IN_PROGRESS", None, None),
+        ("IN_PROGRESS", 3, "2025-03-01T04:00:00+00:00"),
+    ]
+    feed = client.get("/api/recent-events", params={"tracking_numbers": number}).json()
+    assert feed[0]["time_iso"] == "2025-03-01T04:00:00+00:00"
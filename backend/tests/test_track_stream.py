@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from track_stream import TrackStreamDecoder
+
+
+PAYLOADS = [
+    # 청크 경계에서 숫자가 "1." 로 잘리는 경우
+    '{"result":[{"number":"Q"}],"meta":{"a":[1,2]},"n":1.5}',
+    '{"code":0,"data":{"accepted":[{"number":"RB1CN","track":{"b":301,"w":-1.25e+3,"z0":{"a":1E-2}}},'
+    '{"number":"A2","tag":null,"ok":true,"no":false}],"rejected":[]},"page":{"total":2}}',
+    '{"data":{"result":[],"list":[{"number":"L1","n":[0,-0,12345678901234567890,3.0e10]}]},"x":-7}',
+    '[{"number":"ARR1","desc":"세관 \\"통관\\" 완료 \\u00e9 😀"},{"number":"ARR2","v":0.5}]',
+    '  {\n  "list" : [ { "number" : "WS1" , "v" : 10 } ] ,\n "n" : 2e5 }  ',
+    '{"number":"ROOT1","track":{"e":0,"z1":[{"a":"2026-01-01 10:00","z":"Arrived"}]},"b":2105}',
+    '{"data":{"accepted":[{"number":"E1","big":1e308,"neg":-1.0E-300}]},"tail":123}',
+]
+
+
+def _expected(payload: str):
+    doc = json.loads(payload)
+    if isinstance(doc, list):
+        return [x for x in doc if isinstance(x, dict)]
+    out = []
+    for key in ("accepted", "result", "list"):
+        out += [x for x in (doc.get("data") or {}).get(key) or [] if isinstance(x, dict)]
+    for key in ("result", "list"):
+        out += [x for x in doc.get(key) or [] if isinstance(x, dict)]
+    if not out and doc.get("number"):
+        out = [{k: v for k, v in doc.items()}]
+    return out
+
+
+def _decode(chunks):
+    dec = TrackStreamDecoder()
+    out = []
+    for c in chunks:
+        out += dec.feed(c)
+    return out + dec.close()
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_byte_by_byte(payload):
+    raw = payload.encode("utf-8")
+    assert _decode(raw[i:i + 1] for i in range(len(raw))) == _expected(payload)
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_every_split_point(payload):
+    raw = payload.encode("utf-8")
+    expected = _expected(payload)
+    for i in range(len(raw) + 1):
+        assert _decode([raw[:i], raw[i:]]) == expected, i
+
+
+def test_truncated_raises():
+    raw = PAYLOADS[1].encode("utf-8")
+    with pytest.raises(ValueError):
+        _decode([raw[:-5]])
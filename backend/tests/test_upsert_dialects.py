@@ -0,0 +1,234 @@
+import io
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.dialects.postgresql import Insert as PgInsert
+from sqlalchemy.dialects.sqlite import Insert as SqliteInsert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import Insert, Select
+
+DIALECTS = {"sqlite": sqlite.dialect(), "postgresql": postgresql.dialect()}
+
+
+class _Result(list):
+    def all(self):
+        return list(self)
+
+
+class _Copy3:
+    """psycopg 3 cursor.copy() 대역"""
+
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write_row(self, row):
+        self.sink.append(tuple(row))
+
+
+class _RawConnection:
+    """드라이버 커넥션 대역: COPY로 들어온 행과 (psycopg2면) 텍스트 본문을 모은다"""
+
+    def __init__(self, psycopg3: bool):
+        self.psycopg3 = psycopg3
+        self.copy_sql = None
+        self.copied = []
+        self.text = None
+
+    def cursor(self):
+        raw = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            if raw.psycopg3:
+                def copy(self, sql):
+                    raw.copy_sql = sql
+                    return _Copy3(raw.copied)
+            else:
+                def copy_expert(self, sql, buf):
+                    raw.copy_sql = sql
+                    raw.text = buf.read()
+                    raw.copied.extend(tuple(line.split("\t")) for line in raw.text.splitlines())
+
+        return Cursor()
+
+
+class CompilingSession:
+    """
+    DB 없이 dialect로만 컴파일하는 세션 대역.
+    실행된 문장을 모두 SQL 문자열로 모으고, 쓰기 경로가 다시 읽는 결과만 흉내 낸다
+    (새 shipments id, 이벤트 INSERT ... RETURNING).
+    """
+
+    def __init__(self, dialect_name: str, raw: _RawConnection = None):
+        self.dialect = DIALECTS[dialect_name]
+        self.raw = raw
+        self.info = {}
+        self.sql = []
+        self.ids = {}
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=self.dialect)
+
+    def connection(self):
+        return SimpleNamespace(connection=SimpleNamespace(driver_connection=self.raw))
+
+    def execute(self, stmt, params=None):
+        self.sql.append(str(stmt.compile(dialect=self.dialect)))
+        if isinstance(stmt, Insert):
+            name = stmt.table.name
+            if name == "shipments":
+                for p in params:
+                    self.ids.setdefault(p["tracking_number"], len(self.ids) + 1)
+            if name == "shipment_events" and stmt._returning:
+                if params is not None:
+                    return _Result((p["shipment_id"], p["tracking_number"]) for p in params)
+                return _Result((r[0], r[1]) for r in self.raw.copied) # COPY 후 INSERT ... SELECT
+        if isinstance(stmt, Select) and list(stmt.selected_columns.keys()) == ["tracking_number", "id"]:
+            return _Result(self.ids.items())
+        return _Result()
+
+    def statements(self, prefix):
+        """prefix로 시작하는 문장 (dialect마다 다른 공백/식별자 따옴표를 없앤 형태)"""
+        return [_flat(s) for s in self.sql if s.startswith(prefix)]
+
+
+def _flat(sql: str) -> str:
+    return "".join(sql.split()).replace('"', "")
+
+
+def _events(n, start=datetime(2025, 3, 1, tzinfo=timezone.utc)):
+    return [
+        {"ts": (start + timedelta(hours=i)).isoformat(), "stage": "IN_PROGRESS", "desc": f"hub {i}"}
+        for i in range(n)
+    ]
+
+
+def _event_rows(web, n, shipment_id=1, number="DIA000000001KR"):
+    return web._event_rows(shipment_id, number, _events(n))
+
+
+@pytest.mark.parametrize("name,cls", [("sqlite", SqliteInsert), ("postgresql", PgInsert)])
+def test_upsert_insert_picks_dialect_construct(web, name, cls):
+    assert isinstance(web._upsert_insert(CompilingSession(name), web.Shipment.__table__), cls)
+
+
+def test_upsert_insert_rejects_unsupported_dialect(web):
+    db = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=mysql.dialect()))
+    with pytest.raises(RuntimeError):
+        web._upsert_insert(db, web.Shipment.__table__)
+
+
+@pytest.mark.parametrize("name", ["sqlite", "postgresql"])
+def test_bulk_upsert_statements_compile(web, name):
+    db = CompilingSession(name)
+    result = web.bulk_upsert_shipments(db, [
+        {"tracking_number": f"DIA{i:09d}KR", "normalized": _events(3), "any_events": True} for i in range(4)
+    ])
+    assert result == {"shipments": 4, "regressed": 0, "events": 12}
+
+    (ship,) = db.statements("INSERT INTO shipments ")
+    assert _flat("ON CONFLICT (tracking_number) DO UPDATE SET") in ship
+    assert _flat("normalized_bin = excluded.normalized_bin") in ship
+
+    (details,) = db.statements("INSERT INTO shipment_details ")
+    assert _flat("ON CONFLICT (shipment_id) DO UPDATE SET") in details
+    assert _flat("coalesce(excluded.event_processed_at, shipment_details.event_processed_at)") in details
+
+    (events,) = db.statements("INSERT INTO shipment_events ")
+    # 같은 이벤트는 접힌 반복 스캔이 늘었을 때만 갱신
+    assert _flat("ON CONFLICT (shipment_id, fingerprint) DO UPDATE SET last_ts = excluded.last_ts, repeat = excluded.repeat") in events
+    assert _flat("WHERE excluded.repeat > coalesce(shipment_events.repeat,") in events
+
+    (aggs,) = db.statements("INSERT INTO shipment_aggregates ")
+    assert _flat("ON CONFLICT (dim, key) DO UPDATE SET count = (shipment_aggregates.count + excluded.count)") in aggs
+
+    # 변경 로그 직렬화는 postgresql에서만 advisory lock
+    assert any("pg_advisory_xact_lock" in s for s in db.sql) == (name == "postgresql")
+
+
+def test_small_event_batch_skips_copy_on_postgresql(web):
+    db = CompilingSession("postgresql", _RawConnection(psycopg3=True))
+    assert web._insert_event_rows(db, _event_rows(web, 5)) == 5
+    assert db.raw.copy_sql is None
+    assert not db.statements("COPY") and not any("_event_stage" in s for s in db.sql)
+
+
+@pytest.mark.parametrize("psycopg3", [True, False], ids=["psycopg3", "psycopg2"])
+def test_copy_loader_statements(web, monkeypatch, psycopg3):
+    monkeypatch.setattr(web, "PG_COPY_MIN_ROWS", 10)
+    rows = _event_rows(web, 12)
+    db = CompilingSession("postgresql", _RawConnection(psycopg3))
+    assert web._insert_event_rows(db, rows) == 12
+
+    cols = '"shipment_id", "tracking_number", "ts", "stage", "desc", "source", "fingerprint", "last_ts", "repeat"'
+    assert db.raw.copy_sql == f"COPY _event_stage ({cols}) FROM STDIN"
+    assert db.sql[0].startswith("CREATE TEMP TABLE IF NOT EXISTS _event_stage ON COMMIT DELETE ROWS AS")
+    (merge,) = db.statements("INSERT INTO shipment_events ")
+    assert _flat("FROM _event_stage ON CONFLICT (shipment_id, fingerprint) DO UPDATE SET last_ts = excluded.last_ts") in merge
+    # 스테이징은 병합 직후 비움 (같은 트랜잭션에서 다시 불려도 중복 적재 없음)
+    merged_at = next(i for i, q in enumerate(db.sql) if q.startswith("INSERT INTO shipment_events "))
+    assert db.sql[merged_at + 1] == "TRUNCATE _event_stage"
+
+    expected = [tuple(r[c] for c in web._EVENT_COLUMNS) for r in rows]
+    if psycopg3:
+        assert db.raw.copied == expected
+    else:
+        lines = db.raw.text.splitlines()
+        assert len(lines) == 12
+        assert lines[0].split("\t") == [web._pg_copy_field(v) for v in expected[0]]
+
+
+def test_copy_text_fields_escape_and_keep_null_distinct(web):
+    assert web._pg_copy_field(None) == "\\N"
+    assert web._pg_copy_field("") == ""
+    assert web._pg_copy_field("a\tb\nc\\d\r") == "a\\tb\\nc\\\\d\\r"
+    ts = datetime(2025, 3, 1, 9, 30, tzinfo=timezone.utc)
+    assert web._pg_copy_field(ts) == "2025-03-01T09:30:00+00:00"
+
+
+# ---------- PostgreSQL 통합 (TEST_PG_URL=postgresql+psycopg://... 빈 테스트 DB) ----------
+@pytest.mark.skipif(not os.getenv("TEST_PG_URL"), reason="TEST_PG_URL 미설정 (PostgreSQL COPY 통합 테스트)")
+def test_copy_loader_against_postgresql(web, monkeypatch):
+    engine = create_engine(os.environ["TEST_PG_URL"])
+    web.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr(web, "PG_COPY_MIN_ROWS", 100)
+    S, E, C = web.Shipment.__table__, web.ShipmentEvent.__table__, web.ShipmentChange.__table__
+    number = "PGCOPY0001KR"
+    try:
+        with Session() as db:
+            sid = db.execute(S.insert().values(tracking_number=number).returning(S.c.id)).scalar_one()
+            events = _events(300)
+            events[0]["desc"] = "tab\there\nnew line \\ back"
+            rows = web._event_rows(sid, number, events)
+            assert web._insert_event_rows(db, rows[:200]) == 200
+            # 같은 트랜잭션에서 다시: 스테이징이 비워졌고 겹친 100건은 충돌로 무시
+            assert web._insert_event_rows(db, rows[100:]) == 100
+            db.commit()
+
+        with Session() as db:
+            assert web._insert_event_rows(db, rows) == 0
+            db.commit()
+            assert db.execute(select(func.count()).select_from(E).where(E.c.shipment_id == sid)).scalar_one() == 300
+            stored = db.execute(select(E.c.desc).where(E.c.fingerprint == rows[0]["fingerprint"])).scalar_one()
+            assert stored == "tab\there\nnew line \\ back"
+            counts = db.execute(select(C.c.count).where(C.c.tracking_number == number, C.c.kind == "events")).scalars().all()
+            assert sorted(counts) == [100, 200]
+    finally:
+        web.Base.metadata.drop_all(engine)
+        engine.dispose()
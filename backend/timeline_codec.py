@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+from dateutil import parser as dtp
+
+
+# Shipment.normalized_bin 저장 포맷 (버전 1)
+#   헤더 4바이트: b"NT" + version + flags, 이어서 본문 (flags & ZLIB 이면 zlib 압축)
+#   본문 (little-endian, 고정폭 → 디코드는 struct.unpack 한 번씩):
+#     n(u32), 사전 문자열 수 m(u32), 문자열 바이트 길이 m개(u32), utf-8 문자열들
+#     ts 열: epoch 차이값 n개(i64, 첫 값은 epoch 그대로) — 단위는 FLAG_SECONDS면 초, 아니면 마이크로초
+#     stage 열: n개(u16) — STAGES 인덱스, 그 외는 len(STAGES) + 코드
+#     desc / location 열: n개(u16) — 코드 (0 = None, i + 1 = 사전 i번째)
+#     (flags & REPEATS) repeat 열 n개(u32) + 구간 열 n개(i64, last_ts - ts, ts와 같은 단위)
+# - 디코드 결과는 기존 JSON 텍스트와 같은 모양: [{"ts": ISO(UTC), "stage", "desc", "location"}]
+#   반복 스캔을 접은 항목(repeat > 1)만 "last_ts", "repeat" 키가 더 붙는다
+MAGIC = b"NT"
+VERSION = 1
+FLAG_ZLIB = 0x01
+FLAG_SECONDS = 0x02 # 모든 ts가 초 단위 (마이크로초 0)
+FLAG_REPEATS = 0x04 # 접힌 반복 스캔 열(repeat, 구간)이 뒤에 붙음
+STAGES = ("UNKNOWN", "IN_PROGRESS", "CLEARED", "DELAY", "PRE_CUSTOMS")
+COMPRESS_MIN_BYTES = 96 # 이보다 짧은 본문은 압축해도 이득이 없음
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_STAGE_CODE = {s: i for i, s in enumerate(STAGES)}
+_U32 = struct.Struct("<I")
+
+
+def _epoch_us(ts: Any) -> int:
+    if isinstance(ts, str):
+        ts = dtp.isoparse(ts)
+    if not isinstance(ts, datetime):
+        raise ValueError(f"unsupported ts: {ts!r}")
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    delta = ts - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def encode_timeline(events: List[Dict[str, Any]]) -> bytes:
+    """정규화 이벤트 목록 -> 바이너리 (ts를 해석할 수 없으면 ValueError)"""
+    strings: Dict[str, int] = {}
+
+    def code(s: Optional[str]) -> int:
+        if s is None:
+            return 0
+        return strings.setdefault(s, len(strings)) + 1
+
+    n = len(events)
+    stamps = [_epoch_us(e["ts"]) for e in events]
+    repeats = [int(e.get("repeat") or 1) for e in events]
+    has_repeats = any(r > 1 for r in repeats)
+    lasts = [_epoch_us(e["last_ts"]) if r > 1 and e.get("last_ts") else us
+             for e, r, us in zip(events, repeats, stamps)] if has_repeats else stamps
+    stage_col, desc_col, loc_col = [], [], []
+    for e in events:
+        stage = e["stage"]
+        stage_col.append(_STAGE_CODE[stage] if stage in _STAGE_CODE else len(STAGES) + code(stage))
+        desc_col.append(code(e.get("desc", "")))
+        loc_col.append(code(e.get("location")))
+    if len(strings) >= 0xFFFF - len(STAGES):
+        raise ValueError("too many distinct strings in timeline")
+
+    flags = 0
+    if all(us % 1_000_000 == 0 for us in stamps) and all(us % 1_000_000 == 0 for us in lasts):
+        flags |= FLAG_SECONDS
+        stamps = [us // 1_000_000 for us in stamps]
+        lasts = [us // 1_000_000 for us in lasts]
+    deltas = [b - a for a, b in zip([0] + stamps, stamps)]
+    if has_repeats:
+        flags |= FLAG_REPEATS
+
+    raw = [s.encode("utf-8") for s in strings] # dict 삽입 순서 = 사전 인덱스
+    body = b"".join((
+        struct.pack(f"<II{len(raw)}I", n, len(raw), *map(len, raw)),
+        *raw,
+        struct.pack(f"<{n}q{3 * n}H", *deltas, *stage_col, *desc_col, *loc_col),
+        struct.pack(f"<{n}I{n}q", *repeats, *(b - a for a, b in zip(stamps, lasts))) if has_repeats else b"",
+    ))
+    if len(body) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(body, 6)
+        if len(packed) < len(body):
+            body = packed
+            flags |= FLAG_ZLIB
+    return MAGIC + bytes((VERSION, flags)) + body
+
+
+def decode_timeline(blob: bytes) -> List[Dict[str, Any]]:
+    blob = bytes(blob)
+    if blob[:2] != MAGIC:
+        raise ValueError("not an encoded timeline")
+    version, flags = blob[2], blob[3]
+    if version != VERSION:
+        raise ValueError(f"unsupported timeline encoding version {version}")
+    buf = zlib.decompress(blob[4:]) if flags & FLAG_ZLIB else blob[4:]
+
+    n, m = struct.unpack_from("<II", buf, 0)
+    pos = 8
+    sizes = struct.unpack_from(f"<{m}I", buf, pos)
+    pos += 4 * m
+    strings: List[Optional[str]] = [None] # 코드 0 = None
+    for size in sizes:
+        strings.append(buf[pos:pos + size].decode("utf-8"))
+        pos += size
+    fmt = f"<{n}q{3 * n}H"
+    cols = struct.unpack_from(fmt, buf, pos)
+
+    unit = timedelta(seconds=1) if flags & FLAG_SECONDS else timedelta(microseconds=1)
+    stamps = list(accumulate(cols[:n]))
+    stage_col, desc_col, loc_col = cols[n:2 * n], cols[2 * n:3 * n], cols[3 * n:]
+    n_stages = len(STAGES)
+    out = [
+        {
+            "ts": (_EPOCH + unit * t).isoformat(),
+            "stage": STAGES[sc] if sc < n_stages else strings[sc - n_stages],
+            "desc": strings[dc],
+            "location": strings[lc],
+        }
+        for t, sc, dc, lc in zip(stamps, stage_col, desc_col, loc_col)
+    ]
+    if flags & FLAG_REPEATS:
+        extra = struct.unpack_from(f"<{n}I{n}q", buf, pos + struct.calcsize(fmt))
+        for ev, t, r, span in zip(out, stamps, extra[:n], extra[n:]):
+            if r > 1:
+                ev["last_ts"] = (_EPOCH + unit * (t + span)).isoformat()
+                ev["repeat"] = r
+    return out
+
+
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, (bytes, bytearray, memoryview)) and bytes(value[:2]) == MAGIC
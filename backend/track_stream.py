@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# gettrackinfo 응답에서 track item 배열이 올 수 있는 위치 (기존 "스키마 방어"와 동일)
+#   - 루트 배열
+#   - data.accepted / data.result / data.list
+#   - 루트 result / list
+_TARGET_ARRAYS = {(), ("data", "accepted"), ("data", "result"), ("data", "list"), ("result",), ("list",)}
+# 안으로 들어가며 파싱하는 객체 (나머지 값은 통째로 건너뜀)
+_ENTER_OBJECTS = {(), ("data",)}
+
+_WS = re.compile(r"[ \t\n\r]*")
+_COMPACT_AT = 1 << 16
+_NUMBER_CONT = frozenset("0123456789.eE+-")
+
+
+class _NeedMore(Exception):
+    pass
+
+
+class TrackStreamDecoder:
+    """
+    gettrackinfo 응답 바이트를 조금씩 받아 track item(dict)을 하나씩 돌려주는 증분 디코더.
+    - 대상 배열의 원소만 json으로 완성해 반환하고, 버퍼에는 '현재 원소 + 청크'만 남긴다.
+    - 루트 객체가 track 그 자체(number 키 보유)인 경우는 close()에서 한 번에 반환.
+
+    사용:
+        dec = TrackStreamDecoder()
+        for chunk in chunks:
+            for item in dec.feed(chunk): ...
+        for item in dec.close(): ...
+    """
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        # 프레임: [kind("obj"|"arr"), path, state, key]
+        self._stack: List[list] = []
+        self._started = False
+        self._finished = False
+        self._final = False
+        self._yielded = 0
+        self._root_fields: Dict[str, Any] = {}
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        self._buf += self._text.decode(chunk)
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._buf += self._text.decode(b"", final=True)
+        self._final = True
+        out = self._drain()
+        if not self._finished and (self._buf[self._pos:].strip() or self._started):
+            raise ValueError("truncated gettrackinfo response")
+        if not self._yielded and self._root_fields.get("number"):
+            out.append(self._root_fields)
+            self._yielded += 1
+        return out
+
+    # ---------- 내부 ----------
+    def _drain(self) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        try:
+            while not self._finished:
+                self._step(out)
+        except _NeedMore:
+            pass
+        if self._pos > _COMPACT_AT:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        return out
+
+    def _peek(self) -> str:
+        self._pos = _WS.match(self._buf, self._pos).end()
+        if self._pos >= len(self._buf):
+            raise _NeedMore
+        return self._buf[self._pos]
+
+    def _raw(self) -> Any:
+        try:
+            val, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if self._final:
+                raise ValueError(f"malformed gettrackinfo response at offset {self._pos}")
+            raise _NeedMore
+        # 값이 버퍼 끝에서 잘렸을 수 있으므로 다음 청크를 기다림.
+        # 숫자는 끝이 아니어도 다음 글자가 이어질 수 있는 글자면("1." + "5") 아직 미완성
+        if not self._final and (
+            end >= len(self._buf)
+            or (type(val) in (int, float) and self._buf[end] in _NUMBER_CONT)
+        ):
+            raise _NeedMore
+        self._pos = end
+        return val
+
+    def _value(self, path: Tuple[str, ...], parent: Optional[list]):
+        c = self._peek()
+        if c == "{" and path in _ENTER_OBJECTS:
+            self._pos += 1
+            self._stack.append(["obj", path, "key", None])
+        elif c == "[" and path in _TARGET_ARRAYS:
+            self._pos += 1
+            self._stack.append(["arr", path, "first", None])
+        else:
+            val = self._raw()
+            if parent is not None and parent[1] == () and parent[0] == "obj":
+                self._root_fields[parent[3]] = val
+        self._started = True
+
+    def _step(self, out: List[Dict[str, Any]]):
+        if not self._stack:
+            # 루트 값: 객체/배열이면 프레임이 생기고, 스칼라면 바로 끝
+            self._value((), None)
+            if not self._stack:
+                self._finished = True
+            return
+
+        frame = self._stack[-1]
+        kind, path, state, _key = frame
+        c = self._peek()
+
+        if kind == "arr":
+            # 대상 배열만 프레임으로 들어오므로 원소는 모두 track item 후보
+            if state == "sep" or (state == "first" and c == "]"):
+                if c == "]":
+                    self._pos += 1
+                    self._pop()
+                elif c == "," and state == "sep":
+                    self._pos += 1
+                    frame[2] = "item"
+                else:
+                    raise ValueError(f"unexpected {c!r} in array at offset {self._pos}")
+                return
+            item = self._raw()
+            if isinstance(item, dict):
+                out.append(item)
+                self._yielded += 1
+            frame[2] = "sep"
+            return
+
+        if state == "key" or state == "next":
+            if c == "}" and state == "key":
+                self._pos += 1
+                self._pop()
+                return
+            if c != '"':
+                raise ValueError(f"unexpected {c!r} in object at offset {self._pos}")
+            frame[3] = self._raw()
+            frame[2] = "colon"
+        elif state == "colon":
+            if c != ":":
+                raise ValueError(f"expected ':' at offset {self._pos}")
+            self._pos += 1
+            frame[2] = "value"
+        elif state == "value":
+            # 자식 프레임이 쌓이기 전에 상태를 먼저 넘겨 둔다
+            frame[2] = "sep"
+            try:
+                self._value(path + (frame[3],), frame)
+            except _NeedMore:
+                frame[2] = "value"
+                raise
+        elif c == ",":
+            self._pos += 1
+            frame[2] = "next"
+        elif c == "}":
+            self._pos += 1
+            self._pop()
+        else:
+            raise ValueError(f"unexpected {c!r} in object at offset {self._pos}")
+
+    def _pop(self):
+        self._stack.pop()
+        if not self._stack:
+            self._finished = True
@@ -12,7 +12,7 @@ import {
   ChevronDown,
   RefreshCw,
 } from "lucide-react";
-import { getRecentEvents } from "../../lib/api";
+import { getRecentEvents, subscribeUpdates } from "../../lib/api";
 import { getPresets } from "../../lib/presets";
 
 // 상태에 따른 아이콘 및 색상 매핑
@@ -110,7 +110,10 @@ function ActivityFeed({ onTrackingNumberClick }) {
 
       // 백엔드에 즐겨찾는 운송장 번호 목록 전달하여 필터링
       const favoriteNumbersArray = Array.from(favorites);
-      const data = await getRecentEvents(100, favoriteNumbersArray, signal);
+      // 30분 넘게 갱신되지 않은 번호는 서버가 백그라운드로 재조회 (도착하면 푸시로 다시 불러옴)
+      const data = await getRecentEvents(100, favoriteNumbersArray, signal, {
+        refreshOlderThan: 30,
+      });
 
       // API 응답을 활동 피드 형식으로 변환
       const formattedActivities = data.map((event) => {
@@ -157,14 +160,40 @@ function ActivityFeed({ onTrackingNumberClick }) {
     abortControllerRef.current = new AbortController();
     fetchEvents(abortControllerRef.current.signal);
 
-    // 30초마다 자동 갱신
+    // 즐겨찾는 운송장 변경은 서버 푸시로 받아 갱신 (연달아 오면 한 번으로 묶음)
+    let unsubscribe = () => {};
+    let debounceId = null;
+    const scheduleFetch = () => {
+      clearTimeout(debounceId);
+      debounceId = setTimeout(() => {
+        abortControllerRef.current = new AbortController();
+        fetchEvents(abortControllerRef.current.signal);
+      }, 500);
+    };
+    const subscribe = () => {
+      unsubscribe();
+      const numbers = Array.from(updateFavoriteTrackingNumbers());
+      unsubscribe =
+        numbers.length === 0
+          ? () => {}
+          : subscribeUpdates({
+              numbers,
+              kinds: ["shipment", "events"],
+              onChange: scheduleFetch,
+              onResync: scheduleFetch,
+            });
+    };
+    subscribe();
+
+    // 5분마다 자동 갱신 (푸시 연결 실패 대비)
     intervalRef.current = setInterval(() => {
       abortControllerRef.current = new AbortController();
       fetchEvents(abortControllerRef.current.signal);
-    }, 30000); // 30초
+    }, 300000); // 5분
 
     // 프리셋 업데이트 이벤트 리스너
     const handlePresetsUpdated = () => {
+      subscribe();
       abortControllerRef.current = new AbortController();
       fetchEvents(abortControllerRef.current.signal);
     };
@@ -180,6 +209,8 @@ function ActivityFeed({ onTrackingNumberClick }) {
         abortControllerRef.current.abort();
       }
       window.removeEventListener("presetsUpdated", handlePresetsUpdated);
+      clearTimeout(debounceId);
+      unsubscribe();
     };
   }, []);
 
@@ -749,12 +749,16 @@ export default function TrackingStatus({
         stage: e.stage,
         desc: e.desc || null,
         location: e.location || null,
+        // 서버에서 접힌 반복 스캔 (첫 시각 ts, 마지막 시각 last_ts)
+        repeat: e.repeat || 1,
+        last_ts: e.last_ts || null,
       }))
     : [];
 
   const lastNormTs =
     normalizedWithLoc.length > 0
-      ? normalizedWithLoc[normalizedWithLoc.length - 1].ts
+      ? normalizedWithLoc[normalizedWithLoc.length - 1].last_ts ||
+        normalizedWithLoc[normalizedWithLoc.length - 1].ts
       : null;
 
   const rawTail = (rawProviderEvents || [])
@@ -1353,6 +1357,14 @@ export default function TrackingStatus({
                                       {stage.label}
                                     </span>
                                     <span>· {formatDate(eventItem.ts)}</span>
+                                    {eventItem?.repeat > 1 ? (
+                                      <span className="text-slate-400 dark:text-slate-500">
+                                        · {eventItem.repeat}회 반복
+                                        {eventItem.last_ts
+                                          ? ` (마지막 ${formatDate(eventItem.last_ts)})`
+                                          : ""}
+                                      </span>
+                                    ) : null}
                                     {eventItem?.location ? (
                                       <span className="text-slate-500 dark:text-slate-400">
                                         · {eventItem.location}
@@ -13,7 +13,7 @@ import {
 import { useCallback, useEffect, useRef, useState } from "react";
 import TitleIcon from "../../../img/TitleIcon.png";
 import TitleFont from "../../../img/TitleFont.png";
-import { getRegulationNotices } from "../../lib/api";
+import { getRegulationNotices, subscribeUpdates } from "../../lib/api";
 
 const NOTICE_BADGES = {
   INFO: "bg-slate-100 text-slate-600 dark:bg-slate-800/60 dark:text-slate-200",
@@ -113,10 +113,25 @@ function Header({
 
   useEffect(() => {
     fetchNoticeHighlights();
-    const id = setInterval(fetchNoticeHighlights, 60000);
+    // 새 공지는 서버 푸시로 받으므로 주기 조회는 연결 실패 대비용
+    const id = setInterval(fetchNoticeHighlights, 600000);
     return () => clearInterval(id);
   }, [fetchNoticeHighlights]);
 
+  // 새 규제 공지 푸시 → 목록 다시 받기 (재연결 시에는 끊긴 동안의 공지를 위해 한 번 더)
+  useEffect(() => {
+    let connectedOnce = false;
+    const notify = () => window.dispatchEvent(new Event("regulationNoticesUpdated"));
+    return subscribeUpdates({
+      kinds: ["notice"],
+      onNotice: notify,
+      onReady: () => {
+        if (connectedOnce) notify();
+        connectedOnce = true;
+      },
+    });
+  }, []);
+
   useEffect(() => {
     const handler = () => fetchNoticeHighlights();
     window.addEventListener("regulationNoticesUpdated", handler);
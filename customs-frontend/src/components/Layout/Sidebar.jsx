@@ -26,7 +26,7 @@ import {
   removeSearchHistory,
   getStatusColorClass,
 } from "../../lib/searchHistory";
-import { getRecentEvents } from "../../lib/api";
+import { getRecentEvents, subscribeUpdates } from "../../lib/api";
 import { getPresets } from "../../lib/presets";
 
 // 3x3 카테고리 정의
@@ -179,22 +179,24 @@ function Sidebar({
 
   // 활동 피드 데이터 가져오기
   useEffect(() => {
+    // 즐겨찾는 운송장 번호 목록 (모든 프리셋에서 추출)
+    const getFavoriteNumbers = () => {
+      const favoriteNumbers = new Set();
+      getPresets().forEach((preset) => {
+        if (Array.isArray(preset.trackingNumbers)) {
+          preset.trackingNumbers.forEach((num) => {
+            if (num && num.trim()) {
+              favoriteNumbers.add(num.trim());
+            }
+          });
+        }
+      });
+      return favoriteNumbers;
+    };
+
     const fetchActivityFeed = async (signal) => {
       try {
-        // 즐겨찾는 운송장 번호 목록 가져오기
-        const presets = getPresets();
-        const favoriteNumbers = new Set();
-
-        // 모든 프리셋에서 운송장 번호 추출
-        presets.forEach((preset) => {
-          if (Array.isArray(preset.trackingNumbers)) {
-            preset.trackingNumbers.forEach((num) => {
-              if (num && num.trim()) {
-                favoriteNumbers.add(num.trim());
-              }
-            });
-          }
-        });
+        const favoriteNumbers = getFavoriteNumbers();
 
         // 즐겨찾는 운송장이 없으면 빈 배열 반환
         if (favoriteNumbers.size === 0) {
@@ -217,11 +219,43 @@ function Sidebar({
     activityFeedAbortControllerRef.current = new AbortController();
     fetchActivityFeed(activityFeedAbortControllerRef.current.signal);
 
-    // 30초마다 자동 갱신
+    // 즐겨찾는 운송장 변경은 서버 푸시로 받아 갱신 (연달아 오면 한 번으로 묶음)
+    let unsubscribe = () => {};
+    let debounceId = null;
+    const scheduleFetch = () => {
+      clearTimeout(debounceId);
+      debounceId = setTimeout(() => {
+        activityFeedAbortControllerRef.current = new AbortController();
+        fetchActivityFeed(activityFeedAbortControllerRef.current.signal);
+      }, 500);
+    };
+    const subscribe = () => {
+      unsubscribe();
+      const numbers = Array.from(getFavoriteNumbers());
+      unsubscribe =
+        numbers.length === 0
+          ? () => {}
+          : subscribeUpdates({
+              numbers,
+              kinds: ["shipment", "events"],
+              onChange: scheduleFetch,
+              onResync: scheduleFetch,
+            });
+    };
+    subscribe();
+
+    // 프리셋이 바뀌면 구독 대상도 바꿈
+    const handlePresetsUpdated = () => {
+      subscribe();
+      scheduleFetch();
+    };
+    window.addEventListener("presetsUpdated", handlePresetsUpdated);
+
+    // 5분마다 자동 갱신 (푸시 연결 실패 대비)
     activityFeedIntervalRef.current = setInterval(() => {
       activityFeedAbortControllerRef.current = new AbortController();
       fetchActivityFeed(activityFeedAbortControllerRef.current.signal);
-    }, 30000);
+    }, 300000);
 
     return () => {
       if (activityFeedIntervalRef.current) {
@@ -230,6 +264,9 @@ function Sidebar({
       if (activityFeedAbortControllerRef.current) {
         activityFeedAbortControllerRef.current.abort();
       }
+      window.removeEventListener("presetsUpdated", handlePresetsUpdated);
+      clearTimeout(debounceId);
+      unsubscribe();
     };
   }, []);
 
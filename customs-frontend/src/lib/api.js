@@ -25,7 +25,8 @@ function getApiBaseUrl() {
 
 export const API_BASE_URL = getApiBaseUrl();
 
-async function http(path, { method = "GET", body, headers, signal } = {}) {
+// withHeaders: true면 { data, headers } 반환 (커서 등 응답 헤더가 필요한 호출용)
+async function http(path, { method = "GET", body, headers, signal, withHeaders = false } = {}) {
   const url = `${API_BASE_URL}${path.startsWith("/") ? path : `/${path}`}`;
   const init = {
     method,
@@ -66,9 +67,11 @@ async function http(path, { method = "GET", body, headers, signal } = {}) {
     throw new Error(`API ${res.status} ${res.statusText}: ${detail}`);
   }
 
-  if (res.status === 204) return null;
-  if (contentType.includes("application/json")) return res.json();
-  return res.text();
+  let data;
+  if (res.status === 204) data = null;
+  else if (contentType.includes("application/json")) data = await res.json();
+  else data = await res.text();
+  return withHeaders ? { data, headers: res.headers } : data;
 }
 
 // ========== Admin & User (관리자/사용자 공용) ==========
@@ -85,8 +88,207 @@ export function adminRegister17track10(signal) {
   return http("/admin/register-17track-10", { method: "POST", signal });
 }
 
-export function userListTrackings(signal) {
-  return http("/user/trackings", { signal });
+// 목록은 최신순 페이지 단위 (다음 페이지 커서는 X-Next-Cursor 응답 헤더)
+// params: { limit, cursor, status, carrier, updated_since }
+export function userListTrackings(signal, params = {}) {
+  return userListTrackingsPage(signal, params).then((page) => page.items);
+}
+
+// 한 페이지 + 다음 커서 → { items, nextCursor } (마지막 페이지면 nextCursor = null)
+export async function userListTrackingsPage(signal, params = {}) {
+  const qs = new URLSearchParams();
+  for (const [k, v] of Object.entries(params)) {
+    if (v !== undefined && v !== null && v !== "") qs.set(k, String(v));
+  }
+  const q = qs.toString() ? `?${qs.toString()}` : "";
+  const { data, headers } = await http(`/user/trackings${q}`, { signal, withHeaders: true });
+  return { items: Array.isArray(data) ? data : [], nextCursor: headers.get("X-Next-Cursor") };
+}
+
+// 커서를 끝까지 따라가 전체 목록 (페이지는 서버 최대 크기로)
+const LIST_PAGE_MAX = 1000;
+
+export async function userListAllTrackings(signal, params = {}) {
+  const all = [];
+  let cursor;
+  do {
+    const page = await userListTrackingsPage(signal, { limit: LIST_PAGE_MAX, ...params, cursor });
+    all.push(...page.items);
+    cursor = page.nextCursor;
+  } while (cursor);
+  return all;
+}
+
+// 대시보드 요약 집계 (상태/carrier/출발국별 건수, 지연, 평균 소요시간·히스토그램)
+export function getStatsOverview(signal) {
+  return http("/api/stats/overview", { signal });
+}
+
+// 통관 소요시간 추이 (일별 롤업 기반)
+// params: { start, end (YYYY-MM-DD), interval: "day"|"week"|"month", origin, carrier }
+export function getClearanceTrend(params = {}, signal) {
+  const qs = new URLSearchParams();
+  for (const [k, v] of Object.entries(params)) {
+    if (v !== undefined && v !== null && v !== "") qs.set(k, String(v));
+  }
+  const q = qs.toString() ? `?${qs.toString()}` : "";
+  return http(`/api/stats/clearance-trend${q}`, { signal });
+}
+
+// 통관완료 → 배송완료 SLA 준수율 (변경이 없으면 서버 캐시)
+// params: { sla_hours, start, end (YYYY-MM-DD), group_by: "carrier,origin" 또는 배열 }
+export function getSlaCompliance(params = {}, signal) {
+  const qs = new URLSearchParams();
+  for (const [k, v] of Object.entries(params)) {
+    if (v !== undefined && v !== null) qs.set(k, Array.isArray(v) ? v.join(",") : String(v));
+  }
+  const q = qs.toString() ? `?${qs.toString()}` : "";
+  return http(`/api/stats/sla${q}`, { signal });
+}
+
+export function searchShipments(q, { scope = "all", limit = 20 } = {}, signal) {
+  const query = new URLSearchParams({ q, scope, limit: String(limit) }).toString();
+  return http(`/api/search?${query}`, { signal });
+}
+
+// 서버 푸시 (SSE): 운송장 변경·새 규제 공지를 커밋 직후 받음
+// options: { numbers: [...] (없으면 전체), kinds: ["shipment","events","details","notice"] (없으면 전부),
+//            onChange, onNotice, onResync, onReady, onError }
+// 끊기면 브라우저가 Last-Event-ID로 자동 재연결하고 서버가 놓친 변경을 다시 보냄 (너무 오래됐으면 resync)
+// 반환값: 구독 해제 함수
+//
+// 탭마다 EventSource는 하나만 연다 (HTTP/1.1은 출처당 연결 6개): 모든 구독의 합집합으로 열고 콜백으로 나눠 줌.
+// 구독이 바뀌어 합집합이 달라질 때만 다시 열고, 마지막으로 받은 커서(since)부터 이어 받는다.
+const STREAM_KINDS = ["shipment", "events", "details", "notice"];
+const STREAM_CHANGE_KINDS = new Set(["shipment", "events", "details"]);
+const STREAM_MAX_NUMBERS = 500; // 서버 상한 — 넘으면 전체 구독 후 여기서 거름
+
+const stream = {
+  source: null,
+  key: null, // 열려 있는 연결의 쿼리 문자열
+  subs: new Set(),
+  lastId: null, // 마지막으로 받은 커서 (다시 열 때 since)
+  ready: null, // 현재 연결의 ready 데이터 (늦게 합류한 구독에 전달)
+  timer: null,
+};
+
+function streamQuery() {
+  const kinds = new Set();
+  const numbers = new Set();
+  let allNumbers = false;
+  for (const sub of stream.subs) {
+    sub.kinds.forEach((k) => kinds.add(k));
+    // 번호 필터는 변경(change)에만 의미 → 공지만 받는 구독은 번호 합집합에 영향 없음
+    if (![...sub.kinds].some((k) => STREAM_CHANGE_KINDS.has(k))) continue;
+    if (sub.numbers) sub.numbers.forEach((n) => numbers.add(n));
+    else allNumbers = true;
+  }
+  const qs = new URLSearchParams();
+  if (!allNumbers && numbers.size > 0 && numbers.size <= STREAM_MAX_NUMBERS) {
+    qs.set("numbers", [...numbers].sort().join(","));
+  }
+  if (kinds.size < STREAM_KINDS.length) qs.set("kinds", [...kinds].sort().join(","));
+  return qs.toString();
+}
+
+function streamDispatch(pick, call) {
+  for (const sub of [...stream.subs]) {
+    if (!pick(sub)) continue;
+    try {
+      call(sub);
+    } catch (error) {
+      console.warn("스트림 구독 콜백 실패:", error);
+    }
+  }
+}
+
+function streamOpen(query) {
+  const qs = new URLSearchParams(query);
+  if (stream.lastId !== null) qs.set("since", String(stream.lastId));
+  const q = qs.toString() ? `?${qs.toString()}` : "";
+  const source = new EventSource(`${API_BASE_URL}/api/stream${q}`);
+  stream.source = source;
+  stream.key = query;
+  stream.ready = null;
+
+  const listen = (event, handler) => {
+    source.addEventListener(event, (e) => {
+      if (source !== stream.source) return; // 교체된 연결의 늦은 프레임
+      let data;
+      try {
+        data = JSON.parse(e.data);
+      } catch (error) {
+        console.warn(`스트림 ${event} 처리 실패:`, error);
+        return;
+      }
+      if (e.lastEventId) stream.lastId = Number(e.lastEventId);
+      handler(data);
+    });
+  };
+  listen("change", (data) =>
+    streamDispatch(
+      (sub) => sub.kinds.has(data.kind) && (!sub.numbers || sub.numbers.has(data.tracking_number)),
+      (sub) => sub.onChange?.(data),
+    ),
+  );
+  listen("notice", (data) => streamDispatch((sub) => sub.kinds.has("notice"), (sub) => sub.onNotice?.(data)));
+  listen("resync", (data) => streamDispatch(() => true, (sub) => sub.onResync?.(data)));
+  listen("ready", (data) => {
+    stream.ready = data;
+    streamDispatch(() => true, (sub) => {
+      sub.gotReady = true;
+      sub.onReady?.(data);
+    });
+  });
+  source.onerror = (e) => {
+    if (source === stream.source) streamDispatch(() => true, (sub) => sub.onError?.(e));
+  };
+}
+
+function streamSync() {
+  stream.timer = null;
+  if (stream.subs.size === 0) {
+    stream.source?.close();
+    Object.assign(stream, { source: null, key: null, lastId: null, ready: null });
+    return;
+  }
+  const query = streamQuery();
+  if (stream.source && query === stream.key) {
+    // 합집합이 그대로면 연결 유지 — 새로 합류한 구독에는 현재 ready를 그대로 전달
+    if (stream.ready) {
+      streamDispatch((sub) => !sub.gotReady, (sub) => {
+        sub.gotReady = true;
+        sub.onReady?.(stream.ready);
+      });
+    }
+    return;
+  }
+  stream.source?.close();
+  streamOpen(query);
+}
+
+function streamScheduleSync() {
+  // 같은 렌더에서 여러 컴포넌트가 구독/해제해도 한 번만 다시 계산
+  if (stream.timer === null) stream.timer = setTimeout(streamSync, 0);
+}
+
+export function subscribeUpdates({ numbers, kinds, onChange, onNotice, onResync, onReady, onError } = {}) {
+  if (typeof EventSource === "undefined") return () => {};
+  const sub = {
+    numbers: Array.isArray(numbers) && numbers.length > 0 ? new Set(numbers.map(String)) : null,
+    kinds: new Set(Array.isArray(kinds) && kinds.length > 0 ? kinds : STREAM_KINDS),
+    onChange,
+    onNotice,
+    onResync,
+    onReady,
+    onError,
+    gotReady: false,
+  };
+  stream.subs.add(sub);
+  streamScheduleSync();
+  return () => {
+    if (stream.subs.delete(sub)) streamScheduleSync();
+  };
 }
 
 export function getHealth(signal) {
@@ -119,7 +321,7 @@ export function adminSyncFromFile(params = {}, signal) {
 
 // 2) 사용자 목록 API를 관리자 테이블 형태로 가공
 export async function adminListTrackings(signal) {
-  const raw = await userListTrackings(signal).catch(() => []);
+  const raw = await userListAllTrackings(signal).catch(() => []);
   if (!Array.isArray(raw)) return [];
 
   return raw.map((r) => {
@@ -189,7 +391,10 @@ export function adminSaveShipmentDetails(number, payload) {
 
 // ========== 실시간 이벤트 / BE4 ==========
 
-export function getRecentEvents(limit = 20, trackingNumbers = null, signal) {
+// 저장된 이벤트에서 번호별 최신 1건
+// options.refreshOlderThan(분): 그보다 오래됐거나 없는 번호는 서버가 백그라운드로 재조회
+// (결과는 기다리지 않음 — 저장되면 subscribeUpdates의 change로 알려짐)
+export function getRecentEvents(limit = 20, trackingNumbers = null, signal, options = {}) {
   const query = new URLSearchParams({ limit: String(limit) });
   if (
     trackingNumbers &&
@@ -198,6 +403,9 @@ export function getRecentEvents(limit = 20, trackingNumbers = null, signal) {
   ) {
     query.set("tracking_numbers", trackingNumbers.join(","));
   }
+  if (options.refreshOlderThan) {
+    query.set("refresh_older_than", String(options.refreshOlderThan));
+  }
   return http(`/api/recent-events?${query.toString()}`, { signal });
 }
 